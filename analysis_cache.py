@@ -0,0 +1,64 @@
+"""
+Cache for vision-model damage analyses
+
+Technicians resubmit the same photos all the time (after a dropped
+connection, or switching between water and mold), and every submission
+was a full model round trip. Analyses are cached by the content of the
+photos, the damage type, the prompt version and the model.
+
+The photos the model sees are a deterministic function of the uploaded
+bytes and the vision_images settings, so hashing the uploads together
+with those settings identifies the normalised photos without
+preprocessing them first. A hit therefore costs a few hashes. Photo order
+doesn't matter, and filenames and upload MIME types are ignored.
+"""
+
+import os
+import json
+import hashlib
+import logging
+
+from lru_cache import LRUCache
+from vision_images import VISION_DETAIL, VISION_MAX_SIDE, VISION_SHORT_SIDE, VISION_JPEG_QUALITY
+
+logger = logging.getLogger(__name__)
+
+ANALYSIS_CACHE_TTL = int(os.getenv('ANALYSIS_CACHE_TTL', 24 * 60 * 60))
+ANALYSIS_CACHE_MEMORY = int(os.getenv('ANALYSIS_CACHE_MEMORY_MB', 16)) * 1024 * 1024
+ANALYSIS_CACHE_ENTRIES = int(os.getenv('ANALYSIS_CACHE_ENTRIES', 2000))
+
+# Analyses are stored as JSON text: sized by length, and every hit decodes a fresh copy
+analysis_cache = LRUCache(max_bytes=ANALYSIS_CACHE_MEMORY, max_entries=ANALYSIS_CACHE_ENTRIES,
+                          ttl=ANALYSIS_CACHE_TTL or None)
+
+
+def analysis_key(photos, damage_type, prompt_version, model, mode='single'):
+    """Cache key for analysing photos (a list of bytes) as damage_type
+
+    mode names how the photos were put to the model (e.g. 'fanout2' for
+    groups of two), since that changes the answer.
+    """
+    settings = (f"p{prompt_version}|{model}|{damage_type}|{VISION_DETAIL}|{VISION_MAX_SIDE}x{VISION_SHORT_SIDE}"
+                f"|q{VISION_JPEG_QUALITY}")
+    if mode != 'single':
+        settings += f"|{mode}"
+    digest = hashlib.sha256(settings.encode('utf-8'))
+    for photo_digest in sorted(hashlib.sha256(data).digest() for data in photos):
+        digest.update(photo_digest)
+    return digest.hexdigest()
+
+
+def get_cached_analysis(key):
+    """The cached analysis for key, or None"""
+    cached = analysis_cache.get(key)
+    if cached is None:
+        return None
+    logger.debug(f"Analysis cache hit for {key}")
+    return json.loads(cached)
+
+
+def cache_analysis(key, analysis):
+    """Cache an analysis, unless the model's answer couldn't be used"""
+    if 'error' in analysis:
+        return
+    analysis_cache.put(key, json.dumps(analysis, separators=(',', ':')))
@@ -0,0 +1,245 @@
+"""
+Fan-out analysis of large photo sets
+
+Packing every photo into one vision message makes the call slower with
+each photo, and one photo the model chokes on can spoil the parse of the
+whole answer. In fan-out mode the photos are split into groups of
+ANALYSIS_FANOUT_GROUP_SIZE, each group is analysed by its own concurrent
+call, and merge_analyses combines the answers into one analysis.
+
+The merge is deterministic, and the same per-group answers always merge
+to the same analysis. By default the groups are taken to overlap: several
+photos of one room each show the whole loss from another angle, so adding
+them up would count it several times. Unless the client says the groups
+show separate areas (a room per group, say):
+
+- areas and the quantities of matching line items and equipment take the
+  largest any group reported; with separate areas they add up;
+- line items with the same description, unit and category are combined,
+  with a quantity-weighted unit price, and total_estimate is recomputed
+  from the merged line items. Equipment with the same name is combined,
+  keeping the longest duration;
+- lists such as affected_materials are merged in order, without duplicates;
+- severity and the other graded fields take the worst grade any group
+  reported. Flags such as standing_water are true if any group says so;
+- estimated_days is the longest, and confidence_percent is the
+  area-weighted mean.
+
+A group that fails or can't be parsed is left out of the merge and listed
+in photo_analyses with its error.
+"""
+
+import os
+import time
+import operator
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+ANALYSIS_FANOUT_GROUP_SIZE = int(os.getenv('ANALYSIS_FANOUT_GROUP_SIZE', 1))
+# Uploads with at least this many photos fan out unless the request picks a mode; 0 leaves it to the request
+ANALYSIS_FANOUT_MIN_PHOTOS = int(os.getenv('ANALYSIS_FANOUT_MIN_PHOTOS', 0))
+ANALYSIS_FANOUT_WORKERS = int(os.getenv('ANALYSIS_FANOUT_WORKERS', 8))
+
+ANALYSIS_MODES = ('single', 'fanout')
+# 'overlapping': groups may show the same area; 'separate': each shows a different part of the loss
+FANOUT_AREAS = ('overlapping', 'separate')
+
+# Grades from least to most serious; fields not listed keep the value from the most severe group
+GRADES = {
+    'severity': ('minor', 'moderate', 'severe'),
+    'category': ('1', '2', '3'),
+    'class': ('1', '2', '3', '4'),
+    'moisture_level': ('low', 'medium', 'high'),
+    'health_risk': ('low', 'medium', 'high'),
+    'odor_level': ('low', 'medium', 'high'),
+    'soot_level': ('light', 'moderate', 'heavy'),
+    'condition': ('1', '2', '3'),
+    'contamination_level': ('1', '2', '3', '4'),
+}
+
+
+def group_photos(photo_data, group_size=ANALYSIS_FANOUT_GROUP_SIZE):
+    """Split photos into consecutive groups of group_size; returns (photo indices, photos) pairs"""
+    group_size = max(1, group_size)
+    return [
+        (list(range(start, min(start + group_size, len(photo_data)))), photo_data[start:start + group_size])
+        for start in range(0, len(photo_data), group_size)
+    ]
+
+
+def fan_out(fn, groups, on_result=None):
+    """Call fn(photos) for every group concurrently
+
+    Returns one (result, error, latency_ms) per group, in group order.
+    on_result, if given, is called with the same triple and the group's
+    index as each group finishes.
+    """
+    def run(index, photos):
+        start = time.perf_counter()
+        try:
+            result, error = fn(photos), None
+        except Exception as e:
+            result, error = None, e
+        outcome = (result, error, (time.perf_counter() - start) * 1000)
+        if on_result:
+            on_result(index, *outcome)
+        return outcome
+
+    if len(groups) == 1:
+        return [run(0, groups[0][1])]
+    pool = get_fanout_pool()
+    futures = [pool.submit(run, index, photos) for index, (_, photos) in enumerate(groups)]
+    return [future.result() for future in futures]
+
+
+def _number(value):
+    """value as a float, or None if it isn't numeric"""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(str(value).replace(',', '').replace('$', ''))
+    except (TypeError, ValueError):
+        return None
+
+
+def _rank(field, value):
+    grades = GRADES[field]
+    value = str(value).strip().lower()
+    return grades.index(value) if value in grades else -1
+
+
+def _tidy(number):
+    """Whole numbers as ints, everything else to the cent"""
+    return int(number) if float(number).is_integer() else round(number, 2)
+
+
+def _merge_list(analyses, field):
+    merged, seen = [], set()
+    for analysis in analyses:
+        for value in analysis.get(field) or []:
+            key = value.strip().lower() if isinstance(value, str) else repr(value)
+            if key not in seen:
+                seen.add(key)
+                merged.append(value)
+    return merged
+
+
+def _merge_equipment(analyses, combine):
+    merged = {}
+    for analysis in analyses:
+        for item in analysis.get('equipment_needed') or []:
+            if not isinstance(item, dict):
+                continue
+            name = str(item.get('name', '')).strip()
+            entry = merged.setdefault(name.lower(), dict(item, name=name, quantity=0, days=0))
+            entry['quantity'] = _tidy(combine(entry['quantity'], _number(item.get('quantity')) or 0))
+            entry['days'] = _tidy(max(entry['days'], _number(item.get('days')) or 0))
+    return list(merged.values())
+
+
+def _merge_line_items(analyses, combine):
+    merged = {}
+    for analysis in analyses:
+        for item in analysis.get('line_items') or []:
+            if not isinstance(item, dict):
+                continue
+            key = tuple(str(item.get(field, '')).strip().lower() for field in ('description', 'unit', 'category'))
+            quantity = _number(item.get('quantity')) or 0
+            price = _number(item.get('unitPrice')) or 0
+            entry = merged.get(key)
+            if entry is None:
+                merged[key] = [dict(item), quantity, quantity, quantity * price, price]
+            else:
+                entry[1] = combine(entry[1], quantity)
+                entry[2] += quantity
+                entry[3] += quantity * price
+    items = []
+    for item, quantity, priced_quantity, cost, first_price in merged.values():
+        item['quantity'] = _tidy(quantity)
+        item['unitPrice'] = round(cost / priced_quantity, 2) if priced_quantity else first_price
+        if 'total' in item:
+            item['total'] = _tidy(round(quantity * item['unitPrice'], 2))
+        items.append(item)
+    return items
+
+
+def merge_analyses(damage_type, analyses, separate_areas=False):
+    """Combine per-group analyses (in photo order) into one; see the module docstring
+
+    separate_areas says the groups show different parts of the loss, so
+    their areas and quantities add up instead of overlapping.
+    """
+    if not analyses:
+        raise ValueError("Nothing to merge")
+    if len(analyses) == 1:
+        return dict(analyses[0])
+
+    # Fields without a rule come from the most severe group, the earliest on a tie
+    worst = max(analyses, key=lambda analysis: _rank('severity', analysis.get('severity', '')))
+    merged = dict(worst)
+    merged['damage_type'] = damage_type
+
+    for field in GRADES:
+        values = [analysis[field] for analysis in analyses if field in analysis]
+        if values:
+            merged[field] = max(values, key=lambda value: _rank(field, value))
+    for field in dict.fromkeys(field for analysis in analyses for field, value in analysis.items()
+                               if isinstance(value, bool)):
+        merged[field] = any(analysis.get(field) is True for analysis in analyses)
+    combine = operator.add if separate_areas else max
+    areas = [_number(analysis.get('affected_area_sqft')) for analysis in analyses if 'affected_area_sqft' in analysis]
+    areas = [value for value in areas if value is not None]
+    if areas:
+        merged['affected_area_sqft'] = _tidy(sum(areas) if separate_areas else max(areas))
+    for field in dict.fromkeys(field for analysis in analyses for field, value in analysis.items()
+                               if isinstance(value, list) and field not in ('equipment_needed', 'line_items')):
+        merged[field] = _merge_list(analyses, field)
+
+    merged['equipment_needed'] = _merge_equipment(analyses, combine)
+    merged['line_items'] = _merge_line_items(analyses, combine)
+
+    # The total follows the merged line items; the groups' own totals only when there are none
+    if merged['line_items']:
+        merged['total_estimate'] = _tidy(round(sum(
+            (_number(item.get('quantity')) or 0) * (_number(item.get('unitPrice')) or 0)
+            for item in merged['line_items']), 2))
+    else:
+        totals = [_number(analysis.get('total_estimate')) for analysis in analyses if 'total_estimate' in analysis]
+        totals = [value for value in totals if value is not None]
+        if totals:
+            merged['total_estimate'] = _tidy(sum(totals) if separate_areas else max(totals))
+
+    days = [_number(analysis.get('estimated_days')) for analysis in analyses]
+    days = [value for value in days if value is not None]
+    if days:
+        merged['estimated_days'] = _tidy(max(days))
+
+    confidences = [(_number(analysis.get('confidence_percent')), _number(analysis.get('affected_area_sqft')) or 0)
+                   for analysis in analyses]
+    confidences = [(value, weight) for value, weight in confidences if value is not None]
+    if confidences:
+        total_weight = sum(weight for _, weight in confidences)
+        if total_weight:
+            merged['confidence_percent'] = round(sum(value * weight for value, weight in confidences) / total_weight)
+        else:
+            merged['confidence_percent'] = round(sum(value for value, _ in confidences) / len(confidences))
+    return merged
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_fanout_pool():
+    """Return the process-wide pool for fan-out groups, starting it on first use"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(max_workers=ANALYSIS_FANOUT_WORKERS, thread_name_prefix='fanout')
+    return _pool
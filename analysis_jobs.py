@@ -0,0 +1,211 @@
+"""
+Background jobs for damage analyses
+
+A vision call takes 10-40 seconds, and a synchronous request holds a
+gunicorn worker for all of it. Jobs run on a bounded thread pool instead:
+submitting one returns its id straight away, and clients poll its state or
+follow it as server-sent events. Finished jobs are kept for
+ANALYSIS_JOB_TTL seconds so clients can pick up their results.
+
+Jobs live in the memory of the process that accepted them, so with several
+gunicorn workers a client must reach the same worker (sticky sessions, or
+a single worker with threads).
+"""
+
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+ANALYSIS_WORKERS = int(os.getenv('ANALYSIS_WORKERS', 4))
+# Jobs queued or running at once; submissions beyond this are refused
+ANALYSIS_MAX_PENDING = int(os.getenv('ANALYSIS_MAX_PENDING', 32))
+ANALYSIS_JOB_TTL = int(os.getenv('ANALYSIS_JOB_TTL', 10 * 60))
+# Seconds between SSE keep-alive comments while a job is quiet
+SSE_HEARTBEAT = 15
+
+JOB_STATES = ('queued', 'preparing', 'analyzing', 'done', 'failed')
+FINISHED_STATES = ('done', 'failed')
+
+
+class JobQueueFull(Exception):
+    """Raised by submit when ANALYSIS_MAX_PENDING jobs are already waiting or running"""
+
+
+class AnalysisJob:
+    """One analysis and its progress; every change wakes anyone waiting on it"""
+
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.status = 'queued'
+        self.result = None
+        self.error = None
+        self.partial = None
+        self.created = time.time()
+        self.updated = self.created
+        self.version = 0
+        self._changed = threading.Condition()
+
+    @property
+    def finished(self):
+        return self.status in FINISHED_STATES
+
+    def update(self, status, result=None, error=None):
+        with self._changed:
+            self.status = status
+            self.result = result
+            self.error = error
+            self.updated = time.time()
+            self.version += 1
+            self._changed.notify_all()
+
+    def publish(self, partial):
+        """Share the fields of the analysis that have streamed in so far"""
+        with self._changed:
+            self.partial = partial
+            self.updated = time.time()
+            self.version += 1
+            self._changed.notify_all()
+
+    def wait(self, version, timeout):
+        """Block until the job moves past version or timeout passes; return the current version"""
+        with self._changed:
+            self._changed.wait_for(lambda: self.version != version, timeout)
+            return self.version
+
+    def to_dict(self):
+        job = {
+            'job_id': self.id,
+            'status': self.status,
+            'created': self.created,
+            'updated': self.updated
+        }
+        if self.result is not None:
+            job['analysis'] = self.result
+        elif self.partial is not None:
+            job['partial'] = self.partial
+        if self.error is not None:
+            job['error'] = self.error
+        return job
+
+
+class AnalysisJobs:
+    """Bounded pool running AnalysisJobs, plus the store clients look them up in"""
+
+    def __init__(self, workers=ANALYSIS_WORKERS, max_pending=ANALYSIS_MAX_PENDING, ttl=ANALYSIS_JOB_TTL):
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='analysis')
+        self._jobs = {}
+        self._inflight = {}
+        self._pending = 0
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.rejected = 0
+        self.coalesced = 0
+
+    def submit(self, fn, *args, key=None, deadline=None):
+        """Run fn(job, *args) in the background and return the job
+
+        fn reports progress with job.update and its outcome with
+        job.update('done', result=...); an exception fails the job. While a
+        job submitted with key is unfinished, submitting the same key
+        returns that job instead of starting another, unless that job has
+        an earlier deadline (a time.monotonic() value) than this one and
+        could time out sooner than this submission allows.
+        """
+        with self._lock:
+            self._prune()
+            job, job_deadline = self._inflight.get(key, (None, None)) if key is not None else (None, None)
+            if (job is not None and not job.finished
+                    and (job_deadline is None or deadline is not None and job_deadline >= deadline)):
+                self.coalesced += 1
+                return job
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                raise JobQueueFull(f"{self._pending} analyses already pending")
+            job = AnalysisJob()
+            self._pending += 1
+            self.submitted += 1
+            self._jobs[job.id] = job
+            if key is not None:
+                self._inflight[key] = (job, deadline)
+        self._pool.submit(self._run, job, fn, args, key)
+        return job
+
+    def completed(self, result):
+        """A job that is already done, for results that needed no work"""
+        job = AnalysisJob()
+        job.update('done', result=result)
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        return job
+
+    def _run(self, job, fn, args, key):
+        try:
+            fn(job, *args)
+            if not job.finished:
+                job.update('failed', error={'error': 'Analysis failed', 'message': 'The job ended without a result'})
+        except Exception as e:
+            logger.error(f"Analysis job {job.id} failed: {e}")
+            job.update('failed', error={'error': 'Analysis failed', 'message': str(e)})
+        finally:
+            with self._lock:
+                self._pending -= 1
+                if key is not None and self._inflight.get(key, (None,))[0] is job:
+                    del self._inflight[key]
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _prune(self):
+        """Forget jobs that finished more than ttl seconds ago (lock held)"""
+        cutoff = time.time() - self.ttl
+        expired = [job_id for job_id, job in self._jobs.items() if job.finished and job.updated < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'jobs': len(self._jobs),
+                'pending': self._pending,
+                'max_pending': self.max_pending,
+                'submitted': self.submitted,
+                'rejected': self.rejected,
+                'coalesced': self.coalesced
+            }
+
+
+def iter_job_events(job, heartbeat=SSE_HEARTBEAT):
+    """Server-sent events for job: its state now and after every change, until it finishes"""
+    version = None
+    while True:
+        if version != job.version:
+            version = job.version
+            yield f"event: {job.status}\ndata: {json.dumps(job.to_dict())}\n\n"
+            if job.finished:
+                return
+        elif job.wait(version, heartbeat) == version:
+            yield ": keep-alive\n\n"
+
+
+_jobs = None
+_jobs_lock = threading.Lock()
+
+
+def get_analysis_jobs():
+    """Return the process-wide job pool, starting it on first use"""
+    global _jobs
+    if _jobs is None:
+        with _jobs_lock:
+            if _jobs is None:
+                _jobs = AnalysisJobs()
+    return _jobs
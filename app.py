@@ -10,7 +10,7 @@ import logging
 from datetime import datetime
 from typing import Dict, Any, List, Optional
 
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, request, jsonify, send_from_directory
 from flask_cors import CORS
 from dotenv import load_dotenv
 from werkzeug.utils import secure_filename
@@ -36,6 +36,7 @@ CORS(app, resources={r"/api/*": {"origins": "*"}})
 app.config['MAX_CONTENT_LENGTH'] = 20 * 1024 * 1024  # 20MB max file size
 app.config['UPLOAD_FOLDER'] = 'temp_uploads'
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
+PDF_RESPONSE_FORMATS = ('binary', 'stream')
 
 # Try to import optional dependencies
 try:
@@ -47,10 +48,18 @@ except ImportError:
     logger.warning("OpenAI not available")
 
 try:
-    from pdf_generator import PDFGenerator
+    from pdf_generator import get_pdf_generator, ENGINES
+    from pdf_batch import iter_batch_zip, iter_batch_ndjson, BATCH_FORMATS, MAX_BATCH_SIZE
+    from photo_processing import thumbnail_cache
+    from pdf_cache import pdf_cache, canonical_estimate, estimate_etag, render_estimate_pdf
+    from pdf_size import PDF_PROFILES, PDF_SIZE_BUDGET, pdf_size_breakdown
+    from render_metrics import INSTRUMENT_MODES, new_timings, render_metrics
     HAS_PDF = True
 except ImportError:
     HAS_PDF = False
+    thumbnail_cache = None
+    pdf_cache = None
+    render_metrics = None
     logger.warning("PDF generation not available")
 
 # Create required directories
@@ -62,6 +71,38 @@ def allowed_file(filename: str) -> bool:
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def build_estimate_data(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert the frontend estimate payload into PDF generator input"""
+    analysis = data.get('analysis', {})
+    line_items = data.get('lineItems', [])
+    customer_info = data.get('customerInfo', {})
+    
+    return {
+        'date': datetime.now().strftime('%m/%d/%Y'),
+        'customer_name': customer_info.get('name', 'N/A'),
+        'customer_address': customer_info.get('address', 'N/A'),
+        'customer_phone': customer_info.get('phone', 'N/A'),
+        'customer_email': customer_info.get('email', 'N/A'),
+        'assessment': {
+            'damage_type': analysis.get('damage_type', 'N/A'),
+            'severity': analysis.get('severity', 'N/A'),
+            'affected_area': analysis.get('affected_area_sqft', 0),
+            'classification': analysis.get('classification', {})
+        },
+        'line_items': [
+            {
+                'description': item.get('description', ''),
+                'quantity': item.get('quantity', 1),
+                'unit_price': item.get('unitPrice', item.get('total', 0)),
+                'total': item.get('total', 0)
+            }
+            for item in line_items
+        ],
+        'markup': data.get('markup', 0),
+        'equipment': data.get('equipment', []),
+        'photos': data.get('photos', [])
+    }
+
 @app.route('/')
 def index():
     """Serve the main index file"""
@@ -79,7 +120,12 @@ def health():
         'environment': {
             'openai_configured': HAS_OPENAI,
             'pdf_configured': HAS_PDF
-        }
+        },
+        'caches': {
+            'thumbnails': thumbnail_cache.stats() if thumbnail_cache else None,
+            'pdfs': pdf_cache.stats() if pdf_cache else None
+        },
+        'render_stages': render_metrics.stats() if render_metrics else None
     })
 
 @app.route('/test-connection')
@@ -126,56 +172,156 @@ def generate_pdf():
                 'message': 'PDF library not installed'
             }), 501
         
-        # Extract data from request
-        analysis = data.get('analysis', {})
-        line_items = data.get('lineItems', [])
-        customer_info = data.get('customerInfo', {})
-        total_amount = data.get('totalAmount', 0)
-        
-        # Prepare data for PDF generator
-        estimate_data = {
-            'date': datetime.now().strftime('%m/%d/%Y'),
-            'customer_name': customer_info.get('name', 'N/A'),
-            'customer_address': customer_info.get('address', 'N/A'),
-            'customer_phone': customer_info.get('phone', 'N/A'),
-            'customer_email': customer_info.get('email', 'N/A'),
-            'assessment': {
-                'damage_type': analysis.get('damage_type', 'N/A'),
-                'severity': analysis.get('severity', 'N/A'),
-                'affected_area': analysis.get('affected_area_sqft', 0),
-                'classification': analysis.get('classification', {})
-            },
-            'line_items': [
-                {
-                    'description': item.get('description', ''),
-                    'quantity': item.get('quantity', 1),
-                    'unit_price': item.get('unitPrice', item.get('total', 0)),
-                    'total': item.get('total', 0)
-                }
-                for item in line_items
-            ],
-            'markup': data.get('markup', 0),
-            'equipment': data.get('equipment', []),
-            'photos': data.get('photos', [])
-        }
+        # Rendering engine: 'platypus' (default) or the faster 'canvas'
+        engine = request.args.get('engine', data.get('engine', 'platypus'))
+        if engine not in ENGINES:
+            return jsonify({
+                'error': 'Invalid engine',
+                'message': f"Engine must be one of: {', '.join(ENGINES)}"
+            }), 400
         
-        # Generate PDF
-        pdf_gen = PDFGenerator()
-        pdf_bytes = pdf_gen.generate_estimate_pdf(estimate_data)
+        # Response format: 'binary' (whole PDF) or 'stream' (chunked from a spool file)
+        response_format = request.args.get('format', data.get('format', 'binary'))
+        if response_format not in PDF_RESPONSE_FORMATS:
+            return jsonify({
+                'error': 'Invalid format',
+                'message': f"Format must be one of: {', '.join(PDF_RESPONSE_FORMATS)}"
+            }), 400
+        
+        # Output profile: 'standard' or 'size' (photos stepped down until the
+        # PDF fits max_bytes; giving max_bytes implies the size profile)
+        profile = request.args.get('profile', data.get('profile', 'standard'))
+        if profile not in PDF_PROFILES:
+            return jsonify({
+                'error': 'Invalid profile',
+                'message': f"Profile must be one of: {', '.join(PDF_PROFILES)}"
+            }), 400
+        max_bytes = request.args.get('max_bytes', data.get('max_bytes'))
+        if max_bytes is not None or profile == 'size':
+            try:
+                max_bytes = int(max_bytes) if max_bytes is not None else PDF_SIZE_BUDGET
+            except (TypeError, ValueError):
+                max_bytes = 0
+            if max_bytes <= 0:
+                return jsonify({
+                    'error': 'Invalid max_bytes',
+                    'message': 'max_bytes must be a positive number of bytes'
+                }), 400
+        
+        # Opt-in per-stage timings ('timings' or 'allocations'), returned
+        # as a Server-Timing header
+        instrument = request.args.get('instrument', data.get('instrument'))
+        if instrument is not None and instrument not in INSTRUMENT_MODES:
+            return jsonify({
+                'error': 'Invalid instrument',
+                'message': f"Instrument must be one of: {', '.join(INSTRUMENT_MODES)}"
+            }), 400
+        timings = new_timings(instrument)
+        
+        # Prepare data for PDF generator; output is deterministic, so the
+        # canonical estimate hash is a strong ETag for the PDF
+        estimate_data = canonical_estimate(build_estimate_data(data))
+        etag = estimate_etag(estimate_data, engine, max_bytes)
+        
+        # Client already has this exact PDF
+        if etag in request.if_none_match:
+            return '', 304, {'ETag': f'"{etag}"'}
         
         # Generate filename
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         filename = f"estimate_{timestamp}.pdf"
-        
-        return pdf_bytes, 200, {
+        headers = {
             'Content-Type': 'application/pdf',
-            'Content-Disposition': f'attachment; filename={filename}'
+            'Content-Disposition': f'attachment; filename={filename}',
+            'ETag': f'"{etag}"'
         }
         
+        if response_format == 'stream' and max_bytes is None:
+            # Cached PDFs are already in memory; anything else is streamed
+            # from the spool without being cached
+            pdf_bytes = pdf_cache.get(etag)
+            if pdf_bytes is None:
+                size, chunks = get_pdf_generator().stream_estimate_pdf(estimate_data, engine=engine,
+                                                                        deterministic=True, timings=timings)
+                headers['Content-Length'] = str(size)
+                if timings is not None:
+                    headers['Server-Timing'] = timings.server_timing()
+                headers['X-PDF-Cache'] = 'miss'
+                return Response(chunks, 200, headers, direct_passthrough=True)
+            cached = True
+        else:
+            # Generate PDF (or serve it from the render cache)
+            pdf_bytes, etag, cached = render_estimate_pdf(estimate_data, engine=engine, etag=etag,
+                                                          max_bytes=max_bytes, timings=timings)
+        
+        headers['X-PDF-Cache'] = 'hit' if cached else 'miss'
+        if timings is not None and timings.renders:
+            headers['Server-Timing'] = timings.server_timing()
+        if max_bytes is not None:
+            sections = pdf_size_breakdown(pdf_bytes)['sections']
+            headers['X-PDF-Sections'] = ', '.join(f"{name}={size}" for name, size in sections.items())
+        return pdf_bytes, 200, headers
+        
     except Exception as e:
         logger.error(f"PDF generation error: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/generate-pdf/batch', methods=['POST'])
+def generate_pdf_batch():
+    """Render many estimates in parallel; stream back a ZIP or NDJSON results"""
+    try:
+        data = request.json
+        
+        if not HAS_PDF:
+            return jsonify({
+                'error': 'PDF generation not available',
+                'message': 'PDF library not installed'
+            }), 501
+        
+        estimates = data.get('estimates')
+        if not isinstance(estimates, list) or not estimates:
+            return jsonify({
+                'error': 'Invalid batch',
+                'message': 'Body must contain a non-empty "estimates" list'
+            }), 400
+        if len(estimates) > MAX_BATCH_SIZE:
+            return jsonify({
+                'error': 'Batch too large',
+                'message': f'At most {MAX_BATCH_SIZE} estimates per batch'
+            }), 413
+        
+        engine = request.args.get('engine', data.get('engine', 'platypus'))
+        if engine not in ENGINES:
+            return jsonify({
+                'error': 'Invalid engine',
+                'message': f"Engine must be one of: {', '.join(ENGINES)}"
+            }), 400
+        
+        # Response format: 'zip' (default) or 'ndjson' (one result line per estimate)
+        response_format = request.args.get('format', data.get('format', 'zip'))
+        if response_format not in BATCH_FORMATS:
+            return jsonify({
+                'error': 'Invalid format',
+                'message': f"Format must be one of: {', '.join(BATCH_FORMATS)}"
+            }), 400
+        
+        estimates = [build_estimate_data(estimate) for estimate in estimates]
+        logger.info(f"Rendering batch of {len(estimates)} estimates ({engine}, {response_format})")
+        
+        if response_format == 'ndjson':
+            return Response(iter_batch_ndjson(estimates, engine=engine), 200,
+                            {'Content-Type': 'application/x-ndjson'})
+        
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        return Response(iter_batch_zip(estimates, engine=engine), 200, {
+            'Content-Type': 'application/zip',
+            'Content-Disposition': f'attachment; filename=estimates_{timestamp}.zip'
+        })
+        
+    except Exception as e:
+        logger.error(f"Batch PDF generation error: {e}")
+        return jsonify({'error': str(e)}), 500
+
 @app.errorhandler(404)
 def not_found(error):
     return jsonify({'error': 'Not found'}), 404
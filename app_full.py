@@ -4,13 +4,15 @@ Flask server for RestoreDoc - AI-Powered Restoration Estimation Platform
 
 import os
 import sys
-import json
 import base64
 import logging
 import socket
+import time
+import threading
 from datetime import datetime
 from typing import Dict, Any, List, Optional
 import traceback
+from tempfile import SpooledTemporaryFile
 
 # Only print startup messages when running directly
 IS_MAIN = __name__ == '__main__'
@@ -24,7 +26,7 @@ if IS_MAIN:
     print("=" * 60)
 
 try:
-    from flask import Flask, request, jsonify, send_from_directory, render_template_string
+    from flask import Flask, Request, Response, request, jsonify, send_from_directory, render_template_string
     if IS_MAIN:
         print("✓ Flask imported successfully")
 except ImportError as e:
@@ -65,12 +67,23 @@ except ImportError as e:
     sys.exit(1)
 
 try:
-    from pdf_generator import PDFGenerator
+    from pdf_generator import get_pdf_generator, ENGINES
+    from pdf_batch import iter_batch_zip, iter_batch_ndjson, BATCH_FORMATS, MAX_BATCH_SIZE
+    from photo_processing import thumbnail_cache
+    from pdf_cache import pdf_cache, canonical_estimate, estimate_etag, render_estimate_pdf
+    from pdf_size import PDF_PROFILES, PDF_SIZE_BUDGET, pdf_size_breakdown
+    from render_metrics import INSTRUMENT_MODES, new_timings, render_metrics
     print("✓ PDF Generator imported successfully")
 except ImportError as e:
+    thumbnail_cache = None
+    pdf_cache = None
+    render_metrics = None
     print("✗ Failed to import PDF Generator:", e)
     print("  PDF generation will not be available")
 
+# Rule-based estimates need nothing beyond the standard library
+from local_estimator import local_estimate, parse_estimate_params, DEFAULT_AREA_SQFT
+
 # Load environment variables
 print("\n" + "-" * 40)
 print("Loading environment variables...")
@@ -147,38 +160,59 @@ except Exception as e:
 
 # Configuration
 app.config['MAX_CONTENT_LENGTH'] = 20 * 1024 * 1024  # 20MB max file size
-app.config['UPLOAD_FOLDER'] = 'temp_uploads'
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
+PDF_RESPONSE_FORMATS = ('json', 'binary', 'stream')
+
+
+class UploadRequest(Request):
+    """Keeps uploaded files in memory
+
+    Werkzeug spools uploads over 500 KB (any phone photo) to a temporary
+    file; a request is already capped at MAX_CONTENT_LENGTH, so spool up to
+    that instead and never touch the disk.
+    """
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return SpooledTemporaryFile(max_size=app.config['MAX_CONTENT_LENGTH'], mode='rb+')
+
 
-# Initialize OpenAI client
+app.request_class = UploadRequest
+
+# Initialize OpenAI client (after .env is loaded, which can tune its pool)
 print("\n" + "-" * 40)
 print("Initializing OpenAI client...")
 try:
-    if openai_key:
-        openai.api_key = openai_key
-        # Try to initialize the new client
-        try:
-            openai_client = openai.OpenAI(api_key=openai_key)
-            print("✓ OpenAI client initialized (new SDK)")
-        except:
-            print("✓ OpenAI API key set (legacy SDK)")
+    import httpx
+    from openai_client import get_openai_client, openai_client_stats, OPENAI_MODEL, OPENAI_TIMEOUT
+    from vision_images import prepare_vision_images, vision_metrics, VISION_DETAIL
+    from analysis_cache import analysis_cache, analysis_key, get_cached_analysis, cache_analysis
+    from analysis_jobs import get_analysis_jobs, iter_job_events, JobQueueFull, ANALYSIS_JOB_TTL
+    from streaming_json import IncrementalJSONParser
+    from single_flight import SingleFlight
+    from analysis_fanout import (group_photos, fan_out, merge_analyses, ANALYSIS_MODES, FANOUT_AREAS,
+                                 ANALYSIS_FANOUT_GROUP_SIZE, ANALYSIS_FANOUT_MIN_PHOTOS)
+    from upstream_limiter import (vision_limiter, UpstreamBusy, DeadlineExceeded, retry_after_seconds,
+                                  time_left, ANALYSIS_DEADLINE)
+    from hedging import vision_hedger, AttemptLost
+    from circuit_breaker import vision_breaker, CircuitOpen
+    # Identical analyses in flight at once share one upstream call
+    analysis_flights = SingleFlight()
+    if get_openai_client():
+        print("✓ OpenAI client initialized (shared connection pool)")
     else:
         print("⚠ Skipping OpenAI initialization (no API key)")
 except Exception as e:
+    openai_client_stats = None
+    vision_metrics = None
+    analysis_cache = None
+    get_analysis_jobs = None
+    analysis_flights = None
+    vision_limiter = None
+    vision_hedger = None
+    vision_breaker = None
     print(f"✗ Error initializing OpenAI: {e}")
     traceback.print_exc()
 
-# Create upload folder if it doesn't exist
-upload_path = app.config['UPLOAD_FOLDER']
-if not os.path.exists(upload_path):
-    try:
-        os.makedirs(upload_path)
-        print(f"✓ Created upload folder: {upload_path}")
-    except Exception as e:
-        print(f"✗ Failed to create upload folder: {e}")
-else:
-    print(f"✓ Upload folder exists: {upload_path}")
-
 # Create generated_pdfs folder if it doesn't exist
 pdf_path = 'generated_pdfs'
 if not os.path.exists(pdf_path):
@@ -197,10 +231,10 @@ def allowed_file(filename: str) -> bool:
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def encode_image(image_path: str) -> str:
-    """Encode image to base64 string"""
-    with open(image_path, "rb") as image_file:
-        return base64.b64encode(image_file.read()).decode('utf-8')
+def read_upload(upload) -> bytes:
+    """The bytes of an uploaded file, straight from its in-memory stream"""
+    upload.stream.seek(0)
+    return upload.stream.read()
 
 def get_damage_analysis_prompt(damage_type: str) -> str:
     """Get the appropriate prompt based on damage type"""
@@ -315,6 +349,296 @@ def get_damage_analysis_prompt(damage_type: str) -> str:
     
     return prompts.get(damage_type, prompts['water'])
 
+# Bump whenever the prompts or model parameters change so cached analyses are never served
+PROMPT_VERSION = 1
+
+def parse_analysis_request():
+    """Validate an analysis upload
+
+    Returns (analysis, None), analysis holding damage_type, photo_data
+    ((bytes, mimetype) pairs), photo_count, mode, separate_areas, cache_key, bypass,
+    deadline (a time.monotonic() value) and fallback (local estimator
+    arguments for a degraded answer), or (None, error_response).
+    """
+    # Check if OpenAI API key is configured
+    if not os.getenv('OPENAI_API_KEY'):
+        return None, (jsonify({
+            'error': 'OpenAI API key not configured',
+            'message': 'Please set OPENAI_API_KEY in your .env file'
+        }), 500)
+
+    # Get damage type from request
+    damage_type = request.form.get('damage_type', 'water')
+    if damage_type not in ['water', 'fire', 'mold']:
+        return None, (jsonify({
+            'error': 'Invalid damage type',
+            'message': 'Damage type must be water, fire, or mold'
+        }), 400)
+
+    # Check if photos were uploaded
+    photos = request.files.getlist('photos')
+    if not photos:
+        return None, (jsonify({
+            'error': 'No photos provided',
+            'message': 'Please upload at least one photo'
+        }), 400)
+
+    photo_data = [
+        (read_upload(photo), photo.mimetype if photo.mimetype.startswith('image/') else 'image/jpeg')
+        for photo in photos if photo and allowed_file(photo.filename)
+    ]
+    if not photo_data:
+        return None, (jsonify({
+            'error': 'No valid images provided',
+            'message': 'Please upload valid image files (jpg, png, webp)'
+        }), 400)
+
+    # Large uploads can be analysed a few photos at a time and merged
+    mode = request.form.get('mode')
+    if not mode:
+        fan_out_photos = ANALYSIS_FANOUT_MIN_PHOTOS and len(photo_data) >= ANALYSIS_FANOUT_MIN_PHOTOS
+        mode = 'fanout' if fan_out_photos else 'single'
+    if mode not in ANALYSIS_MODES:
+        return None, (jsonify({
+            'error': 'Invalid analysis mode',
+            'message': 'Mode must be single or fanout'
+        }), 400)
+    if len(photo_data) <= ANALYSIS_FANOUT_GROUP_SIZE:
+        # One group is the same call as a single analysis
+        mode = 'single'
+    # Fanned-out groups overlap unless the client says each shows a separate area
+    fanout_areas = request.form.get('fanout_areas', 'overlapping')
+    if fanout_areas not in FANOUT_AREAS:
+        return None, (jsonify({
+            'error': 'Invalid fanout_areas',
+            'message': f"fanout_areas must be one of: {', '.join(FANOUT_AREAS)}"
+        }), 400)
+    key_mode = f"fanout{ANALYSIS_FANOUT_GROUP_SIZE}-{fanout_areas}" if mode == 'fanout' else mode
+
+    # The analysis gives up after ANALYSIS_DEADLINE seconds, or sooner if the client asks
+    timeout = ANALYSIS_DEADLINE
+    if request.headers.get('X-Analysis-Deadline'):
+        try:
+            timeout = min(timeout, float(request.headers['X-Analysis-Deadline']))
+        except ValueError:
+            timeout = 0
+        if not timeout > 0:
+            return None, (jsonify({
+                'error': 'Invalid deadline',
+                'message': 'X-Analysis-Deadline must be a positive number of seconds'
+            }), 400)
+
+    return {
+        'damage_type': damage_type,
+        'photo_data': photo_data,
+        'photo_count': len(photos),
+        'mode': mode,
+        'separate_areas': fanout_areas == 'separate',
+        'cache_key': analysis_key([data for data, _ in photo_data], damage_type, PROMPT_VERSION, OPENAI_MODEL,
+                                  key_mode),
+        'bypass': request.headers.get('X-Analysis-Cache', '').lower() == 'bypass',
+        'deadline': time.monotonic() + timeout,
+        'fallback': fallback_estimate_params(damage_type)
+    }, None
+
+def fallback_estimate_params(damage_type):
+    """Local estimator arguments from the request's form, for when the vision API is unavailable
+
+    The form can carry the same details as /api/estimate-local. Without an
+    affected_area_sqft a default area is assumed, and the result says so.
+    """
+    values = request.form.to_dict()
+    area_assumed = not values.get('affected_area_sqft')
+    if area_assumed:
+        values['affected_area_sqft'] = DEFAULT_AREA_SQFT[damage_type]
+    try:
+        params = parse_estimate_params(damage_type, values)
+    except ValueError as e:
+        logger.debug(f"Ignoring estimate details for the fallback: {e}")
+        area_assumed = True
+        params = {'area_sqft': DEFAULT_AREA_SQFT[damage_type]}
+    return dict(params, area_assumed=area_assumed)
+
+def degraded_analysis(analysis, error):
+    """A local estimate standing in for the vision analysis while the circuit is open"""
+    logger.warning(f"Answering {analysis['damage_type']} analysis from local estimates: {error}")
+    params = dict(analysis['fallback'])
+    area_assumed = params.pop('area_assumed')
+    analysis_json = local_estimate(analysis['damage_type'], **params)
+    analysis_json['degraded'] = True
+    analysis_json['degraded_reason'] = 'AI analysis is temporarily unavailable; this is a rule-based estimate'
+    analysis_json['area_assumed'] = area_assumed
+    return add_analysis_metadata(analysis_json, analysis['photo_count'])
+
+def add_analysis_metadata(analysis_json: Dict[str, Any], photo_count: int) -> Dict[str, Any]:
+    """Stamp an analysis with when it was returned and how many photos it covers"""
+    analysis_json['analysis_timestamp'] = datetime.now().isoformat()
+    analysis_json['photo_count'] = photo_count
+    return analysis_json
+
+def run_damage_analysis(photo_data: List[tuple], damage_type: str, progress=None, on_partial=None,
+                        deadline=None) -> Dict[str, Any]:
+    """Analyze (bytes, mimetype) photos with the vision model
+
+    progress, if given, is called with 'preparing' and then 'analyzing'.
+    The completion is streamed, and on_partial, if given, is called with
+    the fields complete so far each time one completes; top-level lists
+    such as line_items grow an item at a time. DeadlineExceeded is raised
+    if the analysis is still running at deadline (a time.monotonic() value),
+    and CircuitOpen if the vision API circuit breaker is open.
+    """
+    # Don't prepare photos for a call the breaker would refuse
+    vision_breaker.check()
+
+    # Straighten, downscale and encode the photos for the model
+    if progress:
+        progress('preparing')
+    images = prepare_vision_images(photo_data)
+
+    # Prepare messages for OpenAI Vision API
+    prompt = get_damage_analysis_prompt(damage_type)
+    
+    messages = [
+        {
+            "role": "system",
+            "content": "You are an expert restoration contractor specializing in damage assessment following IICRC standards. Analyze the provided images and return only valid JSON data."
+        },
+        {
+            "role": "user",
+            "content": [
+                {
+                    "type": "text",
+                    "text": prompt
+                }
+            ]
+        }
+    ]
+    
+    # Add images to the message
+    for image in images:
+        messages[1]["content"].append({
+            "type": "image_url",
+            "image_url": {
+                "url": image.url,
+                "detail": VISION_DETAIL
+            }
+        })
+
+    # Call OpenAI Vision API
+    logger.info(f"Calling OpenAI Vision API for {damage_type} damage analysis")
+    if progress:
+        progress('analyzing')
+    
+    def stream_completion(race, attempt):
+        """One attempt at the call; returns (chunks, parser, first_field_ms)"""
+        call_start = time.perf_counter()
+        remaining = time_left(deadline)
+        if remaining is not None and remaining <= 0:
+            raise DeadlineExceeded("Deadline passed before the vision call started")
+        timeout = OPENAI_TIMEOUT if remaining is None else min(OPENAI_TIMEOUT, remaining)
+        try:
+            return read_completion(race, attempt, call_start, timeout)
+        except (openai.APITimeoutError, httpx.TimeoutException) as e:
+            if timeout < OPENAI_TIMEOUT:
+                # The request's deadline cut the call short, not a slow API
+                raise DeadlineExceeded("Deadline passed while waiting for the vision model") from e
+            raise
+
+    def read_completion(race, attempt, call_start, timeout):
+        stream = get_openai_client().with_options(max_retries=0, timeout=timeout).chat.completions.create(
+            model=OPENAI_MODEL,
+            messages=messages,
+            max_tokens=2000,
+            temperature=0.3,
+            stream=True
+        )
+        race.register(attempt, stream)
+
+        # Parse the response as it streams in; code fences around the JSON are skipped
+        parser = IncrementalJSONParser()
+        partial = {}
+        chunks = []
+        first_field_ms = None
+        for chunk in stream:
+            if deadline is not None and time.monotonic() > deadline:
+                stream.close()
+                raise DeadlineExceeded("Deadline passed while the vision model was responding")
+            text = chunk.choices[0].delta.content if chunk.choices else None
+            if not text:
+                continue
+            if not chunks:
+                # Only the first attempt to produce output carries on
+                if not race.claim(attempt):
+                    stream.close()
+                    raise AttemptLost()
+                vision_hedger.first_output.observe((time.perf_counter() - call_start) * 1000)
+            chunks.append(text)
+            if parser is None:
+                continue
+            try:
+                events = parser.feed(text)
+            except ValueError:
+                # Malformed; keep the text for the fallback below
+                parser = None
+                continue
+            for event in events:
+                if event[0] == 'field':
+                    partial[event[1]] = event[2]
+                else:
+                    partial.setdefault(event[1], []).append(event[3])
+            if events:
+                if first_field_ms is None:
+                    first_field_ms = (time.perf_counter() - call_start) * 1000
+                if on_partial:
+                    on_partial(dict(partial))
+        return chunks, parser, first_field_ms
+
+    # The limiter queues, paces and retries calls (the SDK's own retries are off); the
+    # hedger sends a second attempt when the first is slow to start streaming, and the
+    # breaker stops calling an API that keeps failing
+    call_start = time.perf_counter()
+    try:
+        chunks, parser, first_field_ms = vision_breaker.run(
+            vision_hedger.run,
+            lambda race, attempt: vision_limiter.run(stream_completion, race, attempt, deadline=deadline),
+            deadline=deadline,
+            can_hedge=vision_limiter.has_capacity
+        )
+    except (DeadlineExceeded, openai.APITimeoutError, httpx.TimeoutException):
+        vision_metrics.observe_timeout((time.perf_counter() - call_start) * 1000)
+        raise
+    vision_metrics.observe_call((time.perf_counter() - call_start) * 1000, first_field_ms)
+    analysis_text = ''.join(chunks)
+    
+    # Try to extract JSON from the response
+    try:
+        if parser is None:
+            raise ValueError("Malformed JSON")
+        analysis_json = parser.close()
+    except ValueError:
+        # If parsing fails, create a default response
+        logger.error(f"Failed to parse OpenAI response as JSON: {analysis_text}")
+        analysis_json = {
+            "damage_type": damage_type,
+            "error": "Failed to parse AI response",
+            "raw_response": analysis_text,
+            "affected_area_sqft": 500,
+            "severity": "moderate",
+            "total_estimate": 2500,
+            "confidence_percent": 50,
+            "line_items": [
+                {
+                    "description": f"{damage_type.capitalize()} damage assessment - manual review required",
+                    "quantity": 500,
+                    "unit": "sqft",
+                    "unitPrice": 5.00,
+                    "category": "Assessment"
+                }
+            ]
+        }
+
+    return analysis_json
+
 @app.route('/')
 def index():
     """Serve the main index-editable.html file"""
@@ -375,7 +699,6 @@ def test_connection():
             "supabase_url": os.getenv('SUPABASE_URL', 'Not configured'),
             "debug_mode": app.debug,
             "cors_enabled": True,
-            "upload_folder": app.config.get('UPLOAD_FOLDER'),
             "max_content_length": app.config.get('MAX_CONTENT_LENGTH')
         },
         "files": {
@@ -397,7 +720,20 @@ def health():
         'environment': {
             'openai_configured': bool(os.getenv('OPENAI_API_KEY')),
             'supabase_configured': bool(os.getenv('SUPABASE_URL'))
-        }
+        },
+        'caches': {
+            'thumbnails': thumbnail_cache.stats() if thumbnail_cache else None,
+            'pdfs': pdf_cache.stats() if pdf_cache else None,
+            'analyses': analysis_cache.stats() if analysis_cache else None
+        },
+        'render_stages': render_metrics.stats() if render_metrics else None,
+        'openai_client': openai_client_stats() if openai_client_stats else None,
+        'vision_images': vision_metrics.stats() if vision_metrics else None,
+        'analysis_jobs': get_analysis_jobs().stats() if get_analysis_jobs else None,
+        'analysis_flights': analysis_flights.stats() if analysis_flights else None,
+        'upstream_limiter': vision_limiter.stats() if vision_limiter else None,
+        'hedging': vision_hedger.stats() if vision_hedger else None,
+        'circuit_breaker': vision_breaker.stats() if vision_breaker else None
     })
 
 @app.route('/api/analyze-damage', methods=['POST'])
@@ -406,143 +742,51 @@ def analyze_damage():
     Analyze damage from uploaded photos using OpenAI Vision API
     """
     try:
-        # Check if OpenAI API key is configured
-        if not os.getenv('OPENAI_API_KEY'):
-            return jsonify({
-                'error': 'OpenAI API key not configured',
-                'message': 'Please set OPENAI_API_KEY in your .env file'
-            }), 500
-
-        # Get damage type from request
-        damage_type = request.form.get('damage_type', 'water')
-        if damage_type not in ['water', 'fire', 'mold']:
-            return jsonify({
-                'error': 'Invalid damage type',
-                'message': 'Damage type must be water, fire, or mold'
-            }), 400
-
-        # Check if photos were uploaded
-        if 'photos' not in request.files:
-            return jsonify({
-                'error': 'No photos provided',
-                'message': 'Please upload at least one photo'
-            }), 400
-
-        photos = request.files.getlist('photos')
-        if not photos or len(photos) == 0:
-            return jsonify({
-                'error': 'No photos provided',
-                'message': 'Please upload at least one photo'
-            }), 400
-
-        # Process and save uploaded photos
-        image_paths = []
-        base64_images = []
-        
-        for photo in photos:
-            if photo and allowed_file(photo.filename):
-                filename = secure_filename(photo.filename)
-                filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-                photo.save(filepath)
-                image_paths.append(filepath)
-                
-                # Encode image to base64
-                base64_image = encode_image(filepath)
-                base64_images.append(base64_image)
-
-        if not base64_images:
-            return jsonify({
-                'error': 'No valid images provided',
-                'message': 'Please upload valid image files (jpg, png, webp)'
-            }), 400
+        analysis, error_response = parse_analysis_request()
+        if error_response:
+            return error_response
 
-        # Prepare messages for OpenAI Vision API
-        prompt = get_damage_analysis_prompt(damage_type)
-        
-        messages = [
-            {
-                "role": "system",
-                "content": "You are an expert restoration contractor specializing in damage assessment following IICRC standards. Analyze the provided images and return only valid JSON data."
-            },
-            {
-                "role": "user",
-                "content": [
-                    {
-                        "type": "text",
-                        "text": prompt
-                    }
-                ]
-            }
-        ]
-        
-        # Add images to the message
-        for base64_image in base64_images:
-            messages[1]["content"].append({
-                "type": "image_url",
-                "image_url": {
-                    "url": f"data:image/jpeg;base64,{base64_image}",
-                    "detail": "high"
-                }
-            })
+        # Clients that accept server-sent events get fields as soon as the model produces them
+        if request.accept_mimetypes.best == 'text/event-stream':
+            try:
+                job, cache_status = queue_analysis(analysis)
+            except JobQueueFull as e:
+                return queue_full_response(e)
+            response = job_events_response(job)
+            response.headers['X-Analysis-Cache'] = cache_status
+            return response
 
-        # Call OpenAI Vision API
-        logger.info(f"Calling OpenAI Vision API for {damage_type} damage analysis")
-        
-        client = openai.OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
-        response = client.chat.completions.create(
-            model="gpt-4-vision-preview",
-            messages=messages,
-            max_tokens=2000,
-            temperature=0.3
-        )
+        # Resubmitted photos are answered from the cache unless the client opts out
+        analysis_json = None if analysis['bypass'] else get_cached_analysis(analysis['cache_key'])
+        if analysis_json is not None:
+            cache_status = 'hit'
+            logger.info(f"Returning cached {analysis['damage_type']} damage analysis")
+        else:
+            analysis_json, shared = analyze_once(analysis)
+            cache_status = 'coalesced' if shared else 'bypass' if analysis['bypass'] else 'miss'
 
-        # Parse the response
-        analysis_text = response.choices[0].message.content
+        logger.info(f"Successfully analyzed {analysis['damage_type']} damage")
         
-        # Try to extract JSON from the response
-        try:
-            # Remove any markdown formatting
-            analysis_text = analysis_text.replace('```json', '').replace('```', '').strip()
-            analysis_json = json.loads(analysis_text)
-        except json.JSONDecodeError:
-            # If parsing fails, create a default response
-            logger.error(f"Failed to parse OpenAI response as JSON: {analysis_text}")
-            analysis_json = {
-                "damage_type": damage_type,
-                "error": "Failed to parse AI response",
-                "raw_response": analysis_text,
-                "affected_area_sqft": 500,
-                "severity": "moderate",
-                "total_estimate": 2500,
-                "confidence_percent": 50,
-                "line_items": [
-                    {
-                        "description": f"{damage_type.capitalize()} damage assessment - manual review required",
-                        "quantity": 500,
-                        "unit": "sqft",
-                        "unitPrice": 5.00,
-                        "category": "Assessment"
-                    }
-                ]
-            }
-
-        # Clean up temporary files
-        for filepath in image_paths:
-            try:
-                os.remove(filepath)
-            except:
-                pass
+        response = jsonify({
+            'success': True,
+            'analysis': add_analysis_metadata(analysis_json, analysis['photo_count'])
+        })
+        response.headers['X-Analysis-Cache'] = cache_status
+        return response
 
-        # Add metadata to response
-        analysis_json['analysis_timestamp'] = datetime.now().isoformat()
-        analysis_json['photo_count'] = len(photos)
-        
-        logger.info(f"Successfully analyzed {damage_type} damage")
-        
-        return jsonify({
+    except CircuitOpen as e:
+        # The API is failing; answer at once from local estimates instead of waiting on it
+        response = jsonify({
             'success': True,
-            'analysis': analysis_json
+            'degraded': True,
+            'analysis': degraded_analysis(analysis, e)
         })
+        response.headers['X-Analysis-Degraded'] = 'circuit-open'
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response
+
+    except (openai.RateLimitError, UpstreamBusy, DeadlineExceeded, openai.APITimeoutError) as e:
+        return upstream_error_response(e)
 
     except openai.APIError as e:
         logger.error(f"OpenAI API error: {str(e)}")
@@ -558,6 +802,257 @@ def analyze_damage():
             'message': str(e)
         }), 500
 
+def upstream_error(error):
+    """(status, error body, retry_after) for a throttled, saturated or slow upstream
+
+    retry_after is None when retrying straight away is as good as waiting.
+    """
+    if isinstance(error, (DeadlineExceeded, openai.APITimeoutError)):
+        logger.warning(f"Vision call timed out: {error}")
+        return 504, {
+            'error': 'Analysis timed out',
+            'message': 'The AI service did not finish the analysis in time, please retry'
+        }, None
+    if isinstance(error, UpstreamBusy):
+        logger.warning(f"Vision call not started: {error}")
+        return 503, {
+            'error': 'Analysis capacity exhausted',
+            'message': 'Too many analyses are waiting for the AI service, please retry shortly'
+        }, error.retry_after
+    logger.warning(f"Vision call rate limited after retries: {error}")
+    return 429, {
+        'error': 'AI service rate limited',
+        'message': 'The AI service is rate limiting requests, please retry shortly'
+    }, round(retry_after_seconds(error) or 30)
+
+def upstream_error_response(error):
+    status, body, retry_after = upstream_error(error)
+    response = jsonify(body)
+    response.status_code = status
+    if retry_after is not None:
+        response.headers['Retry-After'] = str(retry_after)
+    return response
+
+def analyze_once(analysis, progress=None, on_partial=None):
+    """Run and cache an analysis, sharing one upstream call between identical concurrent requests
+
+    Returns (analysis_json, shared); shared is True when another request's
+    call produced it. progress and on_partial hear from the shared call
+    whichever request started it, and each request waits only until its own
+    deadline.
+    """
+    def analyze(publish):
+        # A request that joins this call later hears its events too
+        def progress_all(status):
+            publish('progress', status)
+
+        def partial_all(partial):
+            publish('partial', partial)
+
+        if analysis['mode'] == 'fanout':
+            analysis_json = run_fanout_analysis(analysis, progress=progress_all, on_partial=partial_all)
+        else:
+            analysis_json = run_damage_analysis(analysis['photo_data'], analysis['damage_type'],
+                                                progress=progress_all, on_partial=partial_all,
+                                                deadline=analysis['deadline'])
+        # A merge missing some photos is returned but not kept
+        if not analysis_json.get('failed_photos'):
+            cache_analysis(analysis['cache_key'], analysis_json)
+        return analysis_json
+
+    def on_event(kind, value):
+        if kind == 'progress' and progress:
+            progress(value)
+        elif kind == 'partial' and on_partial:
+            on_partial(value)
+
+    analysis_json, shared = analysis_flights.do(analysis['cache_key'], analyze, deadline=analysis['deadline'],
+                                                on_event=on_event if progress or on_partial else None)
+    if shared:
+        logger.info(f"Shared an in-flight {analysis['damage_type']} damage analysis")
+    return analysis_json, shared
+
+def run_fanout_analysis(analysis, progress=None, on_partial=None):
+    """Analyze a fan-out request's photo groups concurrently and merge the results
+
+    Each group is an ordinary single analysis, so it is cached and
+    coalesced under its own key. The merged analysis lists every group's
+    photos, latency and cache status in photo_analyses; groups that failed
+    are also listed in failed_photos. on_partial, if given, is called with
+    the merge of the groups finished so far as each one finishes.
+    """
+    damage_type = analysis['damage_type']
+    groups = group_photos(analysis['photo_data'])
+    if progress:
+        progress('analyzing')
+    logger.info(f"Fanning out {len(analysis['photo_data'])} photos of {damage_type} damage "
+                f"into {len(groups)} analyses")
+
+    def analyze_group(photos):
+        group = dict(analysis, photo_data=photos, mode='single', cache_key=analysis_key(
+            [data for data, _ in photos], damage_type, PROMPT_VERSION, OPENAI_MODEL))
+        analysis_json = None if group['bypass'] else get_cached_analysis(group['cache_key'])
+        if analysis_json is not None:
+            return analysis_json, 'hit'
+        analysis_json, shared = analyze_once(group)
+        return analysis_json, 'coalesced' if shared else 'bypass' if group['bypass'] else 'miss'
+
+    finished = {}
+    finished_lock = threading.Lock()
+
+    def group_finished(index, result, error, latency_ms):
+        if not on_partial or error is not None or 'error' in result[0]:
+            return
+        with finished_lock:
+            finished[index] = result[0]
+            so_far = [finished[i] for i in sorted(finished)]
+            on_partial(merge_analyses(damage_type, so_far, analysis['separate_areas']))
+
+    outcomes = fan_out(analyze_group, groups, on_result=group_finished)
+
+    photo_analyses = []
+    merged_from = []
+    failed_photos = []
+    first_error = None
+    for (indices, _), (result, error, latency_ms) in zip(groups, outcomes):
+        entry = {'photos': indices, 'latency_ms': round(latency_ms, 1)}
+        if error is not None:
+            logger.warning(f"Analysis of photos {indices} failed: {error}")
+            first_error = first_error or error
+            entry['error'] = str(error)
+        else:
+            analysis_json, entry['cache'] = result
+            if 'error' in analysis_json:
+                entry['error'] = analysis_json['error']
+            else:
+                merged_from.append(analysis_json)
+        if 'error' in entry:
+            failed_photos.extend(indices)
+        photo_analyses.append(entry)
+    logger.info("Fan-out latencies (ms): " + ', '.join(
+        f"{entry['photos']}={entry['latency_ms']:.0f}" for entry in photo_analyses))
+
+    if not merged_from:
+        if first_error is not None:
+            raise first_error
+        # Every group's answer was unusable; return the first group's fallback
+        analysis_json = outcomes[0][0][0]
+    else:
+        analysis_json = merge_analyses(damage_type, merged_from, analysis['separate_areas'])
+    analysis_json['photo_analyses'] = photo_analyses
+    if failed_photos:
+        analysis_json['failed_photos'] = failed_photos
+    return analysis_json
+
+def analyze_job(job, analysis):
+    """Background body of an analysis job"""
+    try:
+        analysis_json, _ = analyze_once(analysis, progress=job.update, on_partial=job.publish)
+    except CircuitOpen as e:
+        job.update('done', result=degraded_analysis(analysis, e))
+        return
+    except (openai.RateLimitError, UpstreamBusy, DeadlineExceeded, openai.APITimeoutError) as e:
+        _, error, retry_after = upstream_error(e)
+        if retry_after is not None:
+            error['retry_after'] = retry_after
+        job.update('failed', error=error)
+        return
+    except openai.APIError as e:
+        logger.error(f"OpenAI API error in job {job.id}: {str(e)}")
+        job.update('failed', error={'error': 'OpenAI API error', 'message': str(e)})
+        return
+    logger.info(f"Job {job.id} analyzed {analysis['damage_type']} damage")
+    job.update('done', result=add_analysis_metadata(analysis_json, analysis['photo_count']))
+
+def queue_analysis(analysis):
+    """Start a job for a parsed analysis request; return (job, cache_status)
+
+    A cached analysis comes back as a job that is already done. Raises
+    JobQueueFull when the pool has no room.
+    """
+    analysis_json = None if analysis['bypass'] else get_cached_analysis(analysis['cache_key'])
+    if analysis_json is not None:
+        return get_analysis_jobs().completed(add_analysis_metadata(analysis_json, analysis['photo_count'])), 'hit'
+    job = get_analysis_jobs().submit(analyze_job, analysis, key=analysis['cache_key'],
+                                     deadline=analysis['deadline'])
+    logger.info(f"Queued {analysis['damage_type']} analysis job {job.id}")
+    return job, 'bypass' if analysis['bypass'] else 'miss'
+
+def queue_full_response(error):
+    logger.warning(f"Refusing analysis job: {error}")
+    response = jsonify({
+        'error': 'Too many pending analyses',
+        'message': 'The analysis queue is full, please retry shortly'
+    })
+    response.status_code = 503
+    response.headers['Retry-After'] = '10'
+    return response
+
+def job_events_response(job):
+    return Response(iter_job_events(job), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+def job_response(job, status_code=200):
+    """JSON view of a job with links to poll it and follow its events"""
+    body = job.to_dict()
+    body['status_url'] = f"/api/analyze-damage/jobs/{job.id}"
+    body['events_url'] = f"/api/analyze-damage/jobs/{job.id}/events"
+    response = jsonify(body)
+    response.status_code = status_code
+    if status_code == 202:
+        response.headers['Location'] = body['status_url']
+    return response
+
+@app.route('/api/analyze-damage/jobs', methods=['POST'])
+def submit_analysis_job():
+    """
+    Start a damage analysis in the background and return its job id at once
+    """
+    try:
+        analysis, error_response = parse_analysis_request()
+        if error_response:
+            return error_response
+
+        try:
+            job, cache_status = queue_analysis(analysis)
+        except JobQueueFull as e:
+            return queue_full_response(e)
+
+        response = job_response(job, 202)
+        response.headers['X-Analysis-Cache'] = cache_status
+        return response
+
+    except Exception as e:
+        logger.error(f"Unexpected error in submit_analysis_job: {str(e)}")
+        return jsonify({
+            'error': 'Internal server error',
+            'message': str(e)
+        }), 500
+
+@app.route('/api/analyze-damage/jobs/<job_id>', methods=['GET'])
+def get_analysis_job(job_id):
+    """Current state of an analysis job, with its analysis once done"""
+    job = get_analysis_jobs().get(job_id)
+    if job is None:
+        return jsonify({
+            'error': 'Job not found',
+            'message': f'No analysis job {job_id} (finished jobs expire after {ANALYSIS_JOB_TTL} seconds)'
+        }), 404
+    return job_response(job)
+
+@app.route('/api/analyze-damage/jobs/<job_id>/events', methods=['GET'])
+def analysis_job_events(job_id):
+    """Server-sent events for an analysis job, ending when it finishes"""
+    job = get_analysis_jobs().get(job_id)
+    if job is None:
+        return jsonify({
+            'error': 'Job not found',
+            'message': f'No analysis job {job_id} (finished jobs expire after {ANALYSIS_JOB_TTL} seconds)'
+        }), 404
+    return job_events_response(job)
+
 @app.route('/api/mock-analyze', methods=['POST'])
 def mock_analyze():
     """
@@ -657,6 +1152,28 @@ def mock_analyze():
         'mock': True
     })
 
+@app.route('/api/estimate-local', methods=['POST'])
+def estimate_local():
+    """
+    Rule-based estimate from the area and damage details, without the vision model
+    """
+    values = request.get_json(silent=True) or request.form.to_dict()
+    damage_type = values.get('damage_type', 'water')
+    try:
+        params = parse_estimate_params(damage_type, values)
+    except ValueError as e:
+        return jsonify({
+            'error': 'Invalid estimate parameters',
+            'message': str(e)
+        }), 400
+
+    analysis = local_estimate(damage_type, **params)
+    analysis['analysis_timestamp'] = datetime.now().isoformat()
+    return jsonify({
+        'success': True,
+        'analysis': analysis
+    })
+
 @app.route('/api/generate-pdf', methods=['POST'])
 def generate_pdf():
     """
@@ -672,20 +1189,132 @@ def generate_pdf():
                 'message': 'Please provide estimate data'
             }), 400
         
-        # Initialize PDF generator
-        pdf_gen = PDFGenerator()
+        # Rendering engine: 'platypus' (default) or the faster 'canvas'
+        engine = request.args.get('engine', data.get('engine', 'platypus'))
+        if engine not in ENGINES:
+            return jsonify({
+                'error': 'Invalid engine',
+                'message': f"Engine must be one of: {', '.join(ENGINES)}"
+            }), 400
+        
+        # Response format: 'json' (base64 data URL, the default), 'binary'
+        # (raw PDF body) or 'stream' (spooled and sent in chunks)
+        response_format = request.args.get('format', data.get('format', 'json'))
+        if response_format not in PDF_RESPONSE_FORMATS:
+            return jsonify({
+                'error': 'Invalid format',
+                'message': f"Format must be one of: {', '.join(PDF_RESPONSE_FORMATS)}"
+            }), 400
+        
+        # Output profile: 'standard' or 'size' (photos stepped down until the
+        # PDF fits max_bytes; giving max_bytes implies the size profile)
+        profile = request.args.get('profile', data.get('profile', 'standard'))
+        if profile not in PDF_PROFILES:
+            return jsonify({
+                'error': 'Invalid profile',
+                'message': f"Profile must be one of: {', '.join(PDF_PROFILES)}"
+            }), 400
+        max_bytes = request.args.get('max_bytes', data.get('max_bytes'))
+        if max_bytes is not None or profile == 'size':
+            try:
+                max_bytes = int(max_bytes) if max_bytes is not None else PDF_SIZE_BUDGET
+            except (TypeError, ValueError):
+                max_bytes = 0
+            if max_bytes <= 0:
+                return jsonify({
+                    'error': 'Invalid max_bytes',
+                    'message': 'max_bytes must be a positive number of bytes'
+                }), 400
+        
+        # Opt-in per-stage timings ('timings' or 'allocations'), returned
+        # as a Server-Timing header
+        instrument = request.args.get('instrument', data.get('instrument'))
+        if instrument is not None and instrument not in INSTRUMENT_MODES:
+            return jsonify({
+                'error': 'Invalid instrument',
+                'message': f"Instrument must be one of: {', '.join(INSTRUMENT_MODES)}"
+            }), 400
+        timings = new_timings(instrument)
+        
+        # Rendering is deterministic, so the canonical estimate hash is a
+        # strong ETag for the PDF
+        estimate_data = canonical_estimate(data)
+        etag = estimate_etag(estimate_data, engine, max_bytes)
         
-        # Generate the PDF
-        pdf_data = pdf_gen.generate_estimate_pdf(data)
+        # Client already has this exact PDF
+        if etag in request.if_none_match:
+            return '', 304, {'ETag': f'"{etag}"'}
+        
+        # Shared, pre-warmed PDF generator
+        pdf_gen = get_pdf_generator()
         
         # Generate filename
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         customer_name = data.get('customer_name', 'customer').replace(' ', '_')
-        filename = f"estimate_{customer_name}_{timestamp}.pdf"
+        filename = secure_filename(f"estimate_{customer_name}_{timestamp}.pdf")
+        
+        if response_format == 'stream':
+            # Uncached PDFs are rendered into a per-request spool and sent in
+            # chunks as it is read, so nothing is written to generated_pdfs
+            headers = {
+                'Content-Type': 'application/pdf',
+                'Content-Disposition': f'attachment; filename={filename}',
+                'X-PDF-Filename': filename
+            }
+            pdf_data = pdf_cache.get(etag)
+            cached = pdf_data is not None
+            if pdf_data is None and max_bytes is None:
+                size, chunks = pdf_gen.stream_estimate_pdf(estimate_data, engine=engine, deterministic=True,
+                                                           timings=timings)
+                headers['Content-Length'] = str(size)
+                headers['ETag'] = f'"{etag}"'
+                headers['X-PDF-Cache'] = 'miss'
+                if timings is not None and timings.renders:
+                    headers['Server-Timing'] = timings.server_timing()
+                logger.info(f"Streaming PDF: {filename}")
+                return Response(chunks, 200, headers, direct_passthrough=True)
+            if pdf_data is None:
+                # Size-optimised PDFs can take several renders, so they go
+                # through the render cache
+                pdf_data, etag, _ = render_estimate_pdf(estimate_data, engine=engine, etag=etag,
+                                                        max_bytes=max_bytes, timings=timings)
+            headers['ETag'] = f'"{etag}"'
+            headers['X-PDF-Cache'] = 'hit' if cached else 'miss'
+            if timings is not None and timings.renders:
+                headers['Server-Timing'] = timings.server_timing()
+            if max_bytes is not None:
+                sections = pdf_size_breakdown(pdf_data)['sections']
+                headers['X-PDF-Sections'] = ', '.join(f"{name}={size}" for name, size in sections.items())
+            logger.info(f"Successfully generated PDF: {filename}")
+            return pdf_data, 200, headers
+        
+        # Generate the PDF (or serve it from the render cache)
+        pdf_data, etag, cached = render_estimate_pdf(estimate_data, engine=engine, etag=etag,
+                                                     max_bytes=max_bytes, timings=timings)
         
         # Save PDF to file
         filepath = pdf_gen.save_pdf_to_file(pdf_data, filename)
         
+        cache_headers = {
+            'ETag': f'"{etag}"',
+            'X-PDF-Cache': 'hit' if cached else 'miss'
+        }
+        if timings is not None and timings.renders:
+            cache_headers['Server-Timing'] = timings.server_timing()
+        sections = None
+        if max_bytes is not None:
+            sections = pdf_size_breakdown(pdf_data)['sections']
+            cache_headers['X-PDF-Sections'] = ', '.join(f"{name}={size}" for name, size in sections.items())
+        
+        if response_format == 'binary':
+            logger.info(f"Successfully generated PDF: {filename}")
+            return pdf_data, 200, {
+                'Content-Type': 'application/pdf',
+                'Content-Disposition': f'attachment; filename={filename}',
+                'X-PDF-Filename': filename,
+                **cache_headers
+            }
+        
         # Convert to base64 for response
         pdf_base64 = base64.b64encode(pdf_data).decode('utf-8')
         
@@ -695,9 +1324,12 @@ def generate_pdf():
             'success': True,
             'filename': filename,
             'filepath': filepath,
+            'etag': etag,
+            'size': len(pdf_data),
+            'sections': sections,
             'pdf_data': f"data:application/pdf;base64,{pdf_base64}",
             'message': 'PDF generated successfully'
-        })
+        }), 200, cache_headers
         
     except Exception as e:
         logger.error(f"Error generating PDF: {str(e)}")
@@ -706,6 +1338,67 @@ def generate_pdf():
             'message': str(e)
         }), 500
 
+@app.route('/api/generate-pdf/batch', methods=['POST'])
+def generate_pdf_batch():
+    """
+    Render many estimates in parallel across worker processes and stream
+    back a ZIP archive, or one NDJSON result line per estimate as it completes
+    """
+    try:
+        data = request.get_json()
+        
+        if not data:
+            return jsonify({
+                'error': 'No data provided',
+                'message': 'Please provide a batch of estimates'
+            }), 400
+        
+        estimates = data.get('estimates')
+        if not isinstance(estimates, list) or not estimates:
+            return jsonify({
+                'error': 'Invalid batch',
+                'message': 'Body must contain a non-empty "estimates" list'
+            }), 400
+        if len(estimates) > MAX_BATCH_SIZE:
+            return jsonify({
+                'error': 'Batch too large',
+                'message': f'At most {MAX_BATCH_SIZE} estimates per batch'
+            }), 413
+        
+        engine = request.args.get('engine', data.get('engine', 'platypus'))
+        if engine not in ENGINES:
+            return jsonify({
+                'error': 'Invalid engine',
+                'message': f"Engine must be one of: {', '.join(ENGINES)}"
+            }), 400
+        
+        # Response format: 'zip' (default) or 'ndjson'
+        response_format = request.args.get('format', data.get('format', 'zip'))
+        if response_format not in BATCH_FORMATS:
+            return jsonify({
+                'error': 'Invalid format',
+                'message': f"Format must be one of: {', '.join(BATCH_FORMATS)}"
+            }), 400
+        
+        logger.info(f"Rendering batch of {len(estimates)} estimates ({engine}, {response_format})")
+        
+        if response_format == 'ndjson':
+            return Response(iter_batch_ndjson(estimates, engine=engine), 200,
+                            {'Content-Type': 'application/x-ndjson'})
+        
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        return Response(iter_batch_zip(estimates, engine=engine), 200, {
+            'Content-Type': 'application/zip',
+            'Content-Disposition': f'attachment; filename=estimates_{timestamp}.zip'
+        })
+        
+    except Exception as e:
+        logger.error(f"Error generating PDF batch: {str(e)}")
+        return jsonify({
+            'error': 'PDF batch generation failed',
+            'message': str(e)
+        }), 500
+
 @app.route('/api/download-pdf/<filename>', methods=['GET'])
 def download_pdf(filename):
     """
@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+"""
+Benchmark: render time per line item for very large estimates
+
+Compares the page-chunked line items layout with the single Table it
+replaces (forced by raising LARGE_ESTIMATE_ITEMS). The single Table is
+quadratic, so it is only run up to --legacy-max items.
+
+Usage:
+    python benchmarks/bench_line_items.py [--iterations 3] [--line-items 200 1000 4000 10000] [--legacy-max 2500]
+"""
+
+import os
+import sys
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pdf_generator
+from pdf_generator import get_pdf_generator
+from bench_pdf_setup import timed, report
+from bench_pdf_engines import with_line_items
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=3)
+    parser.add_argument('--line-items', type=int, nargs='+', default=[200, 1000, 4000, 10000])
+    parser.add_argument('--legacy-max', type=int, default=2500)
+    args = parser.parse_args()
+
+    generator = get_pdf_generator()
+    threshold = pdf_generator.LARGE_ESTIMATE_ITEMS
+
+    for count in args.line_items:
+        estimate = with_line_items(count)
+        print(f"{count} line items ({args.iterations} iterations)")
+        print("-" * 60)
+        pdf_generator.LARGE_ESTIMATE_ITEMS = 0
+        chunked = report("platypus, page chunks",
+                         timed(lambda: generator.generate_estimate_pdf(estimate), args.iterations))
+        legacy = None
+        if count <= args.legacy_max:
+            pdf_generator.LARGE_ESTIMATE_ITEMS = count + 1
+            legacy = report("platypus, single table",
+                            timed(lambda: generator.generate_estimate_pdf(estimate), args.iterations))
+        pdf_generator.LARGE_ESTIMATE_ITEMS = threshold
+        canvas = report("canvas", timed(lambda: generator.generate_estimate_pdf(estimate, engine='canvas'),
+                                        args.iterations))
+
+        per_row = f"  per item: chunks {chunked * 1000 / count:.0f} us"
+        if legacy is not None:
+            per_row += f", single table {legacy * 1000 / count:.0f} us"
+        print(f"{per_row}, canvas {canvas * 1000 / count:.0f} us")
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+"""
+Benchmark: rule-based local estimates
+
+Times local_estimate for a small, a typical and a large job of each damage
+type. These should come in at tens of microseconds, cheap enough to run on
+every form change for pre-fills.
+
+Usage:
+    python benchmarks/bench_local_estimator.py [--iterations 5000]
+"""
+
+import os
+import sys
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from local_estimator import local_estimate
+from bench_pdf_setup import timed, report
+
+CASES = [
+    ('water', {'category': '1', 'water_class': '1'}),
+    ('water', {'category': '3', 'water_class': '4', 'standing_water': True}),
+    ('fire', {'soot_level': 'light'}),
+    ('fire', {'soot_level': 'heavy', 'structural_sqft': 200}),
+    ('mold', {'condition': '2'}),
+    ('mold', {'condition': '3', 'species': ['stachybotrys', 'chaetomium']}),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=5000)
+    parser.add_argument('--areas', nargs='+', type=float, default=[25, 650, 5000])
+    args = parser.parse_args()
+
+    for area in args.areas:
+        print(f"\n{area:g} sq ft")
+        for damage_type, params in CASES:
+            total = local_estimate(damage_type, area, **params)['total_estimate']
+            label = f"{damage_type} {' '.join(f'{k}={v}' for k, v in params.items())}"[:34]
+            report(label, timed(lambda: local_estimate(damage_type, area, **params), args.iterations))
+            print(f"  {'':<34} total ${total:,.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+"""
+Benchmark: Platypus vs. direct-canvas rendering of the standard estimate
+
+Usage:
+    python benchmarks/bench_pdf_engines.py [--iterations 100] [--line-items 5 40 200]
+"""
+
+import os
+import sys
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pdf_generator import get_pdf_generator
+from bench_pdf_setup import SAMPLE_ESTIMATE, timed, report
+
+
+def with_line_items(count):
+    """SAMPLE_ESTIMATE with count line items"""
+    items = SAMPLE_ESTIMATE['line_items']
+    return dict(SAMPLE_ESTIMATE, line_items=[items[i % len(items)] for i in range(count)])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=100)
+    parser.add_argument('--line-items', type=int, nargs='+', default=[5, 40, 200])
+    args = parser.parse_args()
+
+    generator = get_pdf_generator()
+
+    for count in args.line_items:
+        estimate = with_line_items(count)
+        print(f"{count} line items ({args.iterations} iterations)")
+        print("-" * 60)
+        platypus = report("platypus", timed(lambda: generator.generate_estimate_pdf(estimate), args.iterations))
+        canvas = report("canvas", timed(lambda: generator.generate_estimate_pdf(estimate, engine='canvas'),
+                                        args.iterations))
+        print(f"  speedup: {platypus / canvas:.1f}x")
+        print()
+
+
+if __name__ == '__main__':
+    main()
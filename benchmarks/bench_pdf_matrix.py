@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+"""
+Benchmark: generate_estimate_pdf across a matrix of estimate shapes, with a
+regression gate
+
+Every combination of damage type, line item count, equipment count and
+photo count is rendered in-process (no server) in a fresh worker process,
+so each scenario's peak RSS is its own. Latency percentiles, peak RSS and
+output size are written as JSON; given a baseline, the run fails (exit
+status 1) when any scenario's median latency, peak RSS or output size grew
+by more than its threshold.
+
+Baselines are machine-specific: record one with --update-baseline on the
+machine that will run the check.
+
+Usage:
+    python benchmarks/bench_pdf_matrix.py [--iterations 10] [--engines platypus canvas]
+        [--damage-types water fire mold] [--line-items 5 200] [--equipment 2 20]
+        [--photos 0 12] [--photo-size 1600x1200] [--output results.json]
+        [--baseline benchmarks/pdf_matrix_baseline.json] [--update-baseline]
+        [--threshold 0.25] [--rss-threshold 0.20] [--size-threshold 0.05]
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import resource
+import itertools
+import multiprocessing
+from datetime import datetime
+
+# Every iteration should decode its photos, not hit the thumbnail cache
+os.environ.setdefault('THUMBNAIL_CACHE_MEMORY_MB', '0')
+os.environ.setdefault('THUMBNAIL_CACHE_DIR', '')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pdf_generator import ENGINES
+from synthetic_data import DAMAGE_TYPES
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pdf_matrix_baseline.json')
+
+
+def build_estimate(damage_type, line_items, equipment, photos, photo_size):
+    """An estimate of the given shape, the same on every run"""
+    from synthetic_data import make_estimate
+
+    return make_estimate(seed='matrix', damage_type=damage_type, line_items=line_items, equipment=equipment,
+                         photos=photos, photo_size=photo_size)
+
+
+def percentile(timings, q):
+    """q-th percentile of sorted timings, nearest-rank"""
+    return timings[max(0, int(round(len(timings) * q)) - 1)]
+
+
+def run_scenario(scenario, iterations):
+    """Render one scenario in this (fresh) process and return its measurements"""
+    from pdf_generator import get_pdf_generator
+
+    estimate = build_estimate(scenario['damage_type'], scenario['line_items'], scenario['equipment'],
+                              scenario['photos'], scenario['photo_size'])
+    generator = get_pdf_generator()
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    pdf = generator.generate_estimate_pdf(estimate, engine=scenario['engine'])  # warm-up
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        pdf = generator.generate_estimate_pdf(estimate, engine=scenario['engine'])
+        timings.append((time.perf_counter() - start) * 1000)
+
+    timings.sort()
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return {
+        'p50_ms': round(percentile(timings, 0.50), 3),
+        'p95_ms': round(percentile(timings, 0.95), 3),
+        'p99_ms': round(percentile(timings, 0.99), 3),
+        'peak_rss_mb': round(peak_rss, 1),
+        'rss_growth_mb': round(peak_rss - rss_before, 1),
+        'bytes': len(pdf)
+    }
+
+
+def scenario_key(scenario):
+    width, height = scenario['photo_size']
+    return (f"{scenario['engine']}/{scenario['damage_type']}/items={scenario['line_items']}"
+            f"/equipment={scenario['equipment']}/photos={scenario['photos']}@{width}x{height}")
+
+
+def compare(results, baseline, thresholds):
+    """Regressions of results against baseline, as printable lines"""
+    regressions = []
+    for key, current in results['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(key)
+        if previous is None:
+            continue
+        for metric, threshold in thresholds.items():
+            if previous[metric] and current[metric] > previous[metric] * (1 + threshold):
+                change = (current[metric] / previous[metric] - 1) * 100
+                regressions.append(f"  {key}: {metric} {previous[metric]} -> {current[metric]} "
+                                   f"(+{change:.0f}%, limit +{threshold * 100:.0f}%)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=10)
+    parser.add_argument('--engines', choices=ENGINES, nargs='+', default=['platypus'])
+    parser.add_argument('--damage-types', choices=DAMAGE_TYPES, nargs='+', default=list(DAMAGE_TYPES))
+    parser.add_argument('--line-items', type=int, nargs='+', default=[5, 200])
+    parser.add_argument('--equipment', type=int, nargs='+', default=[2, 20])
+    parser.add_argument('--photos', type=int, nargs='+', default=[0, 12])
+    parser.add_argument('--photo-size', default='1600x1200')
+    parser.add_argument('--output', help='write the results here as JSON')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--update-baseline', action='store_true', help='save the results as the new baseline')
+    parser.add_argument('--threshold', type=float, default=0.25, help='allowed median latency growth')
+    parser.add_argument('--rss-threshold', type=float, default=0.20, help='allowed peak RSS growth')
+    parser.add_argument('--size-threshold', type=float, default=0.05, help='allowed output size growth')
+    args = parser.parse_args()
+
+    photo_size = [int(n) for n in args.photo_size.split('x')]
+    scenarios = [
+        {'engine': engine, 'damage_type': damage_type, 'line_items': line_items,
+         'equipment': equipment, 'photos': photos, 'photo_size': photo_size}
+        for engine, damage_type, line_items, equipment, photos in itertools.product(
+            args.engines, args.damage_types, args.line_items, args.equipment, args.photos)
+    ]
+
+    results = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'iterations': args.iterations
+        },
+        'scenarios': {}
+    }
+
+    print(f"{len(scenarios)} scenarios, {args.iterations} iterations each")
+    print("-" * 112)
+    print(f"  {'scenario':<62} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'peak MB':>8} {'KB':>8}")
+    # One fresh process per scenario so ru_maxrss is that scenario's peak
+    context = multiprocessing.get_context('spawn')
+    for scenario in scenarios:
+        with context.Pool(1, maxtasksperchild=1) as pool:
+            measured = pool.apply(run_scenario, (scenario, args.iterations))
+        key = scenario_key(scenario)
+        results['scenarios'][key] = dict(scenario, **measured)
+        print(f"  {key:<62} {measured['p50_ms']:>8.1f} {measured['p95_ms']:>8.1f} {measured['p99_ms']:>8.1f} "
+              f"{measured['peak_rss_mb']:>8.1f} {measured['bytes'] / 1024:>8.1f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.update_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nBaseline written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline at {args.baseline}; run with --update-baseline to record one")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, {
+        'p50_ms': args.threshold,
+        'peak_rss_mb': args.rss_threshold,
+        'bytes': args.size_threshold
+    })
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) against {args.baseline}:")
+        print('\n'.join(regressions))
+        return 1
+    print(f"\nNo regressions against {args.baseline}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+"""
+Benchmark: per-request PDFGenerator construction vs. the shared generator
+
+Usage:
+    python benchmarks/bench_pdf_setup.py [--iterations 200]
+"""
+
+import os
+import sys
+import time
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pdf_generator import PDFGenerator, get_pdf_generator, _build_stylesheet
+
+SAMPLE_ESTIMATE = {
+    "customer_name": "John Smith",
+    "customer_address": "123 Main Street, Lancaster, PA 17601",
+    "date": "01/15/2025",
+    "job_number": "EST-202501151200",
+    "assessment": {
+        "damage_type": "water",
+        "classification": {"category": "2", "class": "3"},
+        "affected_area": 650,
+        "severity": "moderate"
+    },
+    "line_items": [
+        {"description": "Water extraction", "quantity": 650, "unit_price": 1.50},
+        {"description": "Antimicrobial treatment", "quantity": 650, "unit_price": 0.75},
+        {"description": "Drying equipment setup", "quantity": 4, "unit_price": 125.00},
+        {"description": "Dehumidifier rental (3 days)", "quantity": 3, "unit_price": 85.00},
+        {"description": "Air mover rental (3 days)", "quantity": 3, "unit_price": 45.00}
+    ],
+    "markup": 10,
+    "equipment": [
+        {"name": "Dehumidifier", "quantity": 2, "days": 3, "daily_rate": 85.00},
+        {"name": "Air Mover", "quantity": 6, "days": 3, "daily_rate": 45.00}
+    ],
+    "photos": []
+}
+
+
+def timed(fn, iterations):
+    """Run fn repeatedly and return per-call timings in milliseconds"""
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def report(label, timings):
+    timings = sorted(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(f"  {label:<34} mean {statistics.mean(timings):7.3f} ms   "
+          f"median {statistics.median(timings):7.3f} ms   p95 {p95:7.3f} ms")
+    return statistics.mean(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=200)
+    args = parser.parse_args()
+
+    shared = get_pdf_generator()
+
+    print(f"Setup cost ({args.iterations} iterations)")
+    print("-" * 60)
+    report("stylesheet build (old __init__)", timed(_build_stylesheet, args.iterations))
+    report("PDFGenerator() (shared styles)", timed(PDFGenerator, args.iterations))
+
+    print()
+    print(f"Per-request render ({args.iterations} iterations)")
+    print("-" * 60)
+
+    def per_request_old():
+        # What every request used to pay: a fresh stylesheet plus a render
+        gen = PDFGenerator()
+        gen.styles = _build_stylesheet()
+        gen.generate_estimate_pdf(SAMPLE_ESTIMATE)
+
+    old = report("fresh generator + styles", timed(per_request_old, args.iterations))
+    new = report("shared generator", timed(lambda: shared.generate_estimate_pdf(SAMPLE_ESTIMATE), args.iterations))
+
+    print()
+    print(f"Saved per request: {old - new:.3f} ms ({(old - new) / old * 100:.1f}%)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+"""
+Benchmark: size-optimised PDFs against byte budgets
+
+Renders an estimate with --photos photos (a few of them attached twice)
+at the standard profile and then at each budget, printing the final size,
+the photo settings chosen, how many renders it took and the size of each
+section.
+
+Usage:
+    python benchmarks/bench_pdf_size.py [--photos 20] [--budgets 400 250 150 50] [--engine platypus]
+"""
+
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pdf_generator import get_pdf_generator, ENGINES
+from pdf_size import generate_size_optimized_pdf, pdf_size_breakdown
+from bench_pdf_setup import SAMPLE_ESTIMATE
+from synthetic_data import make_photo
+
+
+def print_row(label, pdf, elapsed, settings=''):
+    sections = pdf_size_breakdown(pdf)['sections']
+    print(f"  {label:<10} {len(pdf) / 1024:8.1f} KB  {elapsed * 1000:7.0f} ms  {settings:<18} "
+          + '  '.join(f"{name} {size / 1024:.1f}" for name, size in sections.items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--photos', type=int, default=20)
+    parser.add_argument('--budgets', type=int, nargs='+', default=[400, 250, 150, 50], help='KB')
+    parser.add_argument('--engine', choices=ENGINES, default='platypus')
+    parser.add_argument('--size', default='1600x1200')
+    args = parser.parse_args()
+
+    width, height = (int(n) for n in args.size.split('x'))
+    photos = [make_photo(width, height, seed) for seed in range(args.photos)]
+    estimate = dict(SAMPLE_ESTIMATE, photos=photos + photos[:args.photos // 5])
+
+    print(f"{len(estimate['photos'])} photos ({args.photos} distinct), {args.engine} engine")
+    print("-" * 100)
+    start = time.perf_counter()
+    pdf = get_pdf_generator().generate_estimate_pdf(estimate, engine=args.engine)
+    print_row("standard", pdf, time.perf_counter() - start)
+
+    for budget in args.budgets:
+        start = time.perf_counter()
+        pdf, report = generate_size_optimized_pdf(estimate, budget * 1024, engine=args.engine)
+        settings = (f"{report['photo_size'][0]}x{report['photo_size'][1]} q{report['photo_quality']} "
+                    f"x{report['renders']}{'' if report['within_budget'] else ' !'}")
+        print_row(f"<= {budget} KB", pdf, time.perf_counter() - start, settings)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+"""
+Benchmark: peak memory of the photo appendix vs. photo count
+
+Memory is traced with tracemalloc around each render, so the input photo
+payloads (built beforehand) are not counted. ReportLab keeps every finished
+page's objects until save() and then serialises the whole document, so
+that part necessarily grows with the output. The columns split it out:
+
+  retained     page objects held when save() starts (about the output size)
+  transient    layout peak minus retained: photos being decoded, thumbnails
+               and row tables alive at once; this should stay flat
+  peak         overall peak including serialisation
+  eager        preparing every thumbnail up front, as the old layout did
+
+Usage:
+    python benchmarks/bench_photo_memory.py [--counts 6 25 50 100 200] [--engine platypus] [--size 1024x768]
+"""
+
+import gc
+import os
+import sys
+import argparse
+import tracemalloc
+from unittest import mock
+
+# Measure the render itself, not the thumbnail cache filling up
+os.environ.setdefault('THUMBNAIL_CACHE_MEMORY_MB', '0')
+os.environ.setdefault('THUMBNAIL_CACHE_DIR', '')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from reportlab.pdfgen.canvas import Canvas
+
+from pdf_generator import get_pdf_generator, ENGINES
+from photo_processing import prepare_photos
+from bench_pdf_setup import SAMPLE_ESTIMATE
+from synthetic_data import make_photo
+
+
+def peak_mb(fn):
+    """Run fn under tracemalloc; return (result, peak MB)"""
+    tracemalloc.start()
+    try:
+        result = fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, peak / (1024 * 1024)
+
+
+def render_traced(generator, estimate, engine):
+    """Render under tracemalloc; return (pdf, retained MB, layout peak MB, peak MB)"""
+    at_save = {}
+    canvas_save = Canvas.save
+
+    def save(canv):
+        # Drop layout garbage still waiting on the cycle collector so
+        # "retained" is what the document really holds
+        gc.collect()
+        at_save['current'], at_save['peak'] = tracemalloc.get_traced_memory()
+        return canvas_save(canv)
+
+    with mock.patch.object(Canvas, 'save', save):
+        pdf, peak = peak_mb(lambda: generator.generate_estimate_pdf(estimate, engine=engine))
+    mb = 1024 * 1024
+    return pdf, at_save['current'] / mb, at_save['peak'] / mb, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--counts', type=int, nargs='+', default=[6, 25, 50, 100, 200])
+    parser.add_argument('--engine', choices=ENGINES, default='platypus')
+    parser.add_argument('--size', default='1024x768')
+    args = parser.parse_args()
+
+    width, height = (int(n) for n in args.size.split('x'))
+    photos = [make_photo(width, height, seed) for seed in range(max(args.counts))]
+    generator = get_pdf_generator()
+
+    print(f"Photo appendix memory, {args.engine} engine, {width}x{height} photos")
+    print("-" * 72)
+    print(f"  {'photos':>6}  {'pages':>5}  {'output MB':>9}  {'retained MB':>11}  {'transient MB':>12}  "
+          f"{'peak MB':>7}  {'eager MB':>8}")
+    for count in args.counts:
+        estimate = dict(SAMPLE_ESTIMATE, photos=photos[:count])
+        pdf, retained, layout_peak, peak = render_traced(generator, estimate, args.engine)
+        _, eager = peak_mb(lambda: prepare_photos(photos[:count]))
+        print(f"  {count:>6}  {pdf.count(b'/Type /Page') - 1:>5}  {len(pdf) / (1024 * 1024):>9.2f}  "
+              f"{retained:>11.2f}  {layout_peak - retained:>12.2f}  {peak:>7.2f}  {eager:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
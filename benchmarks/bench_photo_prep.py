@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+"""
+Benchmark: serial full-decode photo preparation vs. the parallel draft-mode
+pipeline, cold and with the thumbnail cache warm
+
+Usage:
+    python benchmarks/bench_photo_prep.py [--iterations 5] [--photos 6] [--size 4032x3024]
+"""
+
+import io
+import os
+import sys
+import base64
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image as PILImage
+
+from photo_processing import prepare_photos, thumbnail_cache
+from bench_pdf_setup import timed, report
+from synthetic_data import make_photo
+
+
+def prepare_serial(photos):
+    """The previous photo loop: one at a time, LANCZOS, convert after resize"""
+    buffers = []
+    for photo in photos:
+        header, data = photo['data'].split(',', 1)
+        img = PILImage.open(io.BytesIO(base64.b64decode(data)))
+        img.thumbnail((250, 180), PILImage.Resampling.LANCZOS)
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+        buffer = io.BytesIO()
+        img.save(buffer, format='JPEG', quality=85)
+        buffers.append(buffer)
+    return buffers
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=5)
+    parser.add_argument('--photos', type=int, default=6)
+    parser.add_argument('--size', default='4032x3024')
+    args = parser.parse_args()
+
+    width, height = (int(n) for n in args.size.split('x'))
+    photos = [make_photo(width, height, seed) for seed in range(args.photos)]
+
+    print(f"{args.photos} photos at {width}x{height} ({args.iterations} iterations, {os.cpu_count()} CPUs)")
+    print("-" * 60)
+    serial = report("serial (previous loop)", timed(lambda: prepare_serial(photos), args.iterations))
+
+    def prepare_cold():
+        thumbnail_cache.clear()
+        prepare_photos(photos)
+
+    parallel = report("parallel draft-mode pipeline", timed(prepare_cold, args.iterations))
+    cached = report("re-render (thumbnail cache warm)", timed(lambda: prepare_photos(photos), args.iterations))
+    print(f"  speedup: {serial / parallel:.1f}x cold, {serial / cached:.1f}x cached")
+
+    print()
+    print("Per-photo stages (cold run, ms)")
+    print("-" * 60)
+    thumbnail_cache.clear()
+    for photo in prepare_photos(photos):
+        stages = '  '.join(f"{stage} {ms:6.1f}" for stage, ms in photo.timings.items())
+        print(f"  {photo.caption:<10} {stages}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+"""
+Benchmark: vision-model photo preprocessing
+
+For each photo size, prepares --photos photos for the vision model and
+prints the bytes sent before and after, the preprocessing time, and the
+upload time it saves at --uplink-mbps (the server's upstream to the API).
+
+Usage:
+    python benchmarks/bench_vision_prep.py [--iterations 5] [--photos 4]
+        [--sizes 4032x3024 3000x2000 1600x1200 800x600] [--uplink-mbps 50]
+"""
+
+import os
+import sys
+import base64
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vision_images import prepare_vision_images
+from bench_pdf_setup import timed, report
+from synthetic_data import make_photo
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=5)
+    parser.add_argument('--photos', type=int, default=4)
+    parser.add_argument('--sizes', nargs='+', default=['4032x3024', '3000x2000', '1600x1200', '800x600'])
+    parser.add_argument('--uplink-mbps', type=float, default=50)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        width, height = (int(n) for n in size.split('x'))
+        photos = [(base64.b64decode(make_photo(width, height, seed)['data'].split(',', 1)[1]), 'image/jpeg')
+                  for seed in range(args.photos)]
+        images = prepare_vision_images(photos)
+        # Both go up base64-encoded, a third larger than the bytes
+        before = sum(len(data) for data, _ in photos) * 4 / 3
+        after = sum(len(image.url) for image in images)
+
+        print(f"{args.photos} photos at {size} -> {images[0].size[0]}x{images[0].size[1]}")
+        print("-" * 60)
+        prepare_ms = report("preprocess", timed(lambda: prepare_vision_images(photos), args.iterations))
+        upload_saved_ms = (before - after) * 8 / (args.uplink_mbps * 1000)
+        print(f"  request {before / 1024:.0f} KB -> {after / 1024:.0f} KB ({(1 - after / before) * 100:.0f}% smaller); "
+              f"upload at {args.uplink_mbps:g} Mbps {upload_saved_ms:.0f} ms shorter, "
+              f"net {upload_saved_ms - prepare_ms:+.0f} ms before the model's own speed-up")
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,257 @@
+#!/usr/bin/env python
+"""
+Seeded synthetic estimates and photos for benchmarks and load tests
+
+make_estimate builds a realistic water, fire or mold estimate of any size:
+customer, assessment with the classification keys generate_estimate_pdf
+reads for that damage type, line items priced off the affected area,
+equipment and optional photos. Everything comes from a random.Random
+seeded with (seed, index), so estimate N of a corpus is the same whatever
+else is generated, and runs are reproducible across machines.
+
+make_photo returns a JPEG or PNG data URL of any resolution with enough
+detail to cost what a real photo does to decode.
+
+Usage (writes NDJSON, which pdf_batch.py reads directly):
+    python benchmarks/synthetic_data.py [--count 100] [--seed 0] [--damage-types water fire mold]
+        [--line-items 5 40] [--equipment 0 8] [--photos 0 6] [--photo-size 1600x1200]
+        [--photo-format JPEG] [--api] [-o corpus.ndjson]
+"""
+
+import io
+import sys
+import json
+import base64
+import random
+import argparse
+from datetime import date, timedelta
+
+from PIL import Image as PILImage
+
+DAMAGE_TYPES = ('water', 'fire', 'mold')
+SEVERITIES = ('minor', 'moderate', 'severe')
+
+FIRST_NAMES = ('John', 'Sarah', 'Michael', 'Emily', 'David', 'Jessica', 'Robert', 'Ashley', 'James', 'Maria',
+               'William', 'Linda', 'Thomas', 'Karen', 'Daniel', 'Nancy')
+LAST_NAMES = ('Smith', 'Johnson', 'Brown', 'Miller', 'Davis', 'Wilson', 'Moore', 'Taylor', 'Anderson', 'Martin',
+              'Thompson', 'Garcia', 'Martinez', 'Clark', 'Lewis', 'Walker')
+STREETS = ('Main Street', 'Oak Avenue', 'Pine Street', 'Maple Drive', 'Cedar Lane', 'Market Street',
+           'Church Road', 'Ridge Avenue', 'Orange Street', 'Duke Street')
+TOWNS = (('Lancaster', '17601'), ('Harrisburg', '17102'), ('Reading', '19601'), ('York', '17401'),
+         ('Lititz', '17543'), ('Ephrata', '17522'), ('Hershey', '17033'), ('Lebanon', '17042'))
+ROOMS = ('Kitchen', 'Living Room', 'Basement', 'Master Bedroom', 'Bathroom', 'Hallway', 'Laundry Room',
+         'Dining Room', 'Garage', 'Attic', 'Bedroom 2', 'Family Room')
+
+# description, unit price range, quantity basis: 'area' scales with the
+# affected area, otherwise a (low, high) count
+LINE_ITEMS = {
+    'water': (
+        ('Water extraction', (1.25, 1.75), 'area'),
+        ('Antimicrobial treatment', (0.60, 0.90), 'area'),
+        ('Drying equipment setup', (110.0, 140.0), (2, 8)),
+        ('Dehumidifier rental', (75.0, 95.0), (2, 6)),
+        ('Air mover rental', (40.0, 50.0), (3, 12)),
+        ('Baseboard removal and disposal', (1.50, 2.25), (20, 200)),
+        ('Flood cut drywall (2 ft)', (1.75, 2.50), (20, 300)),
+        ('Carpet pad removal', (0.45, 0.70), 'area'),
+        ('Moisture mapping and monitoring', (95.0, 125.0), (1, 5)),
+    ),
+    'fire': (
+        ('Soot removal from surfaces', (2.25, 2.75), 'area'),
+        ('HEPA vacuuming', (0.65, 0.85), 'area'),
+        ('Thermal fogging', (1.10, 1.40), 'area'),
+        ('Content cleaning', (110.0, 140.0), (4, 24)),
+        ('Odor sealing primer', (0.85, 1.15), 'area'),
+        ('Ozone treatment', (250.0, 350.0), (1, 4)),
+        ('Duct cleaning', (35.0, 55.0), (4, 20)),
+        ('Debris removal', (90.0, 125.0), (1, 6)),
+    ),
+    'mold': (
+        ('Containment setup', (2.75, 3.25), 'area'),
+        ('Mold remediation', (7.0, 9.0), 'area'),
+        ('HEPA vacuuming', (1.35, 1.65), 'area'),
+        ('Post-remediation testing', (325.0, 375.0), (1, 3)),
+        ('Antimicrobial application', (0.90, 1.20), 'area'),
+        ('Drywall removal and disposal', (2.0, 2.75), (20, 200)),
+        ('Negative air machine setup', (140.0, 175.0), (1, 4)),
+    ),
+}
+
+EQUIPMENT = {
+    'water': (('Dehumidifier', 85.0), ('Air Mover', 45.0), ('Air Scrubber', 125.0), ('Moisture Meter', 15.0)),
+    'fire': (('Air Scrubber', 125.0), ('Hydroxyl Generator', 150.0), ('Ozone Generator', 95.0),
+             ('Thermal Fogger', 75.0)),
+    'mold': (('HEPA Air Scrubber', 140.0), ('Negative Air Machine', 120.0), ('Dehumidifier', 85.0)),
+}
+
+AREA_RANGES = {'water': (100, 3000), 'fire': (200, 4000), 'mold': (10, 500)}
+PHOTO_SUBJECTS = ('ceiling stain', 'wall damage', 'floor damage', 'standing water', 'soot pattern',
+                  'visible growth', 'moisture reading', 'overview', 'source of loss', 'affected contents')
+
+
+def _rng(seed, index=0):
+    return random.Random(f"{seed}:{index}")
+
+
+def _classification(rng, damage_type):
+    """The classification keys _assessment_rows reads for damage_type"""
+    if damage_type == 'water':
+        return {'category': str(rng.randint(1, 3)), 'class': str(rng.randint(1, 4))}
+    if damage_type == 'fire':
+        return {'damage_level': rng.choice(('light', 'moderate', 'heavy')),
+                'smoke_type': rng.choice(('dry', 'wet', 'protein', 'fuel oil'))}
+    return {'condition': str(rng.randint(1, 3)), 'contamination_level': str(rng.randint(1, 3))}
+
+
+def _line_items(rng, damage_type, count, area):
+    catalog = LINE_ITEMS[damage_type]
+    rooms = rng.sample(ROOMS, min(len(ROOMS), max(1, count // len(catalog) + 1)))
+    items = []
+    for i in range(count):
+        description, (low, high), basis = catalog[i % len(catalog)]
+        if count > len(catalog):
+            description = f"{description} - {rooms[(i // len(catalog)) % len(rooms)]}"
+        if basis == 'area':
+            quantity = max(1, round(area * rng.uniform(0.6, 1.1)))
+        else:
+            quantity = rng.randint(*basis)
+        items.append({'description': description, 'quantity': quantity,
+                      'unit_price': round(rng.uniform(low, high), 2)})
+    return items
+
+
+def _equipment(rng, damage_type, count):
+    catalog = EQUIPMENT[damage_type]
+    return [
+        {'name': catalog[i % len(catalog)][0], 'quantity': rng.randint(1, 8), 'days': rng.randint(2, 7),
+         'daily_rate': catalog[i % len(catalog)][1]}
+        for i in range(count)
+    ]
+
+
+def make_photo(width, height, seed, photo_format='JPEG', caption=None, quality=90):
+    """A photo-like image as a data URL
+
+    Random low-resolution noise scaled up with bicubic filtering gives the
+    smooth-but-detailed content real photos have, so encoded sizes and
+    decode times are realistic (plain noise or flat colour would not be).
+    """
+    rng = random.Random(seed)
+    tile_width, tile_height = max(1, width // 16), max(1, height // 16)
+    tile = PILImage.frombytes('RGB', (tile_width, tile_height), rng.randbytes(tile_width * tile_height * 3))
+    buffer = io.BytesIO()
+    image = tile.resize((width, height), PILImage.Resampling.BICUBIC)
+    if photo_format.upper() == 'PNG':
+        image.save(buffer, format='PNG')
+        mime = 'image/png'
+    else:
+        image.save(buffer, format='JPEG', quality=quality)
+        mime = 'image/jpeg'
+    return {'data': f'data:{mime};base64,' + base64.b64encode(buffer.getvalue()).decode('ascii'),
+            'caption': caption or f'Photo {seed + 1}'}
+
+
+def make_estimate(seed=0, index=0, damage_type=None, line_items=None, equipment=None, photos=0,
+                  photo_size=(1600, 1200), photo_format='JPEG'):
+    """A realistic estimate in generate_estimate_pdf's input format
+
+    Anything left as None (damage type, line item and equipment counts) is
+    drawn from the seed too.
+    """
+    rng = _rng(seed, index)
+    damage_type = damage_type or rng.choice(DAMAGE_TYPES)
+    line_items = rng.randint(4, 12) if line_items is None else line_items
+    equipment = rng.randint(0, 4) if equipment is None else equipment
+    area = rng.randint(*AREA_RANGES[damage_type])
+    estimate_date = date(2025, 1, 1) + timedelta(days=rng.randrange(365))
+    town, zip_code = rng.choice(TOWNS)
+    width, height = photo_size
+
+    return {
+        'customer_name': f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+        'customer_address': f"{rng.randint(10, 9999)} {rng.choice(STREETS)}, {town}, PA {zip_code}",
+        'date': estimate_date.strftime('%m/%d/%Y'),
+        'job_number': f"EST-{estimate_date:%Y%m%d}{rng.randrange(10000):04d}",
+        'assessment': {
+            'damage_type': damage_type,
+            'classification': _classification(rng, damage_type),
+            'affected_area': area,
+            'severity': rng.choice(SEVERITIES)
+        },
+        'line_items': _line_items(rng, damage_type, line_items, area),
+        'markup': rng.choice((0, 10, 15, 20)),
+        'equipment': _equipment(rng, damage_type, equipment),
+        'photos': [
+            make_photo(width, height, rng.randrange(2 ** 32), photo_format,
+                       caption=f"{rng.choice(ROOMS)} - {rng.choice(PHOTO_SUBJECTS)}")
+            for _ in range(photos)
+        ]
+    }
+
+
+def to_api_payload(estimate):
+    """The estimate as the frontend posts it to app.py's /api/generate-pdf"""
+    name = estimate['customer_name']
+    assessment = estimate['assessment']
+    return {
+        'customerInfo': {
+            'name': name,
+            'address': estimate['customer_address'],
+            'phone': '717-555-0100',
+            'email': f"{name.lower().replace(' ', '.')}@example.com"
+        },
+        'analysis': {
+            'damage_type': assessment['damage_type'],
+            'severity': assessment['severity'],
+            'affected_area_sqft': assessment['affected_area'],
+            'classification': assessment['classification']
+        },
+        'lineItems': [
+            {'description': item['description'], 'quantity': item['quantity'], 'unitPrice': item['unit_price'],
+             'total': round(item['quantity'] * item['unit_price'], 2)}
+            for item in estimate['line_items']
+        ],
+        'markup': estimate['markup'],
+        'equipment': estimate['equipment'],
+        'photos': estimate['photos']
+    }
+
+
+def generate_estimates(count, seed=0, damage_types=DAMAGE_TYPES, line_items=(4, 12), equipment=(0, 4),
+                       photos=(0, 0), **photo_options):
+    """Yield count estimates; each range is (low, high), drawn per estimate"""
+    for index in range(count):
+        rng = _rng(seed, f"shape:{index}")
+        yield make_estimate(seed, index, damage_type=rng.choice(damage_types),
+                            line_items=rng.randint(*line_items), equipment=rng.randint(*equipment),
+                            photos=rng.randint(*photos), **photo_options)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--count', type=int, default=100)
+    parser.add_argument('--seed', default='0')
+    parser.add_argument('--damage-types', choices=DAMAGE_TYPES, nargs='+', default=list(DAMAGE_TYPES))
+    parser.add_argument('--line-items', type=int, nargs=2, default=[4, 12], metavar=('MIN', 'MAX'))
+    parser.add_argument('--equipment', type=int, nargs=2, default=[0, 4], metavar=('MIN', 'MAX'))
+    parser.add_argument('--photos', type=int, nargs=2, default=[0, 0], metavar=('MIN', 'MAX'))
+    parser.add_argument('--photo-size', default='1600x1200')
+    parser.add_argument('--photo-format', choices=('JPEG', 'PNG'), default='JPEG')
+    parser.add_argument('--api', action='store_true', help="write app.py request payloads instead")
+    parser.add_argument('-o', '--output', help="NDJSON file to write (default: stdout)")
+    args = parser.parse_args()
+
+    photo_size = tuple(int(n) for n in args.photo_size.split('x'))
+    out = open(args.output, 'w') if args.output else sys.stdout
+    try:
+        for estimate in generate_estimates(args.count, args.seed, args.damage_types, args.line_items,
+                                           args.equipment, args.photos, photo_size=photo_size,
+                                           photo_format=args.photo_format):
+            out.write(json.dumps(to_api_payload(estimate) if args.api else estimate) + '\n')
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,197 @@
+"""
+Circuit breaker for the vision API
+
+When the API degrades, every analysis waits out its deadline and then
+fails, and the workers pile up behind it. The breaker watches the outcome
+and duration of recent calls, over the last BREAKER_WINDOW seconds. Once
+at least BREAKER_MIN_CALLS have been seen, it opens if too many failed
+(BREAKER_ERROR_RATE) or took longer than BREAKER_SLOW_SECONDS
+(BREAKER_SLOW_RATE). While it is open, calls fail at once with
+CircuitOpen, and callers answer from local heuristics instead. After
+BREAKER_OPEN_SECONDS one probe call is let through. If it succeeds
+quickly the breaker closes, and if not it opens again.
+
+Only faults of the API itself count as failures: 5xx responses, 429s that
+outlasted the limiter's retries, connection errors and API timeouts.
+Errors caused by the request pass through unrecorded: a 4xx for bad input,
+the client's own deadline passing, or a full local queue. A few impatient
+clients or one malformed upload therefore can't open the breaker for
+everyone.
+
+State is per process.
+"""
+
+import os
+import math
+import time
+import logging
+import threading
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+try:
+    import httpx
+    import openai
+    # APITimeoutError is an APIConnectionError; httpx errors can surface raw mid-stream
+    CONNECTION_FAULTS = (openai.APIConnectionError, httpx.TransportError)
+    STATUS_ERROR = openai.APIStatusError
+except ImportError:
+    CONNECTION_FAULTS = ()
+    STATUS_ERROR = None
+
+BREAKER_WINDOW = float(os.getenv('BREAKER_WINDOW', 60))
+BREAKER_MIN_CALLS = int(os.getenv('BREAKER_MIN_CALLS', 10))
+BREAKER_ERROR_RATE = float(os.getenv('BREAKER_ERROR_RATE', 0.5))
+BREAKER_SLOW_SECONDS = float(os.getenv('BREAKER_SLOW_SECONDS', 45))
+BREAKER_SLOW_RATE = float(os.getenv('BREAKER_SLOW_RATE', 0.8))
+BREAKER_OPEN_SECONDS = float(os.getenv('BREAKER_OPEN_SECONDS', 30))
+
+
+class CircuitOpen(Exception):
+    """The breaker is open; the call wasn't made"""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def upstream_fault(error):
+    """Whether error means the API is failing, rather than this request being bad"""
+    if STATUS_ERROR is not None and isinstance(error, STATUS_ERROR):
+        return error.status_code >= 500 or error.status_code == 429
+    return isinstance(error, CONNECTION_FAULTS)
+
+
+class CircuitBreaker:
+    """Closed, open or half-open, from the error rate and latency of recent calls"""
+
+    def __init__(self, window=BREAKER_WINDOW, min_calls=BREAKER_MIN_CALLS, error_rate=BREAKER_ERROR_RATE,
+                 slow_seconds=BREAKER_SLOW_SECONDS, slow_rate=BREAKER_SLOW_RATE, open_seconds=BREAKER_OPEN_SECONDS,
+                 is_failure=upstream_fault):
+        self.window = window
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_seconds = slow_seconds
+        self.slow_rate = slow_rate
+        self.open_seconds = open_seconds
+        self.is_failure = is_failure
+        self.state = 'closed'
+        self._outcomes = deque()    # (time, failed, slow)
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        self.opened = 0
+        self.rejected = 0
+
+    def _rejection(self, now):
+        """CircuitOpen if a call can't go through now (lock held), else None"""
+        if self.state == 'open' and now < self._opened_at + self.open_seconds:
+            retry_after = math.ceil(self._opened_at + self.open_seconds - now)
+        elif self.state == 'half_open' and self._probing:
+            retry_after = math.ceil(self.open_seconds)
+        else:
+            return None
+        return CircuitOpen(f"Vision API circuit {self.state.replace('_', '-')}", retry_after=retry_after)
+
+    def check(self):
+        """Raise CircuitOpen if a call made now would be refused; for failing fast before costly setup"""
+        with self._lock:
+            rejection = self._rejection(time.monotonic())
+            if rejection:
+                self.rejected += 1
+                raise rejection
+
+    def _admit(self):
+        """Let a call through or raise CircuitOpen; True if the call is the half-open probe"""
+        with self._lock:
+            now = time.monotonic()
+            rejection = self._rejection(now)
+            if rejection:
+                self.rejected += 1
+                raise rejection
+            if self.state == 'open':
+                self.state = 'half_open'
+                logger.info("Vision API circuit half-open, sending a probe call")
+            if self.state == 'half_open':
+                self._probing = True
+                return True
+            return False
+
+    def _record(self, probe, failed, elapsed):
+        slow = elapsed >= self.slow_seconds
+        with self._lock:
+            now = time.monotonic()
+            if probe:
+                self._probing = False
+                if failed or slow:
+                    self._trip(now, f"probe call {'failed' if failed else f'took {elapsed:.0f}s'}")
+                else:
+                    self.state = 'closed'
+                    self._outcomes.clear()
+                    logger.info("Vision API circuit closed")
+                return
+            if self.state != 'closed':
+                # A call from before the breaker opened
+                return
+            self._outcomes.append((now, failed, slow))
+            while self._outcomes and self._outcomes[0][0] < now - self.window:
+                self._outcomes.popleft()
+            calls = len(self._outcomes)
+            if calls < self.min_calls:
+                return
+            failures = sum(1 for _, failed, _ in self._outcomes if failed)
+            slow_calls = sum(1 for _, _, slow in self._outcomes if slow)
+            if failures >= calls * self.error_rate:
+                self._trip(now, f"{failures} of {calls} calls failed")
+            elif slow_calls >= calls * self.slow_rate:
+                self._trip(now, f"{slow_calls} of {calls} calls took over {self.slow_seconds:g}s")
+
+    def _trip(self, now, reason):
+        """Open the breaker (lock held)"""
+        self.state = 'open'
+        self._opened_at = now
+        self._outcomes.clear()
+        self.opened += 1
+        logger.warning(f"Vision API circuit open for {self.open_seconds:g}s: {reason}")
+
+    def run(self, fn, *args, **kwargs):
+        """Call fn through the breaker
+
+        Exceptions for which is_failure is true count as failures. Any other
+        exception is re-raised unrecorded, and a probe that raises one
+        leaves the breaker half-open for the next call.
+        """
+        probe = self._admit()
+        start = time.monotonic()
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            if isinstance(e, Exception) and self.is_failure(e):
+                self._record(probe, True, time.monotonic() - start)
+            elif probe:
+                with self._lock:
+                    self._probing = False
+            raise
+        self._record(probe, False, time.monotonic() - start)
+        return result
+
+    def stats(self):
+        with self._lock:
+            now = time.monotonic()
+            calls = len(self._outcomes)
+            failures = sum(1 for _, failed, _ in self._outcomes if failed)
+            slow_calls = sum(1 for _, _, slow in self._outcomes if slow)
+            return {
+                'state': self.state,
+                'window_calls': calls,
+                'error_rate': round(failures / calls, 3) if calls else 0.0,
+                'slow_rate': round(slow_calls / calls, 3) if calls else 0.0,
+                'opened': self.opened,
+                'rejected': self.rejected,
+                'open_seconds_left': max(0, round(self._opened_at + self.open_seconds - now, 1))
+                                     if self.state == 'open' else 0
+            }
+
+
+vision_breaker = CircuitBreaker()
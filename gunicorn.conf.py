@@ -0,0 +1,65 @@
+"""
+Gunicorn settings, picked up automatically from the working directory
+
+Worker count, binding and the rest still come from the command line and
+environment (WEB_CONCURRENCY, PORT); this file adds worker lifecycle hooks
+for process-wide resources that must not cross a fork, and a worker
+timeout that outlasts the analysis deadline.
+
+Workers are threaded (gthread). Analysis progress is sent as a
+server-sent event stream that holds its connection until the analysis
+finishes; under the default sync worker one such stream would block the
+worker for every other request. GUNICORN_THREADS sets the threads per
+worker, and so how many streams and requests a worker serves at once.
+
+These settings apply to whichever app gunicorn serves, the deployed
+app:app (PDFs only, no analyses) included; options given on the command
+line override them.
+
+The master reads this file before the app is loaded, so nothing here
+imports the app's modules at the top: settings come from the environment
+(with .env loaded first, as the app does), and the hooks only touch the
+OpenAI client if the loaded app imported it.
+"""
+
+import os
+import sys
+import threading
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), '.env'))
+except ImportError:
+    pass
+
+# Event streams hold a thread each for as long as the analysis runs
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', 8))
+
+# Analyses give up at their deadline and answer 504; the default 30s would kill the worker first
+timeout = int(float(os.getenv('ANALYSIS_DEADLINE', 90))) + 30
+
+
+def _openai_client():
+    """The openai_client module if the app uses it, else None"""
+    return sys.modules.get('openai_client')
+
+
+def post_fork(server, worker):
+    # With --preload the master may have built a client; its sockets are not ours
+    module = _openai_client()
+    if module is not None:
+        module.reset_openai_client()
+
+
+def post_worker_init(worker):
+    # Connect to the OpenAI API in the background so the first analysis doesn't pay for it
+    module = _openai_client()
+    if module is not None:
+        threading.Thread(target=module.warm_openai_client, name='openai-warmup', daemon=True).start()
+
+
+def worker_exit(server, worker):
+    module = _openai_client()
+    if module is not None:
+        module.close_openai_client()
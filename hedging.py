@@ -0,0 +1,169 @@
+"""
+Hedged vision calls
+
+Most of the vision call's long tail is time to first token: a call that
+has started streaming finishes at a predictable pace, and one that hasn't
+may sit there for a minute. With ANALYSIS_HEDGE on, a call that hasn't
+produced any output by the ANALYSIS_HEDGE_PERCENTILE of recent
+time-to-first-output gets a duplicate. Whichever attempt starts streaming
+first wins, and the other is closed. Only one attempt ever streams a
+result, so partial fields are never published twice.
+
+A hedge is only sent when the upstream limiter has a free slot, so
+hedging never adds load while the API is throttling.
+"""
+
+import os
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from upstream_limiter import DeadlineExceeded, time_left, UPSTREAM_MAX_CONCURRENCY
+
+logger = logging.getLogger(__name__)
+
+ANALYSIS_HEDGE = os.getenv('ANALYSIS_HEDGE', '').lower() in ('1', 'true', 'yes')
+ANALYSIS_HEDGE_PERCENTILE = float(os.getenv('ANALYSIS_HEDGE_PERCENTILE', 95))
+# Seconds; the hedge delay never drops below this, and is this until enough calls were seen
+ANALYSIS_HEDGE_MIN_DELAY = float(os.getenv('ANALYSIS_HEDGE_MIN_DELAY', 2))
+ANALYSIS_HEDGE_DEFAULT_DELAY = float(os.getenv('ANALYSIS_HEDGE_DEFAULT_DELAY', 10))
+HEDGE_MIN_SAMPLES = 20
+
+
+class LatencyWindow:
+    """The most recent latencies (ms), for percentiles"""
+
+    def __init__(self, size=500):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def observe(self, ms):
+        with self._lock:
+            self._samples.append(ms)
+
+    def percentile(self, q):
+        """q-th percentile (0-100), nearest-rank; None when empty"""
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        return samples[max(0, int(round(len(samples) * q / 100)) - 1)]
+
+    def __len__(self):
+        return len(self._samples)
+
+
+class AttemptLost(Exception):
+    """Another attempt at the same call started streaming first"""
+
+
+class Race:
+    """Decides which attempt at a call gets to stream its result"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._streams = {}
+        self.winner = None
+        # Set once an attempt has won or finished, so the hedge timer can stop early
+        self.settled = threading.Event()
+
+    def register(self, attempt, stream):
+        """Note attempt's open stream so it can be closed if it loses"""
+        with self._lock:
+            lost = self.winner is not None and self.winner != attempt
+            if not lost:
+                self._streams[attempt] = stream
+        if lost:
+            stream.close()
+            raise AttemptLost()
+
+    def claim(self, attempt):
+        """Called at an attempt's first output; True if it is the first, and so wins"""
+        with self._lock:
+            if self.winner is None:
+                self.winner = attempt
+            won = self.winner == attempt
+            losers = [stream for other, stream in self._streams.items() if other != self.winner]
+        self.settled.set()
+        for stream in losers:
+            try:
+                stream.close()
+            except Exception:
+                pass
+        return won
+
+
+class Hedger:
+    """Runs a call's attempts, hedging slow ones, and tracks time to first output"""
+
+    def __init__(self, enabled=ANALYSIS_HEDGE, percentile=ANALYSIS_HEDGE_PERCENTILE):
+        self.enabled = enabled
+        self.percentile = percentile
+        self.first_output = LatencyWindow()
+        self._pool = ThreadPoolExecutor(max_workers=UPSTREAM_MAX_CONCURRENCY * 2, thread_name_prefix='hedge')
+        self._lock = threading.Lock()
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    def delay(self):
+        """Seconds to wait for output before hedging"""
+        if len(self.first_output) < HEDGE_MIN_SAMPLES:
+            return ANALYSIS_HEDGE_DEFAULT_DELAY
+        return max(ANALYSIS_HEDGE_MIN_DELAY, self.first_output.percentile(self.percentile) / 1000)
+
+    def run(self, attempt_fn, deadline=None, can_hedge=lambda: True):
+        """Return attempt_fn(race, attempt)'s result, from the first attempt to produce output
+
+        attempt_fn must register its stream with race and call
+        race.claim(attempt) at its first output, raising AttemptLost if the
+        claim fails. If every attempt fails, the first failure is raised;
+        if they all raised AttemptLost, DeadlineExceeded is.
+        """
+        race = Race()
+        if not self.enabled:
+            return attempt_fn(race, 0)
+
+        primary = self._pool.submit(attempt_fn, race, 0)
+        primary.add_done_callback(lambda _: race.settled.set())
+        futures = [primary]
+        wait = self.delay()
+        remaining = time_left(deadline)
+        if remaining is not None:
+            wait = min(wait, max(0.0, remaining))
+        if not race.settled.wait(wait) and (deadline is None or time_left(deadline) > 0) and can_hedge():
+            with self._lock:
+                self.hedged += 1
+            logger.info(f"No vision output after {wait:.1f}s, sending a hedged request")
+            futures.append(self._pool.submit(attempt_fn, race, 1))
+
+        error = None
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except AttemptLost:
+                continue
+            except Exception as e:
+                # The other attempt may still come through
+                error = error or e
+                continue
+            if future is not primary:
+                with self._lock:
+                    self.hedge_wins += 1
+            return result
+        if error is None:
+            # Every attempt bowed out as lost without any of them producing a result
+            raise DeadlineExceeded("No vision attempt produced a result")
+        raise error
+
+    def stats(self):
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'delay_seconds': round(self.delay(), 3),
+                'hedged': self.hedged,
+                'hedge_wins': self.hedge_wins
+            }
+
+
+vision_hedger = Hedger()
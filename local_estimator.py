@@ -0,0 +1,336 @@
+"""
+Rule-based damage estimates, computed locally
+
+The vision model takes tens of seconds and can be slow or down, and
+/api/mock-analyze only returns canned examples. This module sizes a job
+from the handful of facts a technician knows on site: the affected area,
+the water category and class, the soot level, the mold condition and
+species. It returns an analysis in the same shape as the vision model's,
+in microseconds. It serves instant pre-fills and stands in for the model
+when the model can't answer.
+
+The mold rules are a port of js/mold-analysis.js (IICRC S520, York, PA
+pricing): air scrubbers from the room volume and air changes per level,
+negative air, containment sheeting and zipper doors, species cost
+multipliers and the estimate minimums. Water and fire price the work per
+square foot (fire at the vision prompt's rates) and size drying and air
+scrubbing equipment from the IICRC S500/S700 rules of thumb below.
+"""
+
+import math
+
+DAMAGE_TYPES = ('water', 'fire', 'mold')
+DEFAULT_CEILING_HEIGHT = 8
+# Assumed when an estimate is needed and nobody measured the area
+DEFAULT_AREA_SQFT = {'water': 500, 'fire': 500, 'mold': 50}
+# A rule-based estimate is a starting point, not an assessment
+LOCAL_CONFIDENCE_PERCENT = 50
+
+# --- Water (IICRC S500) ---
+
+# Extraction per sq ft by category; equipment and labor are priced as their own line items
+WATER_CATEGORY_RATES = {'1': 1.25, '2': 1.50, '3': 2.50}
+# Floor area one air mover covers, and cubic feet per LGR dehumidifier, by class
+WATER_AIR_MOVER_SQFT = {'1': 70, '2': 50, '3': 40, '4': 50}
+WATER_DEHUMIDIFIER_CUFT = {'1': 4000, '2': 2000, '3': 1500, '4': 1250}
+WATER_DRYING_DAYS = {'1': 2, '2': 3, '3': 4, '4': 5}
+WATER_RENTAL_RATES = {'Dehumidifier': 85.00, 'Air Mover': 45.00}
+ANTIMICROBIAL_RATE = 0.75
+LABOR_RATE = 125.00
+
+# --- Fire (IICRC S700) ---
+
+FIRE_SOOT_RATES = {'light': 4.00, 'moderate': 6.00, 'heavy': 8.00}
+STRUCTURAL_RATE = 37.50
+FIRE_SOOT_ACH = {'light': 'level2', 'moderate': 'level3', 'heavy': 'level4'}
+FIRE_CLEANING_DAYS = {'light': 2, 'moderate': 3, 'heavy': 5}
+HYDROXYL_SQFT = 1000
+FIRE_RENTAL_RATES = {'Air Scrubber': 175.00, 'Hydroxyl Generator': 150.00}
+
+# --- Mold (IICRC S520; js/mold-analysis.js) ---
+
+MOLD_SPECIES_COST_MULTIPLIERS = {
+    'stachybotrys': 1.5,
+    'aspergillus': 1.0,
+    'penicillium': 1.0,
+    'cladosporium': 0.8,
+    'chaetomium': 1.3,
+    'alternaria': 0.9,
+}
+# York, PA remediation per sq ft by contamination level: midpoints of the JS ranges
+MOLD_LEVEL_RATES = {'level1': 12.50, 'level2': 20.00, 'level3': 25.00, 'level4': 30.00, 'level5': 40.00}
+AIR_CHANGES_REQUIRED = {'level1': 4, 'level2': 6, 'level3': 8, 'level4': 10, 'level5': 12}
+CONTAINMENT_COSTS = {'mini': 200, 'full': 500, 'multi-room': 1500}
+NEGATIVE_PRESSURE_ZONE_COST = 150
+MOLD_RENTAL_RATES = {'HEPA Air Scrubber': 175.00, 'Negative Air Machine': 200.00, 'Dehumidifier': 100.00}
+MOLD_TREATMENT_RATES = {'HEPA vacuuming': 1.125, 'Antimicrobial application': 2.25}
+POST_REMEDIATION_VERIFICATION = 500
+MOLD_MINIMUMS = {'condition2': 1500, 'condition3': 2500, 'hvac': 5000}
+SPECIES_ALERTS = {
+    'stachybotrys': ('Black mold detected - enhanced PPE required', 5000),
+    'chaetomium': ('Chronic water damage indicator present', None),
+}
+MOLD_MIN_DAYS = 3
+
+
+def calculate_air_scrubbers(cubic_feet, level, cfm_per_unit=500):
+    """500 CFM air scrubbers for the level's air changes per hour"""
+    return math.ceil(cubic_feet * AIR_CHANGES_REQUIRED[level] / 60 / cfm_per_unit)
+
+
+def calculate_negative_pressure(cubic_feet):
+    """Negative air machines to exhaust 10% of the volume per hour"""
+    return math.ceil(cubic_feet * 0.1 / 60 / 500)
+
+
+def calculate_containment(perimeter_feet, height_feet):
+    """Poly sheeting (sq ft, with 20% overlap), zipper doors and their cost"""
+    plastic_sqft = perimeter_feet * height_feet * 1.2
+    zipper_doors = math.ceil(perimeter_feet / 30)
+    return {
+        'plastic_sqft': round(plastic_sqft, 1),
+        'zipper_doors': zipper_doors,
+        'cost': round(plastic_sqft * 0.25 + zipper_doors * 45, 2)
+    }
+
+
+def mold_level(area_sqft, hvac=False):
+    """S520 contamination level: by area, or level5 for HVAC contamination"""
+    if hvac:
+        return 'level5'
+    if area_sqft < 10:
+        return 'level1'
+    if area_sqft <= 30:
+        return 'level2'
+    if area_sqft <= 100:
+        return 'level3'
+    return 'level4'
+
+
+def _line_item(description, quantity, unit, unit_price, category):
+    return {
+        'description': description,
+        'quantity': quantity,
+        'unit': unit,
+        'unitPrice': round(unit_price, 2),
+        'category': category,
+        'total': round(quantity * unit_price, 2)
+    }
+
+
+def _rentals(equipment, rates):
+    """Equipment rental line items, priced per unit-day"""
+    return [
+        _line_item(f"{item['name']} rental", item['quantity'] * item['days'], 'day', rates[item['name']], 'Equipment')
+        for item in equipment if item['quantity']
+    ]
+
+
+def _analysis(damage_type, area_sqft, severity, fields, equipment, line_items, days):
+    analysis = {'damage_type': damage_type, 'affected_area_sqft': area_sqft, 'severity': severity}
+    analysis.update(fields)
+    analysis.update({
+        'equipment_needed': equipment,
+        'line_items': line_items,
+        'estimated_days': days,
+        'total_estimate': round(sum(item['total'] for item in line_items), 2),
+        'confidence_percent': LOCAL_CONFIDENCE_PERCENT,
+        'source': 'local_estimator'
+    })
+    return analysis
+
+
+def estimate_water(area_sqft, category='2', water_class='2', ceiling_height=DEFAULT_CEILING_HEIGHT,
+                   standing_water=False):
+    category, water_class = str(category), str(water_class)
+    cubic_feet = area_sqft * ceiling_height
+    days = WATER_DRYING_DAYS[water_class] + (1 if category == '3' else 0)
+    equipment = [
+        {'name': 'Dehumidifier', 'quantity': max(1, math.ceil(cubic_feet / WATER_DEHUMIDIFIER_CUFT[water_class])),
+         'days': days},
+        {'name': 'Air Mover', 'quantity': max(1, math.ceil(area_sqft / WATER_AIR_MOVER_SQFT[water_class])),
+         'days': days}
+    ]
+    line_items = [_line_item('Water extraction', area_sqft, 'sqft',
+                             WATER_CATEGORY_RATES[category], 'Mitigation')]
+    if category != '1':
+        line_items.append(_line_item('Antimicrobial treatment', area_sqft, 'sqft', ANTIMICROBIAL_RATE, 'Treatment'))
+    # Half an hour of setup per unit, plus an hour of monitoring a day
+    units = sum(item['quantity'] for item in equipment)
+    line_items.append(_line_item('Drying equipment setup and monitoring', math.ceil(units / 2) + days, 'hour',
+                                 LABOR_RATE, 'Labor'))
+    line_items.extend(_rentals(equipment, WATER_RENTAL_RATES))
+
+    if category == '3' or water_class == '4':
+        severity = 'severe'
+    elif category == '2' or water_class == '3':
+        severity = 'moderate'
+    else:
+        severity = 'minor'
+    fields = {
+        'category': category,
+        'class': water_class,
+        'standing_water': standing_water,
+        'health_risk': {'1': 'low', '2': 'medium', '3': 'high'}[category]
+    }
+    return _analysis('water', area_sqft, severity, fields, equipment, line_items, days)
+
+
+def estimate_fire(area_sqft, soot_level='moderate', structural_sqft=0, ceiling_height=DEFAULT_CEILING_HEIGHT,
+                  odor=True):
+    cubic_feet = area_sqft * ceiling_height
+    days = FIRE_CLEANING_DAYS[soot_level]
+    equipment = [
+        {'name': 'Air Scrubber', 'quantity': max(1, calculate_air_scrubbers(cubic_feet, FIRE_SOOT_ACH[soot_level])),
+         'days': days},
+        {'name': 'Hydroxyl Generator', 'quantity': math.ceil(area_sqft / HYDROXYL_SQFT) if odor else 0, 'days': days}
+    ]
+    line_items = [_line_item('Soot and smoke cleaning', area_sqft, 'sqft', FIRE_SOOT_RATES[soot_level], 'Cleaning')]
+    if structural_sqft:
+        line_items.append(_line_item('Structural repair', structural_sqft, 'sqft', STRUCTURAL_RATE, 'Structural'))
+    line_items.extend(_rentals(equipment, FIRE_RENTAL_RATES))
+
+    if structural_sqft or soot_level == 'heavy':
+        severity = 'severe'
+    else:
+        severity = 'moderate' if soot_level == 'moderate' else 'minor'
+    fields = {
+        'soot_level': soot_level,
+        'structural_damage': bool(structural_sqft),
+        'odor_level': 'high' if odor and soot_level == 'heavy' else 'medium' if odor else 'low'
+    }
+    return _analysis('fire', area_sqft, severity, fields, equipment, line_items, days)
+
+
+def estimate_mold(area_sqft, condition='3', species=(), ceiling_height=DEFAULT_CEILING_HEIGHT, hvac=False,
+                  moisture_source=True):
+    condition = str(condition)
+    species = [name.lower() for name in species]
+    level = mold_level(area_sqft, hvac)
+    cubic_feet = area_sqft * ceiling_height
+    multiplier = max([MOLD_SPECIES_COST_MULTIPLIERS.get(name, 1.0) for name in species] or [1.0])
+    warnings = [SPECIES_ALERTS[name][0] for name in species if name in SPECIES_ALERTS]
+
+    if condition == '1':
+        # Normal fungal ecology: nothing to remediate
+        return _analysis('mold', area_sqft, 'minor', {
+            'condition': condition, 'containment_required': False, 'health_warnings': warnings
+        }, [], [], 0)
+
+    days = MOLD_MIN_DAYS + (1 if level in ('level4', 'level5') else 0)
+    # Containment around a square work area, over 10 sq ft only
+    containment_required = area_sqft > 10
+    containment = calculate_containment(4 * math.sqrt(area_sqft), ceiling_height) if containment_required else None
+    equipment = [
+        {'name': 'HEPA Air Scrubber', 'quantity': max(1, calculate_air_scrubbers(cubic_feet, level)), 'days': days},
+        {'name': 'Negative Air Machine',
+         'quantity': max(1, calculate_negative_pressure(cubic_feet)) if containment_required else 0, 'days': days},
+        {'name': 'Dehumidifier', 'quantity': 1 if moisture_source else 0, 'days': days}
+    ]
+
+    line_items = []
+    if condition == '3':
+        line_items.append(_line_item('Mold remediation', area_sqft, 'sqft', MOLD_LEVEL_RATES[level] * multiplier,
+                                     'Remediation'))
+    for description, rate in MOLD_TREATMENT_RATES.items():
+        line_items.append(_line_item(description, area_sqft, 'sqft', rate, 'Treatment'))
+    if containment:
+        kind = 'full' if area_sqft <= 100 else 'multi-room'
+        line_items.append(_line_item(f"{kind.capitalize()} containment setup", 1, 'each',
+                                     CONTAINMENT_COSTS[kind] + containment['cost'], 'Setup'))
+        line_items.append(_line_item('Negative pressure zone', 1, 'each', NEGATIVE_PRESSURE_ZONE_COST, 'Setup'))
+    elif condition == '3':
+        line_items.append(_line_item('Mini containment', 1, 'each', CONTAINMENT_COSTS['mini'], 'Setup'))
+    line_items.extend(_rentals(equipment, MOLD_RENTAL_RATES))
+    if condition == '3' or 'stachybotrys' in species:
+        line_items.append(_line_item('Post-remediation verification', 1, 'each', POST_REMEDIATION_VERIFICATION,
+                                     'Testing'))
+
+    # Estimates never come in under the S520 minimums
+    minimum = MOLD_MINIMUMS['condition3'] if condition == '3' else MOLD_MINIMUMS['condition2']
+    if hvac:
+        minimum = max(minimum, MOLD_MINIMUMS['hvac'])
+    for name in species:
+        if name in SPECIES_ALERTS and SPECIES_ALERTS[name][1]:
+            minimum = max(minimum, SPECIES_ALERTS[name][1])
+    subtotal = sum(item['total'] for item in line_items)
+    if subtotal < minimum:
+        line_items.append(_line_item('Minimum charge adjustment', 1, 'each', minimum - subtotal, 'Adjustment'))
+
+    number = int(level[-1])
+    fields = {
+        'condition': condition,
+        'contamination_level': str(min(number, 4)),
+        'mold_types_visible': species,
+        'containment_required': containment_required,
+        'containment': containment,
+        'health_risk': 'high' if 'stachybotrys' in species or number >= 4 else 'medium',
+        'health_warnings': warnings
+    }
+    severity = 'severe' if number >= 4 else 'moderate' if number >= 2 else 'minor'
+    return _analysis('mold', area_sqft, severity, fields, equipment, line_items, days)
+
+
+ESTIMATORS = {'water': estimate_water, 'fire': estimate_fire, 'mold': estimate_mold}
+
+# Parameters each estimator takes, with how to read them from form or JSON values
+_CHOICES = {
+    'category': ('1', '2', '3'),
+    'water_class': ('1', '2', '3', '4'),
+    'soot_level': tuple(FIRE_SOOT_RATES),
+    'condition': ('1', '2', '3'),
+}
+_FLAGS = ('standing_water', 'odor', 'hvac', 'moisture_source')
+_NUMBERS = ('ceiling_height', 'structural_sqft')
+_PARAMS = {
+    'water': ('category', 'water_class', 'ceiling_height', 'standing_water'),
+    'fire': ('soot_level', 'structural_sqft', 'ceiling_height', 'odor'),
+    'mold': ('condition', 'species', 'ceiling_height', 'hvac', 'moisture_source'),
+}
+
+
+def parse_estimate_params(damage_type, values):
+    """Estimator keyword arguments from request values (a dict of strings or JSON values)
+
+    Raises ValueError with a message fit for the client on a bad value.
+    Values the estimator doesn't take are ignored.
+    """
+    if damage_type not in ESTIMATORS:
+        raise ValueError('Damage type must be water, fire, or mold')
+    try:
+        area_sqft = float(values.get('affected_area_sqft'))
+    except (TypeError, ValueError):
+        raise ValueError('affected_area_sqft must be a number')
+    if not area_sqft > 0:
+        raise ValueError('affected_area_sqft must be positive')
+
+    params = {'area_sqft': area_sqft}
+    for name in _PARAMS[damage_type]:
+        value = values.get(name)
+        if value is None or value == '':
+            continue
+        if name in _CHOICES:
+            value = str(value).lower()
+            if value not in _CHOICES[name]:
+                raise ValueError(f"{name} must be one of: {', '.join(_CHOICES[name])}")
+        elif name in _FLAGS:
+            value = value if isinstance(value, bool) else str(value).lower() in ('1', 'true', 'yes', 'on')
+        elif name in _NUMBERS:
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                raise ValueError(f"{name} must be a number")
+            if value < 0:
+                raise ValueError(f"{name} must not be negative")
+        elif name == 'species':
+            value = [name.strip() for name in value.split(',')] if isinstance(value, str) else list(value)
+            value = [name for name in value if name]
+        params[name] = value
+    return params
+
+
+def local_estimate(damage_type, area_sqft, **params):
+    """Rule-based analysis of damage_type over area_sqft; see the estimate_* functions for params"""
+    if float(area_sqft).is_integer():
+        area_sqft = int(area_sqft)
+    return ESTIMATORS[damage_type](area_sqft, **params)
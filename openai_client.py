@@ -0,0 +1,123 @@
+"""
+Shared OpenAI client
+
+One client per process, so every analysis reuses the same HTTP connection
+pool: keep-alive connections and TLS sessions to the API survive between
+requests instead of being set up again for each one. The SDK's default pool
+drops idle connections after 5 seconds, which for an analysis endpoint
+hit every few seconds or minutes means nearly every call reconnected;
+OPENAI_KEEPALIVE_SECONDS keeps them much longer.
+
+Under gunicorn (see gunicorn.conf.py) each worker builds its own client
+after the fork, warms a connection before taking requests and closes the
+pool on exit. A client inherited across a fork is never used: its sockets
+belong to the parent.
+"""
+
+import os
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+try:
+    import httpx
+    import openai
+    HAS_OPENAI = True
+except ImportError:
+    HAS_OPENAI = False
+
+OPENAI_MODEL = os.getenv('OPENAI_MODEL', 'gpt-4-vision-preview')
+# Seconds; the read timeout bounds one whole completion
+OPENAI_TIMEOUT = float(os.getenv('OPENAI_TIMEOUT', 60))
+OPENAI_CONNECT_TIMEOUT = float(os.getenv('OPENAI_CONNECT_TIMEOUT', 5))
+OPENAI_MAX_RETRIES = int(os.getenv('OPENAI_MAX_RETRIES', 2))
+OPENAI_MAX_CONNECTIONS = int(os.getenv('OPENAI_MAX_CONNECTIONS', 20))
+OPENAI_KEEPALIVE_SECONDS = float(os.getenv('OPENAI_KEEPALIVE_SECONDS', 60))
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+
+def _build_client():
+    http_client = httpx.Client(
+        timeout=httpx.Timeout(OPENAI_TIMEOUT, connect=OPENAI_CONNECT_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=OPENAI_MAX_CONNECTIONS,
+            keepalive_expiry=OPENAI_KEEPALIVE_SECONDS
+        )
+    )
+    return openai.OpenAI(
+        api_key=os.getenv('OPENAI_API_KEY'),
+        max_retries=OPENAI_MAX_RETRIES,
+        http_client=http_client
+    )
+
+
+def get_openai_client():
+    """Return this process's OpenAI client, building it on first use
+
+    Returns None when the SDK isn't installed or no API key is set.
+    """
+    global _client, _client_pid
+    if not HAS_OPENAI or not os.getenv('OPENAI_API_KEY'):
+        return None
+    pid = os.getpid()
+    if _client is None or _client_pid != pid:
+        with _client_lock:
+            if _client is None or _client_pid != pid:
+                _client = _build_client()
+                _client_pid = pid
+                logger.info(f"OpenAI client ready (pid {pid}, up to {OPENAI_MAX_CONNECTIONS} connections)")
+    return _client
+
+
+def reset_openai_client():
+    """Forget a client inherited from a parent process without touching its sockets"""
+    global _client, _client_pid
+    with _client_lock:
+        _client = None
+        _client_pid = None
+
+
+def close_openai_client():
+    """Close this process's connection pool (worker shutdown)"""
+    global _client, _client_pid
+    with _client_lock:
+        client, _client = _client, None
+        owned = _client_pid == os.getpid()
+        _client_pid = None
+    if client is not None and owned:
+        client.close()
+
+
+def warm_openai_client():
+    """Open a pooled connection to the API ahead of the first analysis
+
+    Listing models costs no quota; the TLS connection it leaves in the pool
+    is what matters (and a bad key shows up in the log at boot).
+    """
+    client = get_openai_client()
+    if client is None:
+        return False
+    try:
+        client.with_options(max_retries=0, timeout=OPENAI_CONNECT_TIMEOUT * 2).models.list()
+        return True
+    except openai.APIError as e:
+        logger.warning(f"OpenAI connection warm-up failed: {e}")
+        return False
+
+
+def openai_client_stats():
+    """Pool settings and whether this process has built its client, for /health"""
+    return {
+        'ready': _client is not None and _client_pid == os.getpid(),
+        'model': OPENAI_MODEL,
+        'timeout': OPENAI_TIMEOUT,
+        'connect_timeout': OPENAI_CONNECT_TIMEOUT,
+        'max_retries': OPENAI_MAX_RETRIES,
+        'max_connections': OPENAI_MAX_CONNECTIONS,
+        'keepalive_seconds': OPENAI_KEEPALIVE_SECONDS
+    }
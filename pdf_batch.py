@@ -0,0 +1,225 @@
+#!/usr/bin/env python
+"""
+Batch PDF generation across a process pool of warmed PDFGenerator workers
+
+ReportLab rendering is CPU-bound and holds the GIL, so a single request can
+only use one core. Batches are fanned out to worker processes, each of which
+warms its own shared generator once, and results come back as they complete.
+
+Usage:
+    python pdf_batch.py estimates.json [-o estimates.zip] [--engine canvas] [--workers 4]
+"""
+
+import os
+import sys
+import json
+import base64
+import logging
+import zipfile
+import argparse
+import threading
+import multiprocessing
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+from werkzeug.utils import secure_filename
+
+from pdf_generator import get_pdf_generator, ENGINES
+
+logger = logging.getLogger(__name__)
+
+BATCH_FORMATS = ('zip', 'ndjson')
+MAX_BATCH_SIZE = int(os.getenv('PDF_BATCH_MAX_SIZE', 500))
+BATCH_WORKERS = int(os.getenv('PDF_BATCH_WORKERS', 0)) or os.cpu_count() or 1
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _init_worker():
+    """Warm the worker's shared generator before it takes any work"""
+    get_pdf_generator()
+
+
+def _render(index, estimate_data, engine):
+    """Worker entry point: render one estimate"""
+    return index, get_pdf_generator().generate_estimate_pdf(estimate_data, engine=engine)
+
+
+def get_batch_pool():
+    """Return the process-wide render pool, starting it on first use
+
+    Workers are spawned rather than forked so that a threaded server (or a
+    gunicorn worker with open sockets) never forks while holding locks.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(
+                    max_workers=BATCH_WORKERS,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker
+                )
+    return _pool
+
+
+def _reset_batch_pool(pool):
+    """Drop a broken pool so the next batch starts a fresh one"""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def batch_filename(index, estimate_data):
+    """Archive name for one estimate, ordered by its position in the batch"""
+    name = None
+    if isinstance(estimate_data, dict):
+        name = estimate_data.get('job_number') or estimate_data.get('customer_name')
+    name = name or 'estimate'
+    return f"{index + 1:04d}_{secure_filename(str(name)) or 'estimate'}.pdf"
+
+
+def iter_batch_results(estimates, engine='platypus'):
+    """Render estimates in parallel and yield one result dict per estimate
+
+    Results arrive in completion order. Successful results carry the raw
+    PDF bytes in 'pdf_data'; failed ones carry 'error' instead, so a bad
+    estimate never sinks the rest of the batch.
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown PDF engine: {engine}")
+
+    pool = get_batch_pool()
+    futures = {pool.submit(_render, i, estimate, engine): i for i, estimate in enumerate(estimates)}
+    try:
+        for future in as_completed(futures):
+            index = futures[future]
+            result = {'index': index, 'filename': batch_filename(index, estimates[index])}
+            try:
+                _, pdf_data = future.result()
+            except BrokenProcessPool:
+                _reset_batch_pool(pool)
+                raise
+            except Exception as e:
+                logger.error(f"Batch item {index} failed: {e}")
+                result.update(success=False, error=str(e))
+            else:
+                result.update(success=True, size=len(pdf_data), pdf_data=pdf_data)
+            yield result
+    finally:
+        # Client went away or a worker died: don't keep rendering for nobody
+        for future in futures:
+            future.cancel()
+
+
+class _ChunkSink:
+    """Write-only file object that hands back whatever was written since the last drain
+
+    It deliberately has no seek/tell, which makes zipfile fall back to
+    streaming mode (data descriptors after each entry).
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def iter_batch_zip(estimates, engine='platypus'):
+    """Yield a ZIP archive of the batch, one chunk per completed estimate
+
+    The archive ends with manifest.json listing every estimate in input
+    order with its filename, size, or error.
+    """
+    sink = _ChunkSink()
+    manifest = []
+    with zipfile.ZipFile(sink, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for result in iter_batch_results(estimates, engine):
+            pdf_data = result.pop('pdf_data', None)
+            if pdf_data is not None:
+                archive.writestr(result['filename'], pdf_data)
+            manifest.append(result)
+            yield sink.drain()
+
+        manifest.sort(key=lambda result: result['index'])
+        archive.writestr('manifest.json', json.dumps(manifest, indent=2))
+    yield sink.drain()
+
+
+def iter_batch_ndjson(estimates, engine='platypus'):
+    """Yield one JSON line per estimate as it completes, PDFs as base64 data URLs"""
+    for result in iter_batch_results(estimates, engine):
+        pdf_data = result.pop('pdf_data', None)
+        if pdf_data is not None:
+            result['pdf_data'] = f"data:application/pdf;base64,{base64.b64encode(pdf_data).decode('utf-8')}"
+        yield json.dumps(result) + '\n'
+
+
+def load_estimates(fileobj):
+    """Read a batch from a JSON list, {"estimates": [...]}, or NDJSON"""
+    text = fileobj.read()
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+    if isinstance(data, dict):
+        data = data.get('estimates', [])
+    return data
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render a batch of estimates to a ZIP of PDFs")
+    parser.add_argument('input', help="JSON list, {\"estimates\": [...]} or NDJSON file ('-' for stdin)")
+    parser.add_argument('-o', '--output', help="ZIP file to write (default: generated_pdfs/batch_<timestamp>.zip)")
+    parser.add_argument('--engine', choices=ENGINES, default='platypus')
+    parser.add_argument('--workers', type=int, help="Worker processes (default: PDF_BATCH_WORKERS or CPU count)")
+    args = parser.parse_args()
+
+    global BATCH_WORKERS
+    if args.workers:
+        BATCH_WORKERS = args.workers
+
+    if args.input == '-':
+        estimates = load_estimates(sys.stdin)
+    else:
+        with open(args.input) as f:
+            estimates = load_estimates(f)
+
+    output = args.output
+    if not output:
+        os.makedirs('generated_pdfs', exist_ok=True)
+        output = os.path.join('generated_pdfs', f"batch_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip")
+
+    start = datetime.now()
+    with open(output, 'wb') as f:
+        for chunk in iter_batch_zip(estimates, engine=args.engine):
+            f.write(chunk)
+
+    with zipfile.ZipFile(output) as archive:
+        manifest = json.loads(archive.read('manifest.json'))
+    failed = [result for result in manifest if not result['success']]
+    for result in failed:
+        print(f"✗ {result['filename']}: {result['error']}")
+
+    elapsed = (datetime.now() - start).total_seconds()
+    print(f"✓ {len(manifest) - len(failed)}/{len(manifest)} estimates rendered in {elapsed:.1f}s "
+          f"with {BATCH_WORKERS} workers -> {output}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,100 @@
+"""
+Render cache for estimate PDFs
+
+The same estimate is rendered over and over (preview, download, email,
+adjuster resend). Estimates are reduced to what the renderer actually reads,
+hashed canonically, and rendered deterministically, so the hash doubles as
+a strong ETag: a client holding it can be answered with 304 without
+rendering, and anyone else gets the cached bytes.
+"""
+
+import os
+import json
+import hashlib
+import logging
+
+from lru_cache import LRUCache
+from pdf_generator import get_pdf_generator, _job_info
+from pdf_size import generate_size_optimized_pdf
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the layout changes so PDFs cached by an older build are never served
+RENDER_VERSION = 2
+PDF_CACHE_MEMORY = int(os.getenv('PDF_CACHE_MEMORY_MB', 64)) * 1024 * 1024
+
+# Everything the renderers read from estimate_data
+RENDER_KEYS = ('customer_name', 'customer_address', 'date', 'job_number',
+               'assessment', 'line_items', 'markup', 'equipment', 'photos')
+
+pdf_cache = LRUCache(max_bytes=PDF_CACHE_MEMORY)
+
+
+def canonical_estimate(estimate_data):
+    """The estimate exactly as it will be rendered
+
+    Keys the renderers ignore (engine, format, ...) are dropped, and the
+    date default is resolved so that the hash and the rendered PDF always
+    agree. The renderers' default job number comes from the clock, which
+    would change the hash every minute; an estimate without one gets a job
+    number derived from its content instead.
+    """
+    canonical = {key: estimate_data[key] for key in RENDER_KEYS if key in estimate_data}
+    canonical['date'] = _job_info(estimate_data)['date']
+    if 'job_number' not in canonical:
+        digest = hashlib.sha256(_canonical_json(canonical).encode('utf-8')).hexdigest()
+        canonical['job_number'] = f"EST-{digest[:12].upper()}"
+    return canonical
+
+
+def _photo_digest(photo):
+    """Photos hash by content so megabytes of base64 never go through json.dumps"""
+    data = photo.get('data', '')
+    if isinstance(data, str) and data.startswith('data:image'):
+        photo = dict(photo, data=hashlib.sha256(data.encode('ascii', 'ignore')).hexdigest())
+    return photo
+
+
+def _canonical_json(canonical):
+    """canonical as compact, key-sorted JSON with photos reduced to digests"""
+    # The renderers skip entries that aren't photo objects; they hash as a
+    # placeholder that only keeps the default captions of later photos apart
+    hashed = dict(canonical, photos=[_photo_digest(photo) if isinstance(photo, dict) else None
+                                     for photo in canonical.get('photos', [])])
+    return json.dumps(hashed, sort_keys=True, separators=(',', ':'), default=str)
+
+
+def estimate_etag(canonical, engine='platypus', max_bytes=None):
+    """Strong ETag for a canonical estimate rendered with engine
+
+    max_bytes is the budget of the size-optimised profile, None for the
+    standard one.
+    """
+    payload = _canonical_json(canonical)
+    profile = f"size{max_bytes}|" if max_bytes is not None else ''
+    digest = hashlib.sha256(f"v{RENDER_VERSION}|{engine}|{profile}".encode('ascii'))
+    digest.update(payload.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def render_estimate_pdf(canonical, engine='platypus', etag=None, max_bytes=None, timings=None):
+    """Return (pdf_data, etag, cached) for a canonical estimate, rendering on a miss
+
+    With max_bytes the PDF is rendered with the size-optimised profile.
+    timings records the render's stages (nothing is recorded on a hit).
+    """
+    etag = etag or estimate_etag(canonical, engine, max_bytes)
+    pdf_data = pdf_cache.get(etag)
+    if pdf_data is not None:
+        logger.debug(f"PDF cache hit for {etag}")
+        return pdf_data, etag, True
+
+    if max_bytes is not None:
+        pdf_data, _ = generate_size_optimized_pdf(canonical, max_bytes, engine=engine, deterministic=True,
+                                                  timings=timings)
+    else:
+        pdf_data = get_pdf_generator().generate_estimate_pdf(canonical, engine=engine, deterministic=True,
+                                                             timings=timings)
+    pdf_cache.put(etag, pdf_data)
+    logger.debug(f"PDF cache miss for {etag}, rendered {len(pdf_data)} bytes")
+    return pdf_data, etag, False
@@ -0,0 +1,577 @@
+"""
+Direct-canvas renderer for the standard estimate layout.
+
+Draws the same document as PDFGenerator's Platypus path straight onto a
+reportlab canvas. Every coordinate below mirrors what the Platypus frame,
+tables and paragraph styles produce, so the two engines render the same
+page; there is just no flowable wrap/split pass.
+"""
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.units import inch
+from reportlab.lib.rl_accel import escapePDF
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen import canvas
+
+from photo_processing import DEFAULT_PHOTO_SETTINGS
+from render_metrics import NULL_TIMINGS
+from pdf_generator import (
+    PRIMARY_COLOR, SECONDARY_COLOR, LIGHT_FILL_COLOR, GRID_COLOR, TERMS,
+    _job_info, _assessment_rows, _line_item_rows, _totals, _equipment_rows, _photo_rows
+)
+
+PAGE_WIDTH, PAGE_HEIGHT = letter
+
+# SimpleDocTemplate frame: page margins plus the frame's own 6pt padding
+FRAME_LEFT = 0.75 * inch + 6
+FRAME_RIGHT = PAGE_WIDTH - 0.75 * inch - 6
+FRAME_TOP = PAGE_HEIGHT - 0.75 * inch - 6
+FRAME_BOTTOM = inch + 6
+FRAME_WIDTH = FRAME_RIGHT - FRAME_LEFT
+FRAME_CENTER = FRAME_LEFT + FRAME_WIDTH / 2
+
+# (font, size, leading, space_before, space_after, color) of the paragraph styles used
+COMPANY_HEADER = ('Helvetica-Bold', 24, 22, 0, 6, PRIMARY_COLOR)
+COMPANY_SUBHEADER = ('Helvetica', 10, 12, 0, 12, SECONDARY_COLOR)
+SECTION_HEADER = ('Helvetica-Bold', 14, 18, 12, 6, PRIMARY_COLOR)
+BADGE = ('Helvetica', 9, 12, 0, 0, PRIMARY_COLOR)
+FOOTER_TEXT = ('Helvetica', 8, 12, 0, 0, SECONDARY_COLOR)
+
+JOB_INFO_COLUMNS = (3 * inch, 1 * inch, 2.5 * inch)
+ASSESSMENT_COLUMNS = (2 * inch, 4.5 * inch)
+LINE_ITEM_COLUMNS = (3.5 * inch, 1 * inch, 1 * inch, 1 * inch)
+EQUIPMENT_COLUMNS = (2.5 * inch, 1 * inch, 1 * inch, 1 * inch, 1 * inch)
+PHOTO_COLUMNS = (3.25 * inch, 3.25 * inch)
+
+PHOTO_WIDTH = 2.5 * inch
+PHOTO_HEIGHT = 1.8 * inch
+PHOTO_CELL_WIDTH = 2.7 * inch
+
+SECTION_GAP = 0.25 * inch
+
+
+def _table_left(col_widths):
+    """Tables are centred in the frame"""
+    return FRAME_LEFT + (FRAME_WIDTH - sum(col_widths)) / 2
+
+
+def _cell_baseline(row_bottom, row_height, font_size, leading, lines=1, top_pad=4, bottom_pad=4):
+    """Baseline of the first line of a middle-aligned plain string cell"""
+    return row_bottom + (bottom_pad + row_height - top_pad + lines * leading) / 2.0 - font_size
+
+
+def _wrap_words(words, width):
+    """Greedy word wrap of (text, font, size) words; returns lines of words"""
+    lines = []
+    line = []
+    used = 0
+    for word in words:
+        text, font, size = word
+        word_width = stringWidth(text, font, size)
+        space = stringWidth(' ', 'Helvetica', size) if line else 0
+        if line and used + space + word_width > width:
+            lines.append(line)
+            line = []
+            used = 0
+            space = 0
+        line.append(word)
+        used += space + word_width
+    lines.append(line)
+    return lines
+
+
+class _Cursor:
+    """Vertical position in the frame, with Platypus' space handling"""
+
+    def __init__(self, renderer):
+        self.renderer = renderer
+        self.y = FRAME_TOP
+        self.at_top = True
+        self.prev_space_after = 0
+
+    def space_before(self, space):
+        """Space before a paragraph collapses against the previous space after"""
+        return 0 if self.at_top else max(space - self.prev_space_after, 0)
+
+    def fits(self, height):
+        return self.y - height >= FRAME_BOTTOM or self.at_top
+
+    def advance(self, height, space_after=0):
+        self.y -= height + space_after
+        self.at_top = False
+        self.prev_space_after = space_after
+
+    def new_page(self):
+        self.renderer._new_page()
+        self.y = FRAME_TOP
+        self.at_top = True
+        self.prev_space_after = 0
+
+
+class _PageText:
+    """All text on a page, written as one block of PDF text operators.
+
+    Going through drawString()/text objects costs a fresh text object and
+    generic number formatting per cell, which dominates canvas rendering.
+    Here each string is a single positioned Tj in one BT/ET block. Text is
+    flushed when the page ends, so it always sits above the cell
+    backgrounds drawn while the page was built.
+    """
+
+    def __init__(self, canv):
+        self.canv = canv
+        self.ops = ['q BT']
+        self.font = None
+        self.font_obj = None
+        self.color = None
+
+    def set_font(self, font, size, color):
+        if self.font != (font, size):
+            self.font = (font, size)
+            self.font_obj = pdfmetrics.getFont(font)
+            self.ops.append(self._tf(font, size))
+        if self.color is not color:
+            self.color = color
+            self.ops.append('%.4f %.4f %.4f rg' % color.rgb())
+
+    def _tf(self, font, size):
+        # Same internal font name the canvas uses for setFont()
+        return f"{self.canv._doc.getInternalFontName(font)} {size} Tf"
+
+    def draw(self, x, y, string, align='left'):
+        font, size = self.font
+        if align == 'right':
+            x -= pdfmetrics.stringWidth(string, font, size)
+        elif align == 'centre':
+            x -= pdfmetrics.stringWidth(string, font, size) / 2
+        ops = self.ops
+        ops.append('1 0 0 1 %.2f %.2f Tm' % (x, y))
+        current = self.font_obj
+        # Characters outside the font's encoding come from substitution fonts
+        for sub_font, text in pdfmetrics.unicode2T1(string, [current] + current.substitutionFonts):
+            if sub_font is not current:
+                ops.append(self._tf(sub_font.fontName, size))
+                current = sub_font
+            ops.append('(%s) Tj' % escapePDF(text))
+        if current is not self.font_obj:
+            ops.append(self._tf(font, size))
+
+    def flush(self):
+        self.ops.append('ET Q')
+        self.canv.addLiteral('\n'.join(self.ops))
+
+
+class CanvasEstimateRenderer:
+    """Draws an estimate straight onto a reportlab canvas"""
+
+    def __init__(self, generator):
+        self.generator = generator
+        self.canv = None
+        self.cursor = None
+        self.text = None
+
+    def render(self, estimate_data, output, deterministic=False, photo_settings=DEFAULT_PHOTO_SETTINGS,
+               timings=NULL_TIMINGS):
+        """Render estimate_data into the writable file object output"""
+        timings.switch('styles')
+        self.canv = canvas.Canvas(output, pagesize=letter, invariant=1 if deterministic else None,
+                                  pageCompression=1)
+        self._start_page()
+        self.cursor = _Cursor(self)
+
+        timings.switch('header')
+        self._draw_company_header()
+        self._draw_job_info(_job_info(estimate_data))
+
+        if estimate_data.get('assessment'):
+            timings.switch('assessment')
+            self._paragraph("DAMAGE ASSESSMENT", SECTION_HEADER)
+            self._draw_assessment(_assessment_rows(estimate_data['assessment']))
+            self._spacer(SECTION_GAP)
+
+        timings.switch('line_items')
+        self._paragraph("RESTORATION SERVICES", SECTION_HEADER)
+        self._draw_line_items(estimate_data)
+        self._spacer(SECTION_GAP)
+
+        if estimate_data.get('equipment', []):
+            timings.switch('equipment')
+            self._paragraph("EQUIPMENT DEPLOYMENT", SECTION_HEADER)
+            self._draw_equipment(_equipment_rows(estimate_data['equipment']))
+            self._spacer(SECTION_GAP)
+
+        if estimate_data.get('photos', []):
+            timings.switch('photos')
+            self._draw_photos(estimate_data['photos'], photo_settings)
+
+        timings.switch('terms')
+        self._spacer(0.5 * inch)
+        self._paragraph("TERMS & CONDITIONS", SECTION_HEADER)
+        for term in TERMS:
+            self._paragraph(f"• {term}", FOOTER_TEXT, centred=True)
+            self._spacer(0.05 * inch)
+
+        timings.switch('build')
+        self._end_page()
+        self.canv.save()
+
+    def _start_page(self):
+        self.generator._draw_header_footer(self.canv, None)
+        self.text = _PageText(self.canv)
+
+    def _end_page(self):
+        self.text.flush()
+        self.canv.showPage()
+
+    def _new_page(self):
+        self._end_page()
+        self._start_page()
+
+    # Flowable equivalents
+
+    def _spacer(self, height):
+        if not self.cursor.fits(height):
+            self.cursor.new_page()
+        self.cursor.advance(height)
+
+    def _paragraph(self, text, style, centred=False):
+        """Single-style paragraph spanning the frame"""
+        font, size, leading, space_before, space_after, color = style
+        lines = _wrap_words([(word, font, size) for word in text.split()], FRAME_WIDTH)
+        height = len(lines) * leading
+
+        gap = self.cursor.space_before(space_before)
+        if not self.cursor.fits(gap + height):
+            self.cursor.new_page()
+            gap = 0
+        self.cursor.advance(gap)
+
+        self.text.set_font(font, size, color)
+        baseline = self.cursor.y - size
+        for line in lines:
+            line_text = ' '.join(word[0] for word in line)
+            if centred:
+                self.text.draw(FRAME_CENTER, baseline, line_text, 'centre')
+            else:
+                self.text.draw(FRAME_LEFT, baseline, line_text)
+            baseline -= leading
+
+        self.cursor.advance(height, space_after)
+        return height
+
+    def _draw_company_header(self):
+        self._paragraph("MAJOR RESTORATION SERVICES", COMPANY_HEADER, centred=True)
+        self._paragraph("Professional Restoration & Remediation", COMPANY_SUBHEADER, centred=True)
+        self._paragraph("717-855-2367 | 24/7 Emergency Response", COMPANY_SUBHEADER, centred=True)
+        self._spacer(SECTION_GAP)
+
+        # IICRC Compliance Badge
+        top = self.cursor.y
+        self._paragraph("IICRC S500/S520/S700 COMPLIANT", BADGE, centred=True)
+        self.canv.setStrokeColor(PRIMARY_COLOR)
+        self.canv.setLineWidth(1)
+        self.canv.rect(FRAME_LEFT - 3, self.cursor.y - 3, FRAME_WIDTH + 6, top - self.cursor.y + 6)
+        self._spacer(SECTION_GAP)
+
+    # Tables
+
+    def _grid(self, left, col_widths, row_tops, bottom, width=0.5, color=GRID_COLOR):
+        """Inner and outer grid lines for a block of rows"""
+        right = left + sum(col_widths)
+        lines = [(left, y, right, y) for y in row_tops + [bottom]]
+        x = left
+        for col_width in (0,) + tuple(col_widths):
+            x += col_width
+            lines.append((x, row_tops[0], x, bottom))
+        self.canv.setStrokeColor(color)
+        self.canv.setLineWidth(width)
+        self.canv.lines(lines)
+
+    def _box(self, left, col_widths, top, bottom):
+        self.canv.setStrokeColor(SECONDARY_COLOR)
+        self.canv.setLineWidth(1)
+        self.canv.rect(left, bottom, sum(col_widths), top - bottom)
+
+    def _draw_job_info(self, job_info):
+        c = self.canv
+        left = _table_left(JOB_INFO_COLUMNS)
+        col0 = left
+        col2 = left + JOB_INFO_COLUMNS[0] + JOB_INFO_COLUMNS[1]
+        left_width = JOB_INFO_COLUMNS[0] - 12
+        right_width = JOB_INFO_COLUMNS[2] - 12
+
+        def labelled(label, value, width):
+            words = [(w, 'Helvetica-Bold', 10) for w in label.split()] + [(w, 'Helvetica', 10) for w in str(value).split()]
+            return _wrap_words(words, width)
+
+        date_lines = labelled('Date:', job_info['date'], right_width)
+        customer_lines = labelled('Customer:', job_info['customer_name'], left_width)
+        job_lines = labelled('Job #:', job_info['job_number'], right_width)
+        address_lines = labelled('Address:', job_info['customer_address'], left_width)
+
+        cells = [
+            [(None, 1), (date_lines, len(date_lines))],
+            [(customer_lines, len(customer_lines)), (job_lines, len(job_lines))],
+            [(address_lines, len(address_lines)), (None, 0)]
+        ]
+        heights = [max(18, len(date_lines) * 12) + 8,
+                   max(len(customer_lines), len(job_lines)) * 12 + 8,
+                   len(address_lines) * 12 + 8]
+
+        total = sum(heights)
+        if not self.cursor.fits(total):
+            self.cursor.new_page()
+        top = self.cursor.y
+        bottom = top - total
+
+        c.setFillColor(LIGHT_FILL_COLOR)
+        c.rect(left, top - heights[0], sum(JOB_INFO_COLUMNS), heights[0], stroke=0, fill=1)
+
+        row_top = top
+        for row, height in zip(cells, heights):
+            for x, (lines, count) in zip((col0, col2), row):
+                if not lines:
+                    continue
+                para_top = row_top - (height - count * 12) / 2
+                self._draw_labelled_lines(lines, x + 6, para_top - 10)
+            row_top -= height
+
+        # ESTIMATE heading sits in the first cell with the SectionHeader style
+        self.text.set_font('Helvetica-Bold', 14, PRIMARY_COLOR)
+        self.text.draw(col0 + 6, top - (heights[0] - 18) / 2 - 14, "ESTIMATE")
+
+        row_tops = [top, top - heights[0], top - heights[0] - heights[1]]
+        self._grid(left, JOB_INFO_COLUMNS, row_tops, bottom)
+        self._box(left, JOB_INFO_COLUMNS, top, bottom)
+        self.cursor.advance(total)
+        self._spacer(SECTION_GAP)
+
+    def _draw_labelled_lines(self, lines, x, baseline):
+        """Draw wrapped bold-label/regular-value lines"""
+        for line in lines:
+            cur_x = x
+            for i, (text, font, size) in enumerate(line):
+                if i:
+                    cur_x += stringWidth(' ', 'Helvetica', size)
+                self.text.set_font(font, size, colors.black)
+                self.text.draw(cur_x, baseline, text)
+                cur_x += stringWidth(text, font, size)
+            baseline -= 12
+
+    def _draw_assessment(self, rows):
+        c = self.canv
+        left = _table_left(ASSESSMENT_COLUMNS)
+        label_right = left + ASSESSMENT_COLUMNS[0] - 8
+        value_left = left + ASSESSMENT_COLUMNS[0] + 8
+        row_height = 20
+
+        def draw_rows(part, top, start, end):
+            bottom = top - row_height * len(part)
+            c.setFillColor(LIGHT_FILL_COLOR)
+            c.rect(left, bottom, ASSESSMENT_COLUMNS[0], top - bottom, stroke=0, fill=1)
+            y = top
+            for label, value in part:
+                y -= row_height
+                self.text.set_font('Helvetica-Bold', 9, SECONDARY_COLOR)
+                self.text.draw(label_right, _cell_baseline(y, row_height, 9, 10.8), label, 'right')
+                self.text.set_font('Helvetica', 10, colors.black)
+                self.text.draw(value_left, _cell_baseline(y, row_height, 10, 12), str(value))
+            self._grid(left, ASSESSMENT_COLUMNS, [top - row_height * i for i in range(len(part))], bottom)
+
+        self._flow_rows(rows, [row_height] * len(rows), draw_rows)
+
+    def _flow_rows(self, rows, heights, draw_rows):
+        """Place table rows on as many pages as needed, splitting between rows.
+
+        draw_rows(part, top, start, end) draws rows[start:end] from top down.
+        """
+        start = 0
+        while start < len(rows):
+            available = self.cursor.y - FRAME_BOTTOM
+            end = start
+            used = 0
+            while end < len(rows) and used + heights[end] <= available:
+                used += heights[end]
+                end += 1
+            if end == start:
+                if self.cursor.at_top:
+                    end = start + 1
+                    used = heights[start]
+                else:
+                    self.cursor.new_page()
+                    continue
+            draw_rows(rows[start:end], self.cursor.y, start, end)
+            self.cursor.advance(used)
+            start = end
+            if start < len(rows):
+                self.cursor.new_page()
+
+    def _draw_line_items(self, estimate_data):
+        c = self.canv
+        item_rows, subtotal = _line_item_rows(estimate_data.get('line_items', []))
+        markup_percent, markup_amount, grand_total = _totals(estimate_data, subtotal)
+
+        rows = [('header', ['Description', 'Quantity', 'Unit Price', 'Total'])]
+        rows += [('item', row) for row in item_rows]
+        rows.append(('blank', ['', '', '', '']))
+        rows.append(('subtotal', ['', '', 'Subtotal:', f"${subtotal:,.2f}"]))
+        if markup_percent > 0:
+            rows.append(('markup', ['', '', f'Markup ({markup_percent}%):', f"${markup_amount:,.2f}"]))
+        rows.append(('total', ['', '', 'TOTAL:', f'${grand_total:,.2f}']))
+
+        heights = []
+        for kind, row in rows:
+            if kind in ('header', 'total'):
+                heights.append(20)
+            else:
+                heights.append(max(len(str(cell).split('\n')) for cell in row) * 10.8 + 8)
+
+        left = _table_left(LINE_ITEM_COLUMNS)
+        col_lefts = [left]
+        for width in LINE_ITEM_COLUMNS[:-1]:
+            col_lefts.append(col_lefts[-1] + width)
+        right = left + sum(LINE_ITEM_COLUMNS)
+        totals_left = col_lefts[2]
+        # Description is left-aligned, quantity centred, prices right-aligned
+        anchors = [(col_lefts[0] + 6, 'left'),
+                   (col_lefts[1] + LINE_ITEM_COLUMNS[1] / 2, 'centre'),
+                   (col_lefts[2] + LINE_ITEM_COLUMNS[2] - 6, 'right'),
+                   (col_lefts[3] + LINE_ITEM_COLUMNS[3] - 6, 'right')]
+
+        def draw_rows(part, top, start, end):
+            text = self.text
+            part_heights = heights[start:end]
+            bottom = top - sum(part_heights)
+
+            y = top
+            row_tops = []
+            for (kind, row), height in zip(part, part_heights):
+                row_tops.append(y)
+                row_bottom = y - height
+                if kind == 'header':
+                    c.setFillColor(PRIMARY_COLOR)
+                    c.rect(left, row_bottom, right - left, height, stroke=0, fill=1)
+                    text.set_font('Helvetica-Bold', 10, colors.white)
+                    size, leading = 10, 12
+                elif kind == 'total':
+                    c.setFillColor(LIGHT_FILL_COLOR)
+                    c.rect(totals_left, row_bottom, right - totals_left, height, stroke=0, fill=1)
+                    # TOTAL cells are bold paragraphs, drawn left-aligned
+                    text.set_font('Helvetica-Bold', 10, colors.black)
+                    baseline = row_bottom + (height + 12) / 2 - 10
+                    text.draw(col_lefts[2] + 6, baseline, row[2])
+                    text.draw(col_lefts[3] + 6, baseline, row[3])
+                    y = row_bottom
+                    continue
+                else:
+                    text.set_font('Helvetica', 9, colors.black)
+                    size, leading = 9, 10.8
+
+                for cell, (x, align) in zip(row, anchors):
+                    if cell == '':
+                        continue
+                    lines = str(cell).split('\n')
+                    baseline = _cell_baseline(row_bottom, height, size, leading, len(lines))
+                    for line in lines:
+                        text.draw(x, baseline, line, align)
+                        baseline -= leading
+                y = row_bottom
+
+            # Grid covers the header, items and blank row
+            grid_rows = [i for i, (kind, _) in enumerate(part) if kind in ('header', 'item', 'blank')]
+            if grid_rows:
+                grid_bottom = row_tops[grid_rows[-1]] - part_heights[grid_rows[-1]]
+                self._grid(left, LINE_ITEM_COLUMNS, [row_tops[i] for i in grid_rows], grid_bottom)
+            self._box(left, LINE_ITEM_COLUMNS, top, bottom)
+
+            for (kind, row), row_top in zip(part, row_tops):
+                if kind == 'subtotal':
+                    c.setStrokeColor(SECONDARY_COLOR)
+                    c.setLineWidth(1)
+                    c.line(totals_left, row_top, right, row_top)
+
+        self._flow_rows(rows, heights, draw_rows)
+
+    def _draw_equipment(self, equipment_rows):
+        c = self.canv
+        rows = [['Equipment', 'Quantity', 'Duration', 'Daily Rate', 'Total']] + equipment_rows
+        heights = [20] + [18.8] * len(equipment_rows)
+
+        left = _table_left(EQUIPMENT_COLUMNS)
+        col_lefts = [left]
+        for width in EQUIPMENT_COLUMNS[:-1]:
+            col_lefts.append(col_lefts[-1] + width)
+        # Name left-aligned, total right-aligned, everything between centred
+        anchors = [(col_lefts[0] + 6, 'left')]
+        anchors += [(col_lefts[col] + EQUIPMENT_COLUMNS[col] / 2, 'centre') for col in (1, 2, 3)]
+        anchors.append((col_lefts[4] + EQUIPMENT_COLUMNS[4] - 6, 'right'))
+
+        def draw_rows(part, top, start, end):
+            text = self.text
+            part_heights = heights[start:end]
+            bottom = top - sum(part_heights)
+            y = top
+            row_tops = []
+            for index, (row, height) in enumerate(zip(part, part_heights)):
+                row_tops.append(y)
+                row_bottom = y - height
+                if start + index == 0:
+                    c.setFillColor(PRIMARY_COLOR)
+                    c.rect(left, row_bottom, sum(EQUIPMENT_COLUMNS), height, stroke=0, fill=1)
+                    text.set_font('Helvetica-Bold', 10, colors.white)
+                    baseline = _cell_baseline(row_bottom, height, 10, 12)
+                else:
+                    text.set_font('Helvetica', 9, colors.black)
+                    baseline = _cell_baseline(row_bottom, height, 9, 10.8)
+                for cell, (x, align) in zip(row, anchors):
+                    text.draw(x, baseline, cell, align)
+                y = row_bottom
+            self._grid(left, EQUIPMENT_COLUMNS, row_tops, bottom)
+            self._box(left, EQUIPMENT_COLUMNS, top, bottom)
+
+        self._flow_rows(rows, heights, draw_rows)
+
+    # Photos
+
+    def _draw_photos(self, photos, photo_settings):
+        if not self.cursor.at_top:
+            self.cursor.new_page()
+        self._paragraph("DOCUMENTATION PHOTOS", SECTION_HEADER)
+        self._spacer(SECTION_GAP)
+
+        left = _table_left(PHOTO_COLUMNS)
+        caption_width = PHOTO_CELL_WIDTH - 12
+        # Rows arrive as their photos are prepared, a batch at a time
+        for row in _photo_rows(photos, lambda photo: (ImageReader(photo.buffer), photo.caption),
+                               photo_settings):
+            captions = [_wrap_words([(w, 'Helvetica', 8) for w in caption.split()], caption_width)
+                        for _, caption in row]
+            caption_height = max(len(lines) for lines in captions) * 12
+            # Cell table rows (image, spacer, caption) plus their 3pt paddings,
+            # inside the row table's own 3pt padding
+            image_row = PHOTO_HEIGHT + 6
+            spacer_row = 0.1 * inch + 6
+            row_height = image_row + spacer_row + caption_height + 6 + 6
+
+            if not self.cursor.fits(row_height):
+                self.cursor.new_page()
+            top = self.cursor.y
+
+            self.text.set_font('Helvetica', 8, SECONDARY_COLOR)
+            for col, ((image, _), lines) in enumerate(zip(row, captions)):
+                cell_left = left + col * PHOTO_COLUMNS[0] + (PHOTO_COLUMNS[col] - PHOTO_CELL_WIDTH) / 2
+                cell_top = top - 3
+                self.canv.drawImage(image, cell_left + (PHOTO_CELL_WIDTH - PHOTO_WIDTH) / 2,
+                                    cell_top - image_row + 3, PHOTO_WIDTH, PHOTO_HEIGHT)
+                # Caption paragraph fills its row, inside the cell table's 3pt padding
+                baseline = cell_top - image_row - spacer_row - 3 - 8
+                for line in lines:
+                    self.text.draw(cell_left + PHOTO_CELL_WIDTH / 2, baseline,
+                                   ' '.join(word[0] for word in line), 'centre')
+                    baseline -= 12
+
+            self.cursor.advance(row_height)
+            self._spacer(0.15 * inch)
@@ -2,85 +2,552 @@ from reportlab.lib import colors
 from reportlab.lib.pagesizes import letter
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak, Image, KeepTogether
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak, Image, KeepTogether, Flowable
 from reportlab.lib.enums import TA_CENTER, TA_RIGHT, TA_JUSTIFY
 from reportlab.pdfgen import canvas
 from reportlab.lib.utils import ImageReader
+from reportlab import rl_config
 from datetime import datetime
 import io
-import base64
-from PIL import Image as PILImage
+import logging
+import tempfile
+import threading
 import os
 
+from photo_processing import iter_prepared_photos, DEFAULT_PHOTO_SETTINGS
+from render_metrics import NULL_TIMINGS, new_timings, record_render
+
+logger = logging.getLogger(__name__)
+
+# ReportLab wraps every stream in ASCII85 by default, which only matters on
+# 7-bit channels and makes each page and photo 25% bigger. Our PDFs always
+# travel as binary or base64, so streams are written as plain binary. This
+# is a process-wide choice that covers every PDF the process builds, not
+# only the size profile's: rl_config is global and renders run concurrently
+# in threads, so it can't be switched per render. PDF_ASCII85=1 restores
+# ReportLab's default.
+PDF_ASCII85 = os.getenv('PDF_ASCII85', '').lower() in ('1', 'true', 'yes')
+rl_config.useA85 = int(PDF_ASCII85)
+
+# Shared colors
+PRIMARY_COLOR = colors.HexColor('#1e40af')  # Major's blue
+SECONDARY_COLOR = colors.HexColor('#6b7280')  # Gray
+LIGHT_FILL_COLOR = colors.HexColor('#f3f4f6')
+GRID_COLOR = colors.HexColor('#e5e7eb')
+
+
+def _build_stylesheet():
+    """Build the sample stylesheet plus our custom paragraph styles"""
+    styles = getSampleStyleSheet()
+
+    styles.add(ParagraphStyle(
+        name='CompanyHeader',
+        parent=styles['Heading1'],
+        fontSize=24,
+        textColor=PRIMARY_COLOR,
+        alignment=TA_CENTER,
+        spaceAfter=6
+    ))
+
+    styles.add(ParagraphStyle(
+        name='CompanySubheader',
+        parent=styles['Normal'],
+        fontSize=10,
+        textColor=SECONDARY_COLOR,
+        alignment=TA_CENTER,
+        spaceAfter=12
+    ))
+
+    styles.add(ParagraphStyle(
+        name='SectionHeader',
+        parent=styles['Heading2'],
+        fontSize=14,
+        textColor=PRIMARY_COLOR,
+        spaceBefore=12,
+        spaceAfter=6
+    ))
+
+    styles.add(ParagraphStyle(
+        name='InfoLabel',
+        parent=styles['Normal'],
+        fontSize=10,
+        textColor=SECONDARY_COLOR,
+        alignment=TA_RIGHT
+    ))
+
+    styles.add(ParagraphStyle(
+        name='InfoValue',
+        parent=styles['Normal'],
+        fontSize=10,
+        textColor=colors.black
+    ))
+
+    styles.add(ParagraphStyle(
+        name='FooterText',
+        parent=styles['Normal'],
+        fontSize=8,
+        textColor=SECONDARY_COLOR,
+        alignment=TA_CENTER
+    ))
+
+    styles.add(ParagraphStyle(
+        name='Badge',
+        parent=styles['Normal'],
+        fontSize=9,
+        textColor=PRIMARY_COLOR,
+        alignment=TA_CENTER,
+        borderColor=PRIMARY_COLOR,
+        borderWidth=1,
+        borderPadding=3
+    ))
+
+    return styles
+
+
+def _line_items_style(has_markup):
+    """Line items table style; rows are addressed from the end of the table
+    so one style serves every item count."""
+    # Trailing rows: blank, subtotal, [markup], total
+    subtotal_row = -3 if has_markup else -2
+    return TableStyle([
+        # Header row
+        ('BACKGROUND', (0, 0), (-1, 0), PRIMARY_COLOR),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+        ('FONT', (0, 0), (-1, 0), 'Helvetica-Bold', 10),
+
+        # All cells
+        ('ALIGN', (1, 0), (1, -1), 'CENTER'),
+        ('ALIGN', (2, 0), (-1, -1), 'RIGHT'),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('FONT', (0, 1), (-1, -1), 'Helvetica', 9),
+
+        # Grid
+        ('GRID', (0, 0), (-1, subtotal_row - 1), 0.5, GRID_COLOR),
+        ('BOX', (0, 0), (-1, -1), 1, SECONDARY_COLOR),
+
+        # Total section
+        ('LINEABOVE', (2, subtotal_row), (-1, subtotal_row), 1, SECONDARY_COLOR),
+        ('FONT', (2, -1), (-1, -1), 'Helvetica-Bold', 11),
+        ('BACKGROUND', (2, -1), (-1, -1), LIGHT_FILL_COLOR),
+
+        # Padding
+        ('LEFTPADDING', (0, 0), (-1, -1), 6),
+        ('RIGHTPADDING', (0, 0), (-1, -1), 6),
+        ('TOPPADDING', (0, 0), (-1, -1), 4),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
+    ])
+
+
+def _line_items_chunk_style(first, last, row_count, has_markup):
+    """Style for rows first..last-1 of a line items table of row_count rows
+
+    Lays out the same as _line_items_style does once ReportLab has split
+    the table across pages: the box stays open at page breaks and the header,
+    subtotal and total styling land only in the chunk that holds them.
+    """
+    subtotal_row = row_count + (-3 if has_markup else -2)
+    commands = []
+    if first == 0:
+        commands += [
+            ('BACKGROUND', (0, 0), (-1, 0), PRIMARY_COLOR),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+            ('FONT', (0, 0), (-1, 0), 'Helvetica-Bold', 10),
+        ]
+    commands += [
+        ('ALIGN', (1, 0), (1, -1), 'CENTER'),
+        ('ALIGN', (2, 0), (-1, -1), 'RIGHT'),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('FONT', (0, 1 if first == 0 else 0), (-1, -1), 'Helvetica', 9),
+    ]
+    grid_end = min(last, subtotal_row) - 1
+    if grid_end >= first:
+        commands.append(('GRID', (0, 0), (-1, grid_end - first), 0.5, GRID_COLOR))
+    # The box is left open where the table continues on another page
+    commands += [
+        ('LINEBEFORE', (0, 0), (0, -1), 1, SECONDARY_COLOR),
+        ('LINEAFTER', (-1, 0), (-1, -1), 1, SECONDARY_COLOR),
+    ]
+    if first == 0:
+        commands.append(('LINEABOVE', (0, 0), (-1, 0), 1, SECONDARY_COLOR))
+    if last == row_count:
+        commands.append(('LINEBELOW', (0, -1), (-1, -1), 1, SECONDARY_COLOR))
+    if first <= subtotal_row < last:
+        row = subtotal_row - first
+        commands.append(('LINEABOVE', (2, row), (-1, row), 1, SECONDARY_COLOR))
+    if last == row_count:
+        commands += [
+            ('FONT', (2, -1), (-1, -1), 'Helvetica-Bold', 11),
+            ('BACKGROUND', (2, -1), (-1, -1), LIGHT_FILL_COLOR),
+        ]
+    commands += [
+        ('LEFTPADDING', (0, 0), (-1, -1), 6),
+        ('RIGHTPADDING', (0, 0), (-1, -1), 6),
+        ('TOPPADDING', (0, 0), (-1, -1), 4),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
+    ]
+    return TableStyle(commands)
+
+
+# Styles are compiled once per process and only ever read while rendering,
+# so every PDFGenerator (and every thread) can share them.
+STYLES = _build_stylesheet()
+
+JOB_INFO_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), LIGHT_FILL_COLOR),
+    ('BOX', (0, 0), (-1, -1), 1, SECONDARY_COLOR),
+    ('GRID', (0, 0), (-1, -1), 0.5, GRID_COLOR),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ('LEFTPADDING', (0, 0), (-1, -1), 6),
+    ('RIGHTPADDING', (0, 0), (-1, -1), 6),
+    ('TOPPADDING', (0, 0), (-1, -1), 4),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
+])
+
+ASSESSMENT_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (0, -1), LIGHT_FILL_COLOR),
+    ('TEXTCOLOR', (0, 0), (0, -1), SECONDARY_COLOR),
+    ('FONT', (0, 0), (0, -1), 'Helvetica-Bold', 9),
+    ('FONT', (1, 0), (1, -1), 'Helvetica', 10),
+    ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
+    ('ALIGN', (1, 0), (1, -1), 'LEFT'),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ('GRID', (0, 0), (-1, -1), 0.5, GRID_COLOR),
+    ('LEFTPADDING', (0, 0), (-1, -1), 8),
+    ('RIGHTPADDING', (0, 0), (-1, -1), 8),
+    ('TOPPADDING', (0, 0), (-1, -1), 4),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
+])
+
+LINE_ITEMS_TABLE_STYLE = _line_items_style(has_markup=False)
+LINE_ITEMS_MARKUP_TABLE_STYLE = _line_items_style(has_markup=True)
+
+EQUIPMENT_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), PRIMARY_COLOR),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+    ('FONT', (0, 0), (-1, 0), 'Helvetica-Bold', 10),
+    ('ALIGN', (1, 0), (-1, -1), 'CENTER'),
+    ('ALIGN', (-1, 0), (-1, -1), 'RIGHT'),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ('FONT', (0, 1), (-1, -1), 'Helvetica', 9),
+    ('GRID', (0, 0), (-1, -1), 0.5, GRID_COLOR),
+    ('BOX', (0, 0), (-1, -1), 1, SECONDARY_COLOR),
+    ('LEFTPADDING', (0, 0), (-1, -1), 6),
+    ('RIGHTPADDING', (0, 0), (-1, -1), 6),
+    ('TOPPADDING', (0, 0), (-1, -1), 4),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
+])
+
+PHOTO_CELL_TABLE_STYLE = TableStyle([
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+])
+
+PHOTO_ROW_TABLE_STYLE = TableStyle([
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+    ('LEFTPADDING', (0, 0), (-1, -1), 3),
+    ('RIGHTPADDING', (0, 0), (-1, -1), 3),
+    ('TOPPADDING', (0, 0), (-1, -1), 3),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
+])
+
+TERMS = (
+    "This estimate is valid for 30 days from the date above",
+    "All work performed in compliance with IICRC standards and insurance requirements",
+    "Payment terms: Net 30 days or as per insurance settlement",
+    "Additional charges may apply for hazardous materials or unforeseen conditions",
+    "24/7 Emergency Response Available"
+)
+
+
+ENGINES = ('platypus', 'canvas')
+
+# Line item count at which the Platypus engine switches to page-sized table
+# chunks (see _ChunkedLineItems)
+LARGE_ESTIMATE_ITEMS = int(os.getenv('LARGE_ESTIMATE_ITEMS', 200))
+LINE_ITEM_COL_WIDTHS = [3.5*inch, 1*inch, 1*inch, 1*inch]
+
+# Streaming responses: chunk size, and how much of a PDF stays in memory
+# before the spool file moves to disk
+STREAM_CHUNK_SIZE = 64 * 1024
+SPOOL_MAX_MEMORY = 2 * 1024 * 1024
+
+
+def _iter_chunks(fileobj, chunk_size):
+    """Yield fileobj in chunks, closing it when done or abandoned"""
+    try:
+        while True:
+            chunk = fileobj.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        fileobj.close()
+
+
+def _job_info(estimate_data):
+    """Values shown in the job information box"""
+    return {
+        'date': estimate_data.get('date', datetime.now().strftime('%m/%d/%Y')),
+        'customer_name': estimate_data.get('customer_name', 'N/A'),
+        'job_number': estimate_data.get('job_number', 'EST-' + datetime.now().strftime('%Y%m%d%H%M')),
+        'customer_address': estimate_data.get('customer_address', 'N/A')
+    }
+
+
+def _assessment_rows(assessment):
+    """Label/value rows for the damage assessment table"""
+    damage_type = assessment.get('damage_type', 'N/A')
+    classification = assessment.get('classification', {})
+
+    rows = [['Damage Type:', damage_type.upper()]]
+
+    if damage_type == 'water':
+        rows.append(['IICRC Category:', f"Category {classification.get('category', 'N/A')}"])
+        rows.append(['IICRC Class:', f"Class {classification.get('class', 'N/A')}"])
+    elif damage_type == 'fire':
+        rows.append(['Damage Level:', classification.get('damage_level', 'N/A')])
+        rows.append(['Smoke Type:', classification.get('smoke_type', 'N/A')])
+    elif damage_type == 'mold':
+        rows.append(['Condition Level:', f"Condition {classification.get('condition', 'N/A')}"])
+        rows.append(['Contamination:', classification.get('contamination_level', 'N/A')])
+
+    rows.append(['Affected Area:', f"{assessment.get('affected_area', 'N/A')} sq ft"])
+    rows.append(['Severity:', assessment.get('severity', 'N/A').upper()])
+    return rows
+
+
+def _line_item_rows(line_items):
+    """Formatted line item rows and their subtotal"""
+    rows = []
+    subtotal = 0
+    for item in line_items:
+        quantity = float(item.get('quantity', 0))
+        unit_price = float(item.get('unit_price', 0))
+        total = quantity * unit_price
+        subtotal += total
+
+        rows.append([
+            item.get('description', ''),
+            f"{quantity:.1f}" if quantity % 1 else str(int(quantity)),
+            f"${unit_price:,.2f}",
+            f"${total:,.2f}"
+        ])
+    return rows, subtotal
+
+
+def _totals(estimate_data, subtotal):
+    """Markup percent, markup amount and grand total"""
+    markup_percent = float(estimate_data.get('markup', 0))
+    markup_amount = subtotal * (markup_percent / 100)
+    return markup_percent, markup_amount, subtotal + markup_amount
+
+
+def _equipment_rows(equipment):
+    """Formatted equipment deployment rows"""
+    rows = []
+    for equip in equipment:
+        quantity = int(equip.get('quantity', 0))
+        days = int(equip.get('days', 0))
+        daily_rate = float(equip.get('daily_rate', 0))
+        total = quantity * days * daily_rate
+
+        rows.append([
+            equip.get('name', ''),
+            str(quantity),
+            f"{days} days",
+            f"${daily_rate:.2f}",
+            f"${total:,.2f}"
+        ])
+    return rows
+
+
+def _photo_rows(photos, make_cell, photo_settings=DEFAULT_PHOTO_SETTINGS):
+    """Yield rows of up to two cells for the photo grid
+
+    make_cell turns a PreparedPhoto into whatever the renderer draws; photos
+    without image data, or that fail to decode or build, are skipped. Photos
+    are prepared a batch at a time as rows are consumed.
+    """
+    row = []
+    for photo in iter_prepared_photos(photos, size=photo_settings.size, quality=photo_settings.quality):
+        try:
+            if photo.error is not None:
+                raise photo.error
+            if photo.buffer is None:
+                continue
+            row.append(make_cell(photo))
+        except Exception as e:
+            logger.warning(f"Error processing photo {photo.index+1}: {e}")
+            continue
+
+        if len(row) == 2:
+            yield row
+            row = []
+
+    if row:
+        yield row
+
+
+class _PhotoGrid(Flowable):
+    """Photo grid that builds each row table only when layout reaches it
+
+    Platypus holds every flowable until it is drawn, so building the grid
+    up front kept every thumbnail in memory at once. This flowable never
+    fits whole: each split hands back the next row, a spacer and itself,
+    and once the photos run out it shrinks to nothing.
+    """
+
+    def __init__(self, photos, styles, photo_settings=DEFAULT_PHOTO_SETTINGS):
+        Flowable.__init__(self)
+        self._rows = _photo_rows(photos, self._make_cell, photo_settings)
+        self._styles = styles
+        self._next = None
+
+    def _make_cell(self, photo):
+        cell = [
+            Image(photo.buffer, width=2.5*inch, height=1.8*inch),
+            Spacer(1, 0.1*inch),
+            Paragraph(photo.caption, self._styles['FooterText'])
+        ]
+        cell_table = Table([[c] for c in cell], colWidths=[2.7*inch])
+        cell_table.setStyle(PHOTO_CELL_TABLE_STYLE)
+        return cell_table
+
+    def _peek(self):
+        """The next row table, built on first request, or None when done"""
+        if self._next is None:
+            row = next(self._rows, None)
+            if row is None:
+                return None
+            while len(row) < 2:
+                empty_cell = Table([['']], colWidths=[2.7*inch])
+                empty_cell.setStyle(PHOTO_CELL_TABLE_STYLE)
+                row.append(empty_cell)
+            self._next = Table([row], colWidths=[3.25*inch, 3.25*inch])
+            self._next.setStyle(PHOTO_ROW_TABLE_STYLE)
+        return self._next
+
+    def wrap(self, availWidth, availHeight):
+        if self._peek() is None:
+            return 0, 0
+        return availWidth, availHeight + 1
+
+    def split(self, availWidth, availHeight):
+        row = self._peek()
+        if row is None:
+            return []
+        if row.wrap(availWidth, availHeight)[1] > availHeight:
+            return []
+        # Platypus marks a flowable it had to push to the next frame; this
+        # one is handed back after every row, so the mark must not stick
+        self.__dict__.pop('_postponed', None)
+        self._next = None
+        return [row, Spacer(1, 0.15*inch), self]
+
+    def draw(self):
+        pass
+
+
+class _ChunkedLineItems(Flowable):
+    """Line items table laid out one page-sized chunk at a time
+
+    A single Table of thousands of rows re-measures every remaining row
+    each time ReportLab splits it across a page, which is quadratic in the
+    row count. Item cells are plain strings in fixed columns, so row heights
+    are known up front; each split just counts the rows that fit and builds
+    a small Table for them with explicit rowHeights.
+    """
+
+    def __init__(self, rows, has_markup, heights=None, first=0):
+        Flowable.__init__(self)
+        self.hAlign = 'CENTER'
+        self._rows = rows
+        self._has_markup = has_markup
+        if heights is None:
+            # Header and total rows: 10-12pt text; others: 9pt plain lines
+            heights = [20] + [max(len(str(cell).split('\n')) for cell in row) * 10.8 + 8
+                              for row in rows[1:-1]] + [20]
+        self._heights = heights
+        self._first = first
+
+    def _table(self, last):
+        table = Table(self._rows[self._first:last], colWidths=LINE_ITEM_COL_WIDTHS,
+                      rowHeights=self._heights[self._first:last])
+        table.setStyle(_line_items_chunk_style(self._first, last, len(self._rows), self._has_markup))
+        return table
+
+    def _rest(self, first):
+        return _ChunkedLineItems(self._rows, self._has_markup, self._heights, first)
+
+    def wrap(self, availWidth, availHeight):
+        self.width = sum(LINE_ITEM_COL_WIDTHS)
+        self.height = sum(self._heights[self._first:])
+        return self.width, self.height
+
+    def split(self, availWidth, availHeight):
+        last, used = self._first, 0
+        while last < len(self._rows) and used + self._heights[last] <= availHeight:
+            used += self._heights[last]
+            last += 1
+        if last == self._first:
+            return []
+        return [self._table(last), self._rest(last)]
+
+    def draw(self):
+        table = self._table(len(self._rows))
+        table.wrapOn(self.canv, self.width, self.height)
+        table.drawOn(self.canv, 0, 0)
+
+
+class _TimedDocTemplate(SimpleDocTemplate):
+    """SimpleDocTemplate that charges layout time to the section being laid out
+
+    section_starts maps id() of each section's first flowable to its stage;
+    anything after the last flowable (saving the file) is charged to build.
+    """
+
+    def __init__(self, filename, timings, **kw):
+        SimpleDocTemplate.__init__(self, filename, **kw)
+        self.timings = timings
+        self.section_starts = {}
+        self._flowables = None
+
+    def build(self, flowables, **kw):
+        self._flowables = flowables
+        SimpleDocTemplate.build(self, flowables, **kw)
+
+    def handle_flowable(self, flowables):
+        stage = self.section_starts.get(id(flowables[0]))
+        if stage is not None:
+            self.timings.switch(stage)
+        SimpleDocTemplate.handle_flowable(self, flowables)
+        # Page breaks are handled as flowables too, from lists of their own
+        if not flowables and flowables is self._flowables:
+            self.timings.switch('build')
+
+
 class PDFGenerator:
+    """Renders estimate PDFs.
+
+    Instances hold no per-render state, so a single generator can serve
+    concurrent requests; use get_pdf_generator() for the process-wide one.
+    """
+
     def __init__(self):
-        self.primary_color = colors.HexColor('#1e40af')  # Major's blue
-        self.secondary_color = colors.HexColor('#6b7280')  # Gray
-        self.styles = getSampleStyleSheet()
-        self._setup_custom_styles()
-        
-    def _setup_custom_styles(self):
-        """Setup custom paragraph styles for the PDF"""
-        self.styles.add(ParagraphStyle(
-            name='CompanyHeader',
-            parent=self.styles['Heading1'],
-            fontSize=24,
-            textColor=self.primary_color,
-            alignment=TA_CENTER,
-            spaceAfter=6
-        ))
-        
-        self.styles.add(ParagraphStyle(
-            name='CompanySubheader',
-            parent=self.styles['Normal'],
-            fontSize=10,
-            textColor=self.secondary_color,
-            alignment=TA_CENTER,
-            spaceAfter=12
-        ))
-        
-        self.styles.add(ParagraphStyle(
-            name='SectionHeader',
-            parent=self.styles['Heading2'],
-            fontSize=14,
-            textColor=self.primary_color,
-            spaceBefore=12,
-            spaceAfter=6
-        ))
-        
-        self.styles.add(ParagraphStyle(
-            name='InfoLabel',
-            parent=self.styles['Normal'],
-            fontSize=10,
-            textColor=self.secondary_color,
-            alignment=TA_RIGHT
-        ))
-        
-        self.styles.add(ParagraphStyle(
-            name='InfoValue',
-            parent=self.styles['Normal'],
-            fontSize=10,
-            textColor=colors.black
-        ))
-        
-        self.styles.add(ParagraphStyle(
-            name='FooterText',
-            parent=self.styles['Normal'],
-            fontSize=8,
-            textColor=self.secondary_color,
-            alignment=TA_CENTER
-        ))
-        
-        self.styles.add(ParagraphStyle(
-            name='Badge',
-            parent=self.styles['Normal'],
-            fontSize=9,
-            textColor=self.primary_color,
-            alignment=TA_CENTER,
-            borderColor=self.primary_color,
-            borderWidth=1,
-            borderPadding=3
-        ))
+        self.primary_color = PRIMARY_COLOR
+        self.secondary_color = SECONDARY_COLOR
+        self.styles = STYLES
+
+    def warm_up(self):
+        """Render a throwaway estimate so fonts and ReportLab caches are loaded"""
+        self.generate_estimate_pdf({
+            'assessment': {'damage_type': 'water', 'severity': 'minor', 'affected_area': 0},
+            'line_items': [{'description': 'Warm-up', 'quantity': 1, 'unit_price': 0}],
+            'markup': 1,
+            'equipment': [{'name': 'Warm-up', 'quantity': 1, 'days': 1, 'daily_rate': 0}]
+        })
+        return self
 
     def _draw_header_footer(self, canvas, doc):
         """Draw header and footer on each page"""
@@ -101,13 +568,70 @@ class PDFGenerator:
         
         canvas.restoreState()
 
-    def generate_estimate_pdf(self, estimate_data):
-        """Generate a professional PDF estimate"""
+    def generate_estimate_pdf(self, estimate_data, engine='platypus', deterministic=False,
+                              photo_settings=DEFAULT_PHOTO_SETTINGS, timings=None):
+        """Generate a professional PDF estimate and return its bytes"""
         buffer = io.BytesIO()
-        
+        self.write_estimate_pdf(estimate_data, buffer, engine=engine, deterministic=deterministic,
+                                photo_settings=photo_settings, timings=timings)
+        return buffer.getvalue()
+
+    def stream_estimate_pdf(self, estimate_data, engine='platypus', chunk_size=STREAM_CHUNK_SIZE,
+                            deterministic=False, timings=None):
+        """Render into a spooled temp file and return (size, chunk iterator).
+
+        Documents up to SPOOL_MAX_MEMORY stay in memory, larger ones spill
+        to disk, and the iterator hands out chunk_size pieces, so a response
+        never holds more than one extra chunk of the PDF.
+        """
+        spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY)
+        try:
+            self.write_estimate_pdf(estimate_data, spool, engine=engine, deterministic=deterministic,
+                                    timings=timings)
+            size = spool.tell()
+            spool.seek(0)
+        except Exception:
+            spool.close()
+            raise
+        return size, _iter_chunks(spool, chunk_size)
+
+    def write_estimate_pdf(self, estimate_data, output, engine='platypus', deterministic=False,
+                           photo_settings=DEFAULT_PHOTO_SETTINGS, timings=None):
+        """Render a professional PDF estimate into a writable file object
+
+        engine selects the renderer: 'platypus' (flowables) or 'canvas'
+        (direct drawing with precomputed coordinates, much faster).
+        deterministic fixes the creation date and document ID, so the same
+        estimate_data always produces the same bytes. photo_settings sets
+        the thumbnail size and JPEG quality of the photo appendix. timings
+        (a render_metrics.RenderTimings) records time per stage; without
+        one, renders are only instrumented if PDF_INSTRUMENT is set.
+        """
+        if timings is None:
+            timings = new_timings() or NULL_TIMINGS
+        try:
+            if engine == 'canvas':
+                from pdf_canvas import CanvasEstimateRenderer
+                CanvasEstimateRenderer(self).render(estimate_data, output, deterministic=deterministic,
+                                                    photo_settings=photo_settings, timings=timings)
+            elif engine == 'platypus':
+                self._write_platypus_pdf(estimate_data, output, deterministic, photo_settings, timings)
+            else:
+                raise ValueError(f"Unknown PDF engine: {engine}")
+        except BaseException:
+            timings.abort()
+            raise
+        record_render(engine, timings)
+
+    def _write_platypus_pdf(self, estimate_data, output, deterministic, photo_settings, timings):
+        """The platypus engine of write_estimate_pdf"""
         # Create the PDF document
-        doc = SimpleDocTemplate(
-            buffer,
+        timings.switch('styles')
+        doc = _TimedDocTemplate(
+            output,
+            timings,
+            invariant=1 if deterministic else None,
+            pageCompression=1,
             pagesize=letter,
             topMargin=0.75*inch,
             bottomMargin=inch,
@@ -115,10 +639,17 @@ class PDFGenerator:
             rightMargin=0.75*inch
         )
         
-        # Container for the 'Flowable' objects
+        # Container for the 'Flowable' objects, and the index at which each
+        # section starts so layout time can be charged to it
         elements = []
+        sections = []
+        
+        def start_section(stage):
+            timings.switch(stage)
+            sections.append((len(elements), stage))
         
         # Company Header
+        start_section('header')
         elements.append(Paragraph("<b>MAJOR RESTORATION SERVICES</b>", self.styles['CompanyHeader']))
         elements.append(Paragraph("Professional Restoration & Remediation", self.styles['CompanySubheader']))
         elements.append(Paragraph("717-855-2367 | 24/7 Emergency Response", self.styles['CompanySubheader']))
@@ -129,105 +660,51 @@ class PDFGenerator:
         elements.append(Spacer(1, 0.25*inch))
         
         # Job Information Box
+        job_info = _job_info(estimate_data)
         job_info_data = []
         job_info_data.append([
             Paragraph("<b>ESTIMATE</b>", self.styles['SectionHeader']),
             '',
-            Paragraph(f"<b>Date:</b> {estimate_data.get('date', datetime.now().strftime('%m/%d/%Y'))}", self.styles['InfoValue'])
+            Paragraph(f"<b>Date:</b> {job_info['date']}", self.styles['InfoValue'])
         ])
         job_info_data.append([
-            Paragraph(f"<b>Customer:</b> {estimate_data.get('customer_name', 'N/A')}", self.styles['InfoValue']),
+            Paragraph(f"<b>Customer:</b> {job_info['customer_name']}", self.styles['InfoValue']),
             '',
-            Paragraph(f"<b>Job #:</b> {estimate_data.get('job_number', 'EST-' + datetime.now().strftime('%Y%m%d%H%M'))}", self.styles['InfoValue'])
+            Paragraph(f"<b>Job #:</b> {job_info['job_number']}", self.styles['InfoValue'])
         ])
         job_info_data.append([
-            Paragraph(f"<b>Address:</b> {estimate_data.get('customer_address', 'N/A')}", self.styles['InfoValue']),
+            Paragraph(f"<b>Address:</b> {job_info['customer_address']}", self.styles['InfoValue']),
             '',
             ''
         ])
         
         job_info_table = Table(job_info_data, colWidths=[3*inch, 1*inch, 2.5*inch])
-        job_info_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#f3f4f6')),
-            ('BOX', (0, 0), (-1, -1), 1, self.secondary_color),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#e5e7eb')),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('LEFTPADDING', (0, 0), (-1, -1), 6),
-            ('RIGHTPADDING', (0, 0), (-1, -1), 6),
-            ('TOPPADDING', (0, 0), (-1, -1), 4),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
-        ]))
+        job_info_table.setStyle(JOB_INFO_TABLE_STYLE)
         elements.append(job_info_table)
         elements.append(Spacer(1, 0.25*inch))
         
         # Damage Assessment Summary
         if estimate_data.get('assessment'):
+            start_section('assessment')
             elements.append(Paragraph("<b>DAMAGE ASSESSMENT</b>", self.styles['SectionHeader']))
             
-            assessment = estimate_data['assessment']
-            assessment_data = []
-            
-            # Damage type and classification
-            damage_type = assessment.get('damage_type', 'N/A')
-            classification = assessment.get('classification', {})
-            
-            assessment_data.append(['Damage Type:', damage_type.upper()])
-            
-            if damage_type == 'water':
-                assessment_data.append(['IICRC Category:', f"Category {classification.get('category', 'N/A')}"])
-                assessment_data.append(['IICRC Class:', f"Class {classification.get('class', 'N/A')}"])
-            elif damage_type == 'fire':
-                assessment_data.append(['Damage Level:', classification.get('damage_level', 'N/A')])
-                assessment_data.append(['Smoke Type:', classification.get('smoke_type', 'N/A')])
-            elif damage_type == 'mold':
-                assessment_data.append(['Condition Level:', f"Condition {classification.get('condition', 'N/A')}"])
-                assessment_data.append(['Contamination:', classification.get('contamination_level', 'N/A')])
-            
-            assessment_data.append(['Affected Area:', f"{assessment.get('affected_area', 'N/A')} sq ft"])
-            assessment_data.append(['Severity:', assessment.get('severity', 'N/A').upper()])
+            assessment_data = _assessment_rows(estimate_data['assessment'])
             
             assessment_table = Table(assessment_data, colWidths=[2*inch, 4.5*inch])
-            assessment_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#f3f4f6')),
-                ('TEXTCOLOR', (0, 0), (0, -1), self.secondary_color),
-                ('FONT', (0, 0), (0, -1), 'Helvetica-Bold', 9),
-                ('FONT', (1, 0), (1, -1), 'Helvetica', 10),
-                ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
-                ('ALIGN', (1, 0), (1, -1), 'LEFT'),
-                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#e5e7eb')),
-                ('LEFTPADDING', (0, 0), (-1, -1), 8),
-                ('RIGHTPADDING', (0, 0), (-1, -1), 8),
-                ('TOPPADDING', (0, 0), (-1, -1), 4),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
-            ]))
+            assessment_table.setStyle(ASSESSMENT_TABLE_STYLE)
             elements.append(assessment_table)
             elements.append(Spacer(1, 0.25*inch))
         
         # Line Items Table
+        start_section('line_items')
         elements.append(Paragraph("<b>RESTORATION SERVICES</b>", self.styles['SectionHeader']))
         
         # Prepare line items data
-        line_items_data = [['Description', 'Quantity', 'Unit Price', 'Total']]
-        
-        subtotal = 0
-        for item in estimate_data.get('line_items', []):
-            quantity = float(item.get('quantity', 0))
-            unit_price = float(item.get('unit_price', 0))
-            total = quantity * unit_price
-            subtotal += total
-            
-            line_items_data.append([
-                item.get('description', ''),
-                f"{quantity:.1f}" if quantity % 1 else str(int(quantity)),
-                f"${unit_price:,.2f}",
-                f"${total:,.2f}"
-            ])
+        item_rows, subtotal = _line_item_rows(estimate_data.get('line_items', []))
+        line_items_data = [['Description', 'Quantity', 'Unit Price', 'Total']] + item_rows
         
         # Add subtotal, markup, and total
-        markup_percent = float(estimate_data.get('markup', 0))
-        markup_amount = subtotal * (markup_percent / 100)
-        grand_total = subtotal + markup_amount
+        markup_percent, markup_amount, grand_total = _totals(estimate_data, subtotal)
         
         # Empty row for spacing
         line_items_data.append(['', '', '', ''])
@@ -244,193 +721,64 @@ class PDFGenerator:
                                Paragraph(f'<b>${grand_total:,.2f}</b>', self.styles['Normal'])])
         
         # Create the line items table
-        line_items_table = Table(line_items_data, colWidths=[3.5*inch, 1*inch, 1*inch, 1*inch])
-        
-        # Determine the row indices for styling
-        num_items = len(estimate_data.get('line_items', []))
-        empty_row_idx = num_items + 2
-        subtotal_row_idx = num_items + 3
-        markup_row_idx = num_items + 4 if markup_percent > 0 else None
-        total_row_idx = num_items + (5 if markup_percent > 0 else 4)
-        
-        table_style = [
-            # Header row
-            ('BACKGROUND', (0, 0), (-1, 0), self.primary_color),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-            ('FONT', (0, 0), (-1, 0), 'Helvetica-Bold', 10),
-            
-            # All cells
-            ('ALIGN', (1, 0), (1, -1), 'CENTER'),
-            ('ALIGN', (2, 0), (-1, -1), 'RIGHT'),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('FONT', (0, 1), (-1, -1), 'Helvetica', 9),
-            
-            # Grid
-            ('GRID', (0, 0), (-1, subtotal_row_idx-1), 0.5, colors.HexColor('#e5e7eb')),
-            ('BOX', (0, 0), (-1, -1), 1, self.secondary_color),
+        if len(item_rows) >= LARGE_ESTIMATE_ITEMS:
+            # Large estimates: page-sized chunks with precomputed row heights
+            elements.append(_ChunkedLineItems(line_items_data, markup_percent > 0))
+        else:
+            line_items_table = Table(line_items_data, colWidths=LINE_ITEM_COL_WIDTHS)
             
-            # Total section
-            ('LINEABOVE', (2, subtotal_row_idx), (-1, subtotal_row_idx), 1, self.secondary_color),
-            ('FONT', (2, total_row_idx), (-1, total_row_idx), 'Helvetica-Bold', 11),
-            ('BACKGROUND', (2, total_row_idx), (-1, total_row_idx), colors.HexColor('#f3f4f6')),
-            
-            # Padding
-            ('LEFTPADDING', (0, 0), (-1, -1), 6),
-            ('RIGHTPADDING', (0, 0), (-1, -1), 6),
-            ('TOPPADDING', (0, 0), (-1, -1), 4),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
-        ]
-        
-        line_items_table.setStyle(TableStyle(table_style))
-        elements.append(line_items_table)
+            line_items_table.setStyle(LINE_ITEMS_MARKUP_TABLE_STYLE if markup_percent > 0 else LINE_ITEMS_TABLE_STYLE)
+            elements.append(line_items_table)
         elements.append(Spacer(1, 0.25*inch))
         
         # Equipment List
         if estimate_data.get('equipment', []):
+            start_section('equipment')
             elements.append(Paragraph("<b>EQUIPMENT DEPLOYMENT</b>", self.styles['SectionHeader']))
             
             equipment_data = [['Equipment', 'Quantity', 'Duration', 'Daily Rate', 'Total']]
-            
-            for equip in estimate_data['equipment']:
-                quantity = int(equip.get('quantity', 0))
-                days = int(equip.get('days', 0))
-                daily_rate = float(equip.get('daily_rate', 0))
-                total = quantity * days * daily_rate
-                
-                equipment_data.append([
-                    equip.get('name', ''),
-                    str(quantity),
-                    f"{days} days",
-                    f"${daily_rate:.2f}",
-                    f"${total:,.2f}"
-                ])
+            equipment_data += _equipment_rows(estimate_data['equipment'])
             
             equipment_table = Table(equipment_data, colWidths=[2.5*inch, 1*inch, 1*inch, 1*inch, 1*inch])
-            equipment_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), self.primary_color),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-                ('FONT', (0, 0), (-1, 0), 'Helvetica-Bold', 10),
-                ('ALIGN', (1, 0), (-1, -1), 'CENTER'),
-                ('ALIGN', (-1, 0), (-1, -1), 'RIGHT'),
-                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                ('FONT', (0, 1), (-1, -1), 'Helvetica', 9),
-                ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#e5e7eb')),
-                ('BOX', (0, 0), (-1, -1), 1, self.secondary_color),
-                ('LEFTPADDING', (0, 0), (-1, -1), 6),
-                ('RIGHTPADDING', (0, 0), (-1, -1), 6),
-                ('TOPPADDING', (0, 0), (-1, -1), 4),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
-            ]))
+            equipment_table.setStyle(EQUIPMENT_TABLE_STYLE)
             elements.append(equipment_table)
             elements.append(Spacer(1, 0.25*inch))
         
         # Photos Page (if photos are provided)
         if estimate_data.get('photos', []):
+            start_section('photos')
             elements.append(PageBreak())
             elements.append(Paragraph("<b>DOCUMENTATION PHOTOS</b>", self.styles['SectionHeader']))
             elements.append(Spacer(1, 0.25*inch))
             
-            # Create a 2x3 grid for photos
-            photo_data = []
-            photo_row = []
-            
-            for i, photo in enumerate(estimate_data['photos'][:6]):  # Max 6 photos
-                try:
-                    # Handle base64 image data
-                    if photo.get('data', '').startswith('data:image'):
-                        # Extract base64 data
-                        header, data = photo['data'].split(',', 1)
-                        img_data = base64.b64decode(data)
-                        img = PILImage.open(io.BytesIO(img_data))
-                        
-                        # Resize image to fit
-                        img.thumbnail((250, 180), PILImage.Resampling.LANCZOS)
-                        
-                        # Convert to RGB if necessary
-                        if img.mode != 'RGB':
-                            img = img.convert('RGB')
-                        
-                        # Save to buffer
-                        img_buffer = io.BytesIO()
-                        img.save(img_buffer, format='JPEG', quality=85)
-                        img_buffer.seek(0)
-                        
-                        # Create reportlab Image
-                        rl_img = Image(img_buffer, width=2.5*inch, height=1.8*inch)
-                        
-                        # Create cell with image and caption
-                        cell_content = [
-                            rl_img,
-                            Spacer(1, 0.1*inch),
-                            Paragraph(photo.get('caption', f'Photo {i+1}'), self.styles['FooterText'])
-                        ]
-                        
-                        photo_row.append(cell_content)
-                        
-                        # Add row after 2 photos
-                        if len(photo_row) == 2:
-                            photo_data.append(photo_row)
-                            photo_row = []
-                    
-                except Exception as e:
-                    print(f"Error processing photo {i+1}: {e}")
-                    continue
-            
-            # Add remaining photos
-            if photo_row:
-                while len(photo_row) < 2:
-                    photo_row.append([''])  # Empty cell
-                photo_data.append(photo_row)
-            
-            if photo_data:
-                # Create nested tables for photos
-                for row in photo_data:
-                    row_elements = []
-                    for cell in row:
-                        if isinstance(cell, list) and cell:
-                            cell_table = Table([[c] for c in cell], colWidths=[2.7*inch])
-                            cell_table.setStyle(TableStyle([
-                                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                            ]))
-                            row_elements.append(cell_table)
-                        else:
-                            row_elements.append('')
-                    
-                    photo_table = Table([row_elements], colWidths=[3.25*inch, 3.25*inch])
-                    photo_table.setStyle(TableStyle([
-                        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-                        ('LEFTPADDING', (0, 0), (-1, -1), 3),
-                        ('RIGHTPADDING', (0, 0), (-1, -1), 3),
-                        ('TOPPADDING', (0, 0), (-1, -1), 3),
-                        ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
-                    ]))
-                    elements.append(photo_table)
-                    elements.append(Spacer(1, 0.15*inch))
+            # Two-column grid, paginated over as many pages as the photos
+            # need; rows are built (and photos decoded) only as they're laid out
+            elements.append(_PhotoGrid(estimate_data['photos'], self.styles, photo_settings))
         
         # Terms and Conditions
+        start_section('terms')
         elements.append(Spacer(1, 0.5*inch))
         elements.append(Paragraph("<b>TERMS & CONDITIONS</b>", self.styles['SectionHeader']))
         
-        terms = [
-            "This estimate is valid for 30 days from the date above",
-            "All work performed in compliance with IICRC standards and insurance requirements",
-            "Payment terms: Net 30 days or as per insurance settlement",
-            "Additional charges may apply for hazardous materials or unforeseen conditions",
-            "24/7 Emergency Response Available"
-        ]
-        
-        for term in terms:
+        for term in TERMS:
             elements.append(Paragraph(f"• {term}", self.styles['FooterText']))
             elements.append(Spacer(1, 0.05*inch))
         
         # Build PDF
+        doc.section_starts = {id(elements[index]): stage for index, stage in sections}
+        timings.switch('build')
         doc.build(elements, onFirstPage=self._draw_header_footer, onLaterPages=self._draw_header_footer)
-        
-        # Get the PDF data
-        buffer.seek(0)
-        return buffer.getvalue()
+
+    def save_estimate_pdf(self, estimate_data, filename, engine='platypus', deterministic=False, timings=None):
+        """Render straight into generated_pdfs/filename and return its path"""
+        os.makedirs('generated_pdfs', exist_ok=True)
+        filepath = os.path.join('generated_pdfs', filename)
+
+        with open(filepath, 'wb') as f:
+            self.write_estimate_pdf(estimate_data, f, engine=engine, deterministic=deterministic,
+                                    timings=timings)
+
+        return filepath
 
     def save_pdf_to_file(self, pdf_data, filename):
         """Save PDF data to a file"""
@@ -440,4 +788,18 @@ class PDFGenerator:
         with open(filepath, 'wb') as f:
             f.write(pdf_data)
         
-        return filepath
\ No newline at end of file
+        return filepath
+
+
+_shared_generator = None
+_shared_generator_lock = threading.Lock()
+
+
+def get_pdf_generator():
+    """Return the process-wide PDFGenerator, creating and warming it on first use"""
+    global _shared_generator
+    if _shared_generator is None:
+        with _shared_generator_lock:
+            if _shared_generator is None:
+                _shared_generator = PDFGenerator().warm_up()
+    return _shared_generator
@@ -0,0 +1,141 @@
+"""
+Size-optimised estimate PDFs
+
+Estimates go out as email attachments and through insurer portals with
+upload caps. Photo thumbnails are nearly all of a PDF's bytes, so the size
+profile walks SIZE_LADDER (JPEG quality first, then pixel dimensions) until
+the PDF fits a byte budget. Each step down is predicted from the thumbnail
+sizes alone, which come out of the thumbnail cache, so a PDF that is over
+budget is usually rendered only twice.
+"""
+
+import os
+import re
+import hashlib
+import logging
+
+from photo_processing import PhotoSettings, iter_prepared_photos
+from pdf_generator import get_pdf_generator
+
+logger = logging.getLogger(__name__)
+
+PDF_PROFILES = ('standard', 'size')
+# Default budget for the size profile when the request doesn't give one
+PDF_SIZE_BUDGET = int(os.getenv('PDF_SIZE_BUDGET_KB', 5 * 1024)) * 1024
+
+# Thumbnail settings from best to smallest; the first is the standard profile's
+SIZE_LADDER = (
+    PhotoSettings((250, 180), 85),
+    PhotoSettings((250, 180), 70),
+    PhotoSettings((250, 180), 55),
+    PhotoSettings((200, 144), 55),
+    PhotoSettings((200, 144), 40),
+    PhotoSettings((160, 115), 40),
+    PhotoSettings((125, 90), 30),
+)
+
+# Object header and dictionary of an image XObject, on top of its JPEG bytes
+IMAGE_OVERHEAD = 256
+
+_STARTXREF = re.compile(rb'startxref\s+(\d+)\s+%%EOF\s*$')
+
+
+def _objects(pdf_data):
+    """Yield (header, size) for each object, header being its dictionary text
+
+    Objects are located through the cross-reference table rather than by
+    scanning, since binary streams can contain anything.
+    """
+    xref_start = int(_STARTXREF.search(pdf_data).group(1))
+    lines = pdf_data[xref_start:].split(b'\n', 2)
+    count = int(lines[1].split()[1])
+    table = lines[2]
+    offsets = sorted(int(table[i * 20:i * 20 + 10]) for i in range(1, count))
+    for start, end in zip(offsets, offsets[1:] + [xref_start]):
+        yield pdf_data[start:min(end, start + 512)].split(b'stream', 1)[0], end - start
+
+
+def pdf_size_breakdown(pdf_data):
+    """Bytes of a ReportLab PDF by section
+
+    photos are the embedded images, page_content the compressed drawing
+    operators of every page (text, tables, rules), fonts the font
+    resources, and structure everything else (page tree, metadata and the
+    cross-reference table).
+    """
+    sections = {'photos': 0, 'page_content': 0, 'fonts': 0, 'structure': 0}
+    images = pages = 0
+    for header, size in _objects(pdf_data):
+        if b'/Subtype /Image' in header:
+            sections['photos'] += size
+            images += 1
+        elif b'/Type /Font' in header or b'/FontDescriptor' in header or b'/Length1' in header:
+            sections['fonts'] += size
+        elif b'/Filter' in header or b'/Length' in header:
+            sections['page_content'] += size
+        else:
+            if re.search(rb'/Type /Page\b', header):
+                pages += 1
+            sections['structure'] += size
+    sections['structure'] += len(pdf_data) - sum(sections.values())
+    return {'bytes': len(pdf_data), 'pages': pages, 'images': images, 'sections': sections}
+
+
+def _thumbnail_bytes(photos, photo_settings):
+    """Predicted size of the embedded images at photo_settings
+
+    Identical thumbnails are embedded once, so they are counted once.
+    """
+    seen = set()
+    total = 0
+    for photo in iter_prepared_photos(photos, size=photo_settings.size, quality=photo_settings.quality):
+        if photo.buffer is None:
+            continue
+        data = photo.buffer.getvalue()
+        digest = hashlib.sha256(data).digest()
+        if digest not in seen:
+            seen.add(digest)
+            total += len(data) + IMAGE_OVERHEAD
+    return total
+
+
+def generate_size_optimized_pdf(estimate_data, max_bytes=PDF_SIZE_BUDGET, engine='platypus',
+                                deterministic=False, timings=None):
+    """Render estimate_data to fit in max_bytes where possible; return (pdf_data, report)
+
+    report is pdf_size_breakdown of the result plus the photo settings that
+    were used, how many renders it took and whether the budget was met. If
+    even the smallest photos don't fit, the smallest rendering is returned.
+    """
+    generator = get_pdf_generator()
+    photos = estimate_data.get('photos', [])
+    rung = 0
+    pdf_data = generator.generate_estimate_pdf(estimate_data, engine=engine, deterministic=deterministic,
+                                               photo_settings=SIZE_LADDER[rung], timings=timings)
+    breakdown = pdf_size_breakdown(pdf_data)
+    renders = 1
+
+    while len(pdf_data) > max_bytes and breakdown['images'] and rung < len(SIZE_LADDER) - 1:
+        # Only the photos change size; skip every rung predicted not to fit
+        fixed = len(pdf_data) - breakdown['sections']['photos']
+        rung += 1
+        while rung < len(SIZE_LADDER) - 1 and fixed + _thumbnail_bytes(photos, SIZE_LADDER[rung]) > max_bytes:
+            rung += 1
+        pdf_data = generator.generate_estimate_pdf(estimate_data, engine=engine, deterministic=deterministic,
+                                                   photo_settings=SIZE_LADDER[rung], timings=timings)
+        breakdown = pdf_size_breakdown(pdf_data)
+        renders += 1
+
+    settings = SIZE_LADDER[rung]
+    report = dict(breakdown,
+                  max_bytes=max_bytes,
+                  within_budget=len(pdf_data) <= max_bytes,
+                  photo_size=list(settings.size),
+                  photo_quality=settings.quality,
+                  renders=renders)
+    logger.info(
+        f"Size-optimised PDF: {len(pdf_data)} bytes (budget {max_bytes}) with "
+        f"{settings.size[0]}x{settings.size[1]} q{settings.quality} photos after {renders} render(s); "
+        + ', '.join(f"{name} {size}" for name, size in breakdown['sections'].items())
+    )
+    return pdf_data, report
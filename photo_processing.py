@@ -0,0 +1,252 @@
+"""
+Photo preparation for the estimate photo appendix
+
+Photos arrive as base64 data URLs straight from field phones, usually
+12MP JPEGs. Each one is decoded at reduced resolution (JPEG draft mode
+scales the DCT, so the full-size image is never materialised), shrunk to
+thumbnail size and re-encoded as a small JPEG. Pillow releases the GIL
+while decoding, resampling and encoding, so photos are prepared in
+parallel on a shared thread pool.
+
+Thumbnails are cached by a hash of the photo payload (memory LRU in front
+of a disk tier shared by all workers), so re-rendering an estimate after a
+line-item edit does not decode its photos again.
+"""
+
+import io
+import os
+import time
+import base64
+import hashlib
+import logging
+import tempfile
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image as PILImage
+
+from lru_cache import LRUCache, DiskCache, TieredCache
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_SIZE = (250, 180)
+JPEG_QUALITY = 85
+# Box-reduce to within REDUCING_GAP x the target, then a cheap bicubic pass;
+# at thumbnail sizes this is indistinguishable from a full LANCZOS resize
+REDUCING_GAP = 2.0
+RESAMPLE = PILImage.Resampling.BICUBIC
+PHOTO_WORKERS = int(os.getenv('PHOTO_DECODE_WORKERS', 0)) or min(4, os.cpu_count() or 1)
+# Photos prepared together by iter_prepared_photos; at most two batches of
+# thumbnails are alive at once
+PHOTO_BATCH_SIZE = int(os.getenv('PHOTO_BATCH_SIZE', 12))
+
+# Bump whenever prepare_photo's output changes so stale thumbnails are never served
+PIPELINE_VERSION = 1
+THUMBNAIL_CACHE_MEMORY = int(os.getenv('THUMBNAIL_CACHE_MEMORY_MB', 32)) * 1024 * 1024
+THUMBNAIL_CACHE_DISK = int(os.getenv('THUMBNAIL_CACHE_DISK_MB', 256)) * 1024 * 1024
+THUMBNAIL_CACHE_DIR = os.getenv('THUMBNAIL_CACHE_DIR',
+                                os.path.join(tempfile.gettempdir(), 'restoredoc_thumbnails'))
+
+# buffer is a JPEG BytesIO (None if the photo has no image data or failed),
+# timings maps stage name to milliseconds, cache is 'memory', 'disk', 'miss',
+# 'repeat' (same payload as an earlier photo in the batch) or None when the
+# photo had no image data
+PreparedPhoto = namedtuple('PreparedPhoto', ['index', 'caption', 'buffer', 'error', 'timings', 'cache'])
+
+# Thumbnail pixel size and JPEG quality; the size-optimised PDF profile
+# steps these down to fit a byte budget
+PhotoSettings = namedtuple('PhotoSettings', ['size', 'quality'])
+DEFAULT_PHOTO_SETTINGS = PhotoSettings(THUMBNAIL_SIZE, JPEG_QUALITY)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_photo_pool():
+    """Return the process-wide photo preparation pool, starting it on first use"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(max_workers=PHOTO_WORKERS, thread_name_prefix='photo')
+    return _pool
+
+
+def _build_thumbnail_cache():
+    """Memory LRU in front of a shared on-disk tier (memory only if the directory is unusable)"""
+    memory = LRUCache(max_bytes=THUMBNAIL_CACHE_MEMORY)
+    disk = None
+    if THUMBNAIL_CACHE_DIR:
+        try:
+            disk = DiskCache(THUMBNAIL_CACHE_DIR, THUMBNAIL_CACHE_DISK, suffix='.jpg')
+        except OSError as e:
+            logger.warning(f"Thumbnail disk cache disabled: {e}")
+    return TieredCache(memory, disk)
+
+
+thumbnail_cache = _build_thumbnail_cache()
+
+
+def thumbnail_key(data, size=THUMBNAIL_SIZE, quality=JPEG_QUALITY):
+    """Content hash of a data-URL payload plus everything that shapes its thumbnail"""
+    digest = hashlib.sha256(data.encode('ascii', 'ignore'))
+    digest.update(f"|{size[0]}x{size[1]}|q{quality}|v{PIPELINE_VERSION}".encode('ascii'))
+    return digest.hexdigest()
+
+
+def decode_data_url(data):
+    """Return the image bytes of a base64 data URL, or None if it isn't one"""
+    if not data.startswith('data:image'):
+        return None
+    header, payload = data.split(',', 1)
+    return base64.b64decode(payload)
+
+
+def prepare_photo(photo, size=THUMBNAIL_SIZE, quality=JPEG_QUALITY):
+    """Decode a data-URL photo into a JPEG thumbnail buffer
+
+    Returns (buffer, timings); buffer is None if the photo isn't a data URL.
+    """
+    timings = {}
+    start = time.perf_counter()
+
+    img_data = decode_data_url(photo.get('data', ''))
+    if img_data is None:
+        return None, timings
+    mark = time.perf_counter()
+    timings['base64_ms'] = (mark - start) * 1000
+
+    img = PILImage.open(io.BytesIO(img_data))
+    # JPEG only: decode straight to RGB at the smallest DCT scale that still
+    # covers REDUCING_GAP x the target size
+    img.draft('RGB', (int(size[0] * REDUCING_GAP), int(size[1] * REDUCING_GAP)))
+    img.load()
+    now = time.perf_counter()
+    timings['decode_ms'] = (now - mark) * 1000
+    mark = now
+
+    img.thumbnail(size, RESAMPLE, reducing_gap=REDUCING_GAP)
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    now = time.perf_counter()
+    timings['resize_ms'] = (now - mark) * 1000
+    mark = now
+
+    img_buffer = io.BytesIO()
+    img.save(img_buffer, format='JPEG', quality=quality)
+    img_buffer.seek(0)
+    now = time.perf_counter()
+    timings['encode_ms'] = (now - mark) * 1000
+    timings['total_ms'] = (now - start) * 1000
+    return img_buffer, timings
+
+
+def _prepare(index, photo, size, quality):
+    if not isinstance(photo, dict):
+        return PreparedPhoto(index, f'Photo {index+1}', None,
+                             TypeError(f"Photo entry is a {type(photo).__name__}, not an object"), {}, None)
+    caption = photo.get('caption', f'Photo {index+1}')
+    data = photo.get('data', '')
+    if not isinstance(data, str) or not data.startswith('data:image'):
+        return PreparedPhoto(index, caption, None, None, {}, None)
+
+    start = time.perf_counter()
+    key = thumbnail_key(data, size, quality)
+    thumbnail, tier = thumbnail_cache.lookup(key)
+    lookup_ms = (time.perf_counter() - start) * 1000
+    if thumbnail is not None:
+        return PreparedPhoto(index, caption, io.BytesIO(thumbnail), None,
+                             {'lookup_ms': lookup_ms, 'total_ms': lookup_ms}, tier)
+
+    try:
+        buffer, timings = prepare_photo(photo, size, quality)
+    except Exception as e:
+        return PreparedPhoto(index, caption, None, e, {}, 'miss')
+    thumbnail_cache.put(key, buffer.getvalue())
+    timings['lookup_ms'] = lookup_ms
+    timings['total_ms'] += lookup_ms
+    return PreparedPhoto(index, caption, buffer, None, timings, 'miss')
+
+
+def _submit(photos, first_index, size, quality):
+    """Submit a batch; a payload repeated within it is only prepared once"""
+    pool = get_photo_pool()
+    pending = []
+    by_data = {}
+    for i, photo in enumerate(photos):
+        index = first_index + i
+        data = photo.get('data') if isinstance(photo, dict) else None
+        future = by_data.get(data) if isinstance(data, str) else None
+        if future is None:
+            # Malformed entries are never shared; _prepare reports them
+            future = pool.submit(_prepare, index, photo, size, quality)
+            if isinstance(data, str):
+                by_data[data] = future
+            pending.append((future, None))
+        else:
+            pending.append((future, (index, photo.get('caption', f'Photo {index+1}'))))
+    return pending
+
+
+def _collect(pending):
+    """Wait for a submitted batch and return its PreparedPhotos in order"""
+    prepared = []
+    for future, repeat in pending:
+        photo = future.result()
+        if repeat is not None:
+            index, caption = repeat
+            buffer = io.BytesIO(photo.buffer.getvalue()) if photo.buffer is not None else None
+            photo = photo._replace(index=index, caption=caption, buffer=buffer, timings={},
+                                   cache='repeat' if photo.cache is not None else None)
+        prepared.append(photo)
+    return prepared
+
+
+def _log_prepared(prepared, elapsed):
+    per_photo = [f"{p.timings['total_ms']:.1f}" for p in prepared if p.timings]
+    if per_photo:
+        cached = sum(1 for p in prepared if p.cache in ('memory', 'disk'))
+        logger.info(
+            f"Prepared {len(per_photo)} photos ({cached} cached) in "
+            f"{elapsed * 1000:.1f} ms (per photo: {', '.join(per_photo)} ms)"
+        )
+
+
+def prepare_photos(photos, size=THUMBNAIL_SIZE, quality=JPEG_QUALITY):
+    """Prepare photos in parallel and return PreparedPhotos in input order
+
+    A photo that fails to decode comes back with error set rather than
+    raising, so one bad upload never blocks the rest of the appendix.
+    """
+    start = time.perf_counter()
+    if len(photos) > 1:
+        prepared = _collect(_submit(photos, 0, size, quality))
+    else:
+        prepared = [_prepare(i, photo, size, quality) for i, photo in enumerate(photos)]
+
+    _log_prepared(prepared, time.perf_counter() - start)
+    return prepared
+
+
+def iter_prepared_photos(photos, batch_size=PHOTO_BATCH_SIZE, size=THUMBNAIL_SIZE, quality=JPEG_QUALITY):
+    """Yield PreparedPhotos in input order, preparing them batch_size at a time
+
+    The next batch is submitted before the current one is handed out, so
+    decoding overlaps with whatever the caller does with each photo while
+    only two batches of thumbnails are ever held, however many photos there
+    are.
+    """
+    for first in range(0, len(photos), batch_size):
+        start = time.perf_counter()
+        if first == 0:
+            pending = _submit(photos[:batch_size], 0, size, quality)
+        upcoming = first + batch_size
+        following = _submit(photos[upcoming:upcoming + batch_size], upcoming, size, quality)
+
+        batch = _collect(pending)
+        _log_prepared(batch, time.perf_counter() - start)
+        pending = following
+        for photo in batch:
+            yield photo
+        del batch
@@ -0,0 +1,247 @@
+"""
+Per-stage instrumentation for PDF renders
+
+Opt-in: set PDF_INSTRUMENT=timings for wall time per stage, or
+PDF_INSTRUMENT=allocations to also trace memory with tracemalloc (which
+slows rendering down several times, so keep it for investigations). The
+API can ask for either per request too.
+
+A RenderTimings is a stopwatch that charges time to whichever stage is
+current. The renderers switch stages as they go, including while Platypus
+lays out each section inside doc.build, so the stages of a render add up
+to the whole render. Every instrumented render is logged and aggregated
+in render_metrics.
+
+tracemalloc traces the whole process, so renders running at the same time
+in other threads share one tracer: the first starts it and the last stops
+it. Its figures mix every thread's allocations, so a render only reports
+memory if it had the tracer to itself from start to end.
+"""
+
+import os
+import time
+import logging
+import threading
+import tracemalloc
+
+logger = logging.getLogger(__name__)
+
+INSTRUMENT_MODES = ('timings', 'allocations')
+PDF_INSTRUMENT = os.getenv('PDF_INSTRUMENT', '')
+
+_tracer_lock = threading.Lock()
+_tracer_users = 0
+_tracer_joins = 0       # renders that have used the tracer so far
+_tracer_ours = False    # started here rather than by PYTHONTRACEMALLOC or a debugger, so ours to stop
+
+
+def _acquire_tracer():
+    """Start using the tracer; returns (join, shared), shared if another render already uses it"""
+    global _tracer_users, _tracer_joins, _tracer_ours
+    with _tracer_lock:
+        if _tracer_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _tracer_ours = True
+        shared = _tracer_users > 0
+        _tracer_users += 1
+        _tracer_joins += 1
+        return _tracer_joins, shared
+
+
+def _release_tracer():
+    global _tracer_users, _tracer_ours
+    with _tracer_lock:
+        _tracer_users -= 1
+        if _tracer_users == 0 and _tracer_ours:
+            tracemalloc.stop()
+            _tracer_ours = False
+
+
+def _solo_memory(join):
+    """(current, peak) traced bytes, resetting the peak; None unless join is the only render tracing"""
+    with _tracer_lock:
+        if _tracer_users != 1 or _tracer_joins != join:
+            return None
+        memory = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        return memory
+
+
+class RenderTimings:
+    """Stage stopwatch for one or more renders
+
+    The renderers use the stages styles (document and stylesheet setup),
+    header, assessment, line_items, equipment, photos, terms and build
+    (page decoration and writing the file). stages maps each stage to
+    {'ms', 'alloc_kb', 'peak_kb'}, summed over every render recorded; the
+    memory figures are only present when allocations is set and the render
+    had the tracer to itself. alloc_kb is memory still held when the stage
+    ended, peak_kb the most the stage had allocated at once.
+    """
+
+    enabled = True
+
+    def __init__(self, allocations=False):
+        self.allocations = allocations
+        self.stages = {}
+        self.renders = 0
+        self._run = None
+        self._current = None
+        self._join = None       # this render's turn on the tracer, while it holds it
+        self._shared = False
+
+    def switch(self, stage):
+        """Charge time so far to the current stage and make stage current"""
+        now = time.perf_counter()
+        if self._run is None:
+            self._run = {}
+            if self.allocations:
+                self._join, self._shared = _acquire_tracer()
+        memory = self._memory()
+        if self._current is not None:
+            self._charge(now, memory)
+        self._current = stage
+        self._mark = now
+        if memory is not None:
+            self._mark_memory = memory[0]
+
+    def stop(self):
+        """End the current render and return its stages"""
+        run = self._run if self._run is not None else {}
+        if self._current is not None:
+            self._charge(time.perf_counter(), self._memory())
+        if self._join is not None:
+            _release_tracer()
+            self._join = None
+            if self._shared:
+                logger.debug("Render overlapped another traced render; dropping its memory figures")
+                for values in run.values():
+                    values.pop('alloc_kb', None)
+                    values.pop('peak_kb', None)
+        for stage, values in run.items():
+            total = self.stages.setdefault(stage, {})
+            for key, value in values.items():
+                total[key] = max(total.get(key, 0.0), value) if key == 'peak_kb' else total.get(key, 0.0) + value
+        self.renders += 1
+        self._run = None
+        self._current = None
+        return run
+
+    def abort(self):
+        """End a render that failed, without recording it"""
+        if self._join is not None:
+            _release_tracer()
+            self._join = None
+        self._run = None
+        self._current = None
+
+    def _memory(self):
+        """(current, peak) traced bytes while this render has the tracer to itself, else None"""
+        if self._join is None or self._shared:
+            return None
+        memory = _solo_memory(self._join)
+        if memory is None:
+            self._shared = True
+        return memory
+
+    def _charge(self, now, memory):
+        values = self._run.setdefault(self._current, {'ms': 0.0})
+        values['ms'] += (now - self._mark) * 1000
+        if memory is not None:
+            current, peak = memory
+            values['alloc_kb'] = values.get('alloc_kb', 0.0) + (current - self._mark_memory) / 1024
+            values['peak_kb'] = max(values.get('peak_kb', 0.0), (peak - self._mark_memory) / 1024)
+
+    def server_timing(self):
+        """The recorded stages as a Server-Timing header value"""
+        parts = []
+        for stage, values in self.stages.items():
+            part = f"{stage};dur={values['ms']:.1f}"
+            if 'peak_kb' in values:
+                part += f';desc="peak {values["peak_kb"]:.0f} KB"'
+            parts.append(part)
+        return ', '.join(parts)
+
+
+class _NullTimings:
+    """Stands in for RenderTimings when instrumentation is off"""
+
+    enabled = False
+
+    def switch(self, stage):
+        pass
+
+    def stop(self):
+        return {}
+
+    def abort(self):
+        pass
+
+
+NULL_TIMINGS = _NullTimings()
+
+
+def new_timings(mode=None):
+    """A RenderTimings for mode ('timings' or 'allocations', default PDF_INSTRUMENT), or None if off"""
+    mode = mode or PDF_INSTRUMENT
+    if mode not in INSTRUMENT_MODES:
+        return None
+    return RenderTimings(allocations=mode == 'allocations')
+
+
+def format_stages(stages):
+    """One-line summary of a render's stages for the log"""
+    parts = []
+    for stage, values in stages.items():
+        part = f"{stage} {values['ms']:.1f} ms"
+        if 'peak_kb' in values:
+            part += f" (+{values['alloc_kb']:.0f} KB, peak {values['peak_kb']:.0f} KB)"
+        parts.append(part)
+    return ', '.join(parts)
+
+
+class RenderMetrics:
+    """Process-wide per-engine, per-stage aggregates of instrumented renders"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._renders = {}
+        self._stages = {}
+
+    def observe(self, engine, stages):
+        with self._lock:
+            self._renders[engine] = self._renders.get(engine, 0) + 1
+            for stage, values in stages.items():
+                total = self._stages.setdefault((engine, stage), {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+                total['count'] += 1
+                total['total_ms'] += values['ms']
+                total['max_ms'] = max(total['max_ms'], values['ms'])
+                if 'peak_kb' in values:
+                    total['max_peak_kb'] = max(total.get('max_peak_kb', 0.0), values['peak_kb'])
+
+    def stats(self):
+        with self._lock:
+            stages = {}
+            for (engine, stage), total in self._stages.items():
+                entry = {
+                    'count': total['count'],
+                    'mean_ms': round(total['total_ms'] / total['count'], 3),
+                    'max_ms': round(total['max_ms'], 3)
+                }
+                if 'max_peak_kb' in total:
+                    entry['max_peak_kb'] = round(total['max_peak_kb'], 1)
+                stages.setdefault(engine, {})[stage] = entry
+            return {'renders': dict(self._renders), 'stages': stages}
+
+
+render_metrics = RenderMetrics()
+
+
+def record_render(engine, timings):
+    """End an instrumented render: log its stages and add them to render_metrics"""
+    stages = timings.stop()
+    if stages:
+        total = sum(values['ms'] for values in stages.values())
+        logger.info(f"Rendered estimate PDF ({engine}) in {total:.1f} ms: {format_stages(stages)}")
+        render_metrics.observe(engine, stages)
+    return stages
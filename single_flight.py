@@ -0,0 +1,115 @@
+"""
+Single-flight call coalescing
+
+When the same expensive call is made again while the first is still in
+flight (a crew lead and a technician analysing the same photos seconds
+apart), the later callers wait for the first call and share its result
+instead of repeating it. The first caller's exception is raised in every
+caller, except for errors that only concern the caller that made the call
+(by default DeadlineExceeded: its deadline may be shorter than theirs).
+Those are not shared; a waiting caller starts the call again itself.
+
+Each caller waits no longer than its own deadline. Events the call
+publishes on the way, such as progress and partial results, reach every
+caller, and a caller that joins late first gets the latest event of each
+kind.
+"""
+
+import copy
+import threading
+
+from upstream_limiter import DeadlineExceeded, time_left
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.listeners = []
+        self.latest = {}     # kind -> the last event of that kind
+        # Held while events are delivered, so every listener sees them in order
+        self.events_lock = threading.Lock()
+
+
+class SingleFlight:
+    """Coalesce concurrent calls by key; counts the calls made and the calls saved"""
+
+    def __init__(self, caller_errors=(DeadlineExceeded,)):
+        self.caller_errors = caller_errors
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.calls = 0
+        self.coalesced = 0
+        self.retried = 0
+
+    def do(self, key, fn, deadline=None, on_event=None):
+        """Return (result, shared): fn's result, and whether another caller's call produced it
+
+        fn is called as fn(publish) and may call publish(kind, value) to
+        pass an event to on_event(kind, value) of every caller. deadline
+        (a time.monotonic() value) bounds how long this caller waits for
+        someone else's call; DeadlineExceeded is raised when it passes.
+        Shared results are deep copies, so callers can modify what they get.
+        """
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                leader = call is None
+                if leader:
+                    call = self._calls[key] = _Call()
+                    self.calls += 1
+                else:
+                    self.coalesced += 1
+            if on_event:
+                with call.events_lock:
+                    call.listeners.append(on_event)
+                    for kind, value in call.latest.items():
+                        on_event(kind, value)
+            if leader:
+                return self._lead(key, call, fn), False
+            try:
+                if not call.done.wait(time_left(deadline)):
+                    raise DeadlineExceeded("Deadline passed while waiting for an identical call")
+            finally:
+                if on_event:
+                    with call.events_lock:
+                        call.listeners.remove(on_event)
+            if call.error is None:
+                return copy.deepcopy(call.result), True
+            if not isinstance(call.error, self.caller_errors):
+                raise call.error
+            # The call failed for its own caller's reasons; try again under ours
+            remaining = time_left(deadline)
+            if remaining is not None and remaining <= 0:
+                raise DeadlineExceeded("Deadline passed while waiting for an identical call")
+            with self._lock:
+                self.coalesced -= 1
+                self.retried += 1
+
+    def _lead(self, key, call, fn):
+        def publish(kind, value):
+            with call.events_lock:
+                call.latest[kind] = value
+                for listener in call.listeners:
+                    listener(kind, value)
+
+        try:
+            call.result = fn(publish)
+            return copy.deepcopy(call.result)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'in_flight': len(self._calls),
+                'calls': self.calls,
+                'coalesced': self.coalesced,
+                'retried': self.retried
+            }
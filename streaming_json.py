@@ -0,0 +1,115 @@
+"""
+Incremental parsing of a JSON object arriving in pieces
+
+The vision model streams its analysis a few characters at a time. Waiting
+for the whole completion before parsing means the estimate screen shows
+nothing until the last line item arrives. IncrementalJSONParser scans the
+text as it comes and reports each top-level field as soon as its value is
+complete, plus each element of a top-level array (line_items, equipment)
+as soon as that element is complete. Anything before the opening brace,
+such as a markdown code fence, is skipped, as is anything after the
+closing one.
+"""
+
+import json
+
+
+class IncrementalJSONParser:
+    """Feed text with feed(); get ('field', key, value) and ('item', key, index, value) events
+
+    Only complete values are ever reported, each exactly once. close()
+    returns the whole object and raises ValueError if the text never
+    formed one.
+    """
+
+    def __init__(self):
+        self._text = ''
+        self._pos = 0
+        self._start = None      # index of the opening brace
+        self._end = None        # index just past the closing brace
+        self._stack = []        # open containers, '{' or '['
+        self._in_string = False
+        self._escape = False
+        self._key = None
+        self._key_start = None
+        self._value_start = None
+        self._item_start = None
+        self._items = 0
+        self.fields = {}
+
+    def feed(self, chunk):
+        """Scan chunk and return the events it completed"""
+        self._text += chunk
+        events = []
+        text = self._text
+        while self._pos < len(text) and self._end is None:
+            char = text[self._pos]
+            depth = len(self._stack)
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if depth == 1 and self._key_start is not None:
+                        self._key = json.loads(text[self._key_start:self._pos + 1])
+                        self._key_start = None
+            elif self._start is None:
+                if char == '{':
+                    self._start = self._pos
+                    self._stack.append('{')
+            elif char.isspace():
+                pass
+            else:
+                self._scan(char, depth, events)
+            self._pos += 1
+        return events
+
+    def _scan(self, char, depth, events):
+        text = self._text
+        pos = self._pos
+        if depth == 1 and self._value_start is None and self._key is not None and char not in ':,':
+            self._value_start = pos
+        if depth == 2 and self._stack[1] == '[' and self._item_start is None and char not in ',]':
+            self._item_start = pos
+
+        if char == '"':
+            self._in_string = True
+            if depth == 1 and self._key is None:
+                self._key_start = pos
+        elif char in '{[':
+            self._stack.append(char)
+        elif char in '}]':
+            if depth == 2 and self._stack[1] == '[' and self._item_start is not None:
+                self._emit_item(text[self._item_start:pos], events)
+            self._stack.pop()
+            if depth == 1:
+                if self._value_start is not None:
+                    self._emit_field(text[self._value_start:pos], events)
+                self._end = pos + 1
+        elif char == ',':
+            if depth == 1 and self._value_start is not None:
+                self._emit_field(text[self._value_start:pos], events)
+            elif depth == 2 and self._stack[1] == '[' and self._item_start is not None:
+                self._emit_item(text[self._item_start:pos], events)
+
+    def _emit_item(self, value_text, events):
+        value = json.loads(value_text)
+        events.append(('item', self._key, self._items, value))
+        self._items += 1
+        self._item_start = None
+
+    def _emit_field(self, value_text, events):
+        value = json.loads(value_text)
+        self.fields[self._key] = value
+        events.append(('field', self._key, value))
+        self._key = None
+        self._value_start = None
+        self._items = 0
+
+    def close(self):
+        """The complete object; ValueError if the text didn't contain one"""
+        if self._end is None:
+            raise ValueError("Incomplete JSON object")
+        return json.loads(self._text[self._start:self._end])
@@ -0,0 +1,63 @@
+"""Analysis cache keys and expiry"""
+
+import pytest
+
+import analysis_cache
+import lru_cache
+from analysis_cache import analysis_key, cache_analysis, get_cached_analysis
+from lru_cache import LRUCache
+
+PHOTOS = [b'photo one', b'photo two', b'photo three']
+
+
+class FakeTime:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeTime()
+    monkeypatch.setattr(lru_cache, 'time', clock)
+    monkeypatch.setattr(analysis_cache, 'analysis_cache', LRUCache(ttl=60))
+    return clock
+
+
+def test_key_ignores_photo_order():
+    assert analysis_key(PHOTOS, 'water', 1, 'gpt-4o') == analysis_key(PHOTOS[::-1], 'water', 1, 'gpt-4o')
+
+
+@pytest.mark.parametrize('changed', [
+    (PHOTOS[:2], 'water', 1, 'gpt-4o', 'single'),
+    (PHOTOS[:2] + [b'photo 3'], 'water', 1, 'gpt-4o', 'single'),
+    (PHOTOS, 'mold', 1, 'gpt-4o', 'single'),
+    (PHOTOS, 'water', 2, 'gpt-4o', 'single'),
+    (PHOTOS, 'water', 1, 'gpt-4o-mini', 'single'),
+    (PHOTOS, 'water', 1, 'gpt-4o', 'fanout1-overlapping'),
+])
+def test_key_changes_with_what_the_model_sees(changed):
+    assert analysis_key(PHOTOS, 'water', 1, 'gpt-4o') != analysis_key(*changed)
+
+
+def test_cached_analysis_is_a_fresh_copy(clock):
+    key = analysis_key(PHOTOS, 'water', 1, 'gpt-4o')
+    cache_analysis(key, {'severity': 'minor', 'line_items': []})
+    first = get_cached_analysis(key)
+    first['line_items'].append('x')
+    assert get_cached_analysis(key) == {'severity': 'minor', 'line_items': []}
+
+
+def test_unusable_answers_are_not_cached(clock):
+    cache_analysis('key', {'error': 'Could not parse the analysis'})
+    assert get_cached_analysis('key') is None
+
+
+def test_cached_analysis_expires(clock):
+    cache_analysis('key', {'severity': 'minor'})
+    clock.now += 59
+    assert get_cached_analysis('key') == {'severity': 'minor'}
+    clock.now += 1
+    assert get_cached_analysis('key') is None
@@ -0,0 +1,192 @@
+"""merge_analyses rules and fan-out grouping"""
+
+import pytest
+
+from analysis_fanout import fan_out, group_photos, merge_analyses
+
+
+GROUPS = [
+    {'severity': 'minor', 'category': '1', 'class': '2', 'affected_area_sqft': 100, 'total_estimate': '$1,200.50',
+     'standing_water': False, 'cause': 'leak'},
+    {'severity': 'severe', 'category': '3', 'class': '1', 'affected_area_sqft': 50.25, 'total_estimate': 800,
+     'standing_water': True, 'cause': 'flood'},
+    {'severity': 'moderate', 'category': '2', 'affected_area_sqft': 10, 'standing_water': False},
+]
+
+
+def test_worst_grades_and_flags():
+    merged = merge_analyses('water', GROUPS)
+    assert merged['damage_type'] == 'water'
+    assert merged['severity'] == 'severe'
+    assert merged['category'] == '3'
+    assert merged['class'] == '2'
+    assert merged['standing_water'] is True
+    # Fields without a rule come from the most severe group
+    assert merged['cause'] == 'flood'
+
+
+def test_overlapping_groups_take_the_largest_area_and_total():
+    merged = merge_analyses('water', GROUPS)
+    assert merged['affected_area_sqft'] == 100
+    assert merged['total_estimate'] == 1200.5
+
+
+def test_separate_areas_add_up():
+    merged = merge_analyses('water', GROUPS, separate_areas=True)
+    assert merged['affected_area_sqft'] == 160.25
+    assert merged['total_estimate'] == 2000.5
+
+
+def test_photos_of_the_same_room_do_not_multiply_the_estimate():
+    room = {'affected_area_sqft': 200, 'total_estimate': 300,
+            'line_items': [{'description': 'Extract water', 'unit': 'sqft', 'quantity': 200, 'unitPrice': 1.5}],
+            'equipment_needed': [{'name': 'Dehumidifier', 'quantity': 2, 'days': 3}]}
+    merged = merge_analyses('water', [room, room, room])
+    assert merged['affected_area_sqft'] == 200
+    assert merged['line_items'][0]['quantity'] == 200
+    assert merged['equipment_needed'][0]['quantity'] == 2
+    assert merged['total_estimate'] == 300
+
+
+def test_conflicting_unknown_grade_loses_to_a_known_one():
+    merged = merge_analyses('mold', [{'severity': 'catastrophic'}, {'severity': 'minor'}])
+    assert merged['severity'] == 'minor'
+
+
+def test_severity_tie_keeps_the_earliest_group():
+    merged = merge_analyses('fire', [{'severity': 'moderate', 'cause': 'stove'},
+                                     {'severity': 'moderate', 'cause': 'candle'}])
+    assert merged['cause'] == 'stove'
+
+
+def test_flags_are_true_if_any_group_says_so():
+    merged = merge_analyses('water', [{'mold_visible': 'yes'}, {'mold_visible': False}])
+    assert merged['mold_visible'] is False
+    merged = merge_analyses('water', [{'mold_visible': False}, {'mold_visible': True}])
+    assert merged['mold_visible'] is True
+
+
+def test_lists_merge_in_order_without_duplicates():
+    merged = merge_analyses('water', [
+        {'affected_materials': ['Drywall', 'carpet']},
+        {'affected_materials': ['drywall ', 'Baseboard'], 'recommendations': ['Dry out']},
+        {'affected_materials': None},
+    ])
+    assert merged['affected_materials'] == ['Drywall', 'carpet', 'Baseboard']
+    assert merged['recommendations'] == ['Dry out']
+
+
+def test_equipment_quantities_and_days():
+    analyses = [
+        {'equipment_needed': [{'name': 'Dehumidifier', 'quantity': 2, 'days': 3}, 'fan']},
+        {'equipment_needed': [{'name': 'dehumidifier ', 'quantity': '1', 'days': 5},
+                              {'name': 'Air mover', 'quantity': 4, 'days': 3}]},
+    ]
+    assert merge_analyses('water', analyses)['equipment_needed'] == [
+        {'name': 'Dehumidifier', 'quantity': 2, 'days': 5},
+        {'name': 'Air mover', 'quantity': 4, 'days': 3},
+    ]
+    assert merge_analyses('water', analyses, separate_areas=True)['equipment_needed'] == [
+        {'name': 'Dehumidifier', 'quantity': 3, 'days': 5},
+        {'name': 'Air mover', 'quantity': 4, 'days': 3},
+    ]
+
+
+LINE_ITEM_GROUPS = [
+    {'total_estimate': 9999,
+     'line_items': [{'description': 'Remove drywall', 'unit': 'SF', 'category': 'Demo', 'quantity': 100,
+                     'unitPrice': 2, 'total': 200}]},
+    {'line_items': [{'description': 'remove drywall', 'unit': 'sf', 'category': 'demo', 'quantity': 300,
+                     'unitPrice': 3},
+                    {'description': 'Remove drywall', 'unit': 'LF', 'category': 'Demo', 'quantity': 10,
+                     'unitPrice': 5}]},
+]
+
+
+def test_line_items_combine_with_a_quantity_weighted_price():
+    merged = merge_analyses('water', LINE_ITEM_GROUPS)
+    assert merged['line_items'] == [
+        {'description': 'Remove drywall', 'unit': 'SF', 'category': 'Demo', 'quantity': 300, 'unitPrice': 2.75,
+         'total': 825},
+        {'description': 'Remove drywall', 'unit': 'LF', 'category': 'Demo', 'quantity': 10, 'unitPrice': 5},
+    ]
+    # The total follows the merged line items, not the groups' totals
+    assert merged['total_estimate'] == 875
+
+
+def test_line_items_of_separate_areas_add_up():
+    merged = merge_analyses('water', LINE_ITEM_GROUPS, separate_areas=True)
+    assert [item['quantity'] for item in merged['line_items']] == [400, 10]
+    assert merged['line_items'][0]['total'] == 1100
+    assert merged['total_estimate'] == 1150
+
+
+def test_line_items_without_quantity_keep_the_first_price():
+    merged = merge_analyses('water', [
+        {'line_items': [{'description': 'Inspection', 'quantity': 0, 'unitPrice': 150}]},
+        {'line_items': [{'description': 'Inspection', 'unitPrice': 175}]},
+    ])
+    assert merged['line_items'] == [{'description': 'Inspection', 'quantity': 0, 'unitPrice': 150}]
+
+
+def test_days_and_area_weighted_confidence():
+    merged = merge_analyses('water', [
+        {'estimated_days': 3, 'confidence_percent': 90, 'affected_area_sqft': 300},
+        {'estimated_days': '5', 'confidence_percent': 50, 'affected_area_sqft': 100},
+        {'estimated_days': 'unknown'},
+    ])
+    assert merged['estimated_days'] == 5
+    assert merged['confidence_percent'] == 80
+
+
+def test_confidence_without_areas_is_a_plain_mean():
+    merged = merge_analyses('water', [{'confidence_percent': 90}, {'confidence_percent': 61}])
+    assert merged['confidence_percent'] == 76
+
+
+def test_empty_groups_merge_to_empty_lists():
+    merged = merge_analyses('water', [{'severity': 'minor'}, {}])
+    assert merged['severity'] == 'minor'
+    assert merged['equipment_needed'] == []
+    assert merged['line_items'] == []
+    assert 'affected_area_sqft' not in merged
+
+
+def test_merge_is_deterministic():
+    analyses = [
+        {'severity': 'moderate', 'affected_materials': ['a', 'b'], 'line_items': [{'description': 'x', 'quantity': 1}]},
+        {'severity': 'moderate', 'affected_materials': ['b', 'c'], 'line_items': [{'description': 'x', 'quantity': 2}]},
+    ]
+    assert merge_analyses('water', analyses) == merge_analyses('water', analyses)
+
+
+def test_single_analysis_is_a_copy():
+    analysis = {'severity': 'minor'}
+    merged = merge_analyses('water', [analysis])
+    assert merged == analysis and merged is not analysis
+
+
+def test_nothing_to_merge():
+    with pytest.raises(ValueError):
+        merge_analyses('water', [])
+
+
+def test_group_photos():
+    photos = ['a', 'b', 'c', 'd', 'e']
+    assert group_photos(photos, 2) == [([0, 1], ['a', 'b']), ([2, 3], ['c', 'd']), ([4], ['e'])]
+    assert group_photos(photos, 0) == [([index], [photo]) for index, photo in enumerate(photos)]
+    assert group_photos([], 3) == []
+
+
+def test_fan_out_keeps_group_order_and_errors():
+    def analyse(photos):
+        if photos == ['bad']:
+            raise ValueError('unreadable')
+        return len(photos)
+
+    finished = []
+    outcomes = fan_out(analyse, group_photos(['a', 'b', 'bad', 'c'], 2) + [([4], ['bad'])],
+                       on_result=lambda index, *outcome: finished.append(index))
+    assert [result for result, _, _ in outcomes] == [2, 2, None]
+    assert isinstance(outcomes[2][1], ValueError)
+    assert sorted(finished) == [0, 1, 2]
@@ -0,0 +1,102 @@
+"""AnalysisJobs coalescing, queue limits and pruning"""
+
+import threading
+import time
+
+import pytest
+
+from analysis_jobs import AnalysisJob, AnalysisJobs, JobQueueFull, iter_job_events
+
+
+def wait_for(job, timeout=2):
+    end = time.monotonic() + timeout
+    while not job.finished and time.monotonic() < end:
+        job.wait(job.version, 0.05)
+    return job
+
+
+def blocked(release):
+    def run(job):
+        release.wait(2)
+        job.update('done', result={'ok': True})
+    return run
+
+
+def test_same_key_joins_an_unfinished_job_with_a_later_deadline():
+    jobs = AnalysisJobs(workers=2, max_pending=4)
+    release = threading.Event()
+    now = time.monotonic()
+    first = jobs.submit(blocked(release), key='photos', deadline=now + 60)
+
+    assert jobs.submit(blocked(release), key='photos', deadline=now + 30) is first
+    assert jobs.submit(blocked(release), key='photos', deadline=now + 90) is not first
+    assert jobs.submit(blocked(release), key='other', deadline=now + 30) is not first
+    assert jobs.stats()['coalesced'] == 1
+    release.set()
+    assert wait_for(first).status == 'done'
+
+
+def test_submissions_beyond_max_pending_are_refused():
+    jobs = AnalysisJobs(workers=1, max_pending=2)
+    release = threading.Event()
+    running = [jobs.submit(blocked(release)), jobs.submit(blocked(release))]
+
+    with pytest.raises(JobQueueFull):
+        jobs.submit(blocked(release))
+    assert jobs.stats()['rejected'] == 1
+    assert jobs.stats()['pending'] == 2
+
+    release.set()
+    for job in running:
+        assert wait_for(job).status == 'done'
+    end = time.monotonic() + 2
+    while jobs.stats()['pending'] and time.monotonic() < end:
+        time.sleep(0.01)
+    # Finished jobs free their places
+    assert wait_for(jobs.submit(blocked(release))).status == 'done'
+
+
+def test_finished_jobs_are_pruned_after_ttl():
+    jobs = AnalysisJobs(workers=1, max_pending=4, ttl=60)
+    release = threading.Event()
+    release.set()
+    finished = wait_for(jobs.submit(blocked(release)))
+    unfinished_release = threading.Event()
+    unfinished = jobs.submit(blocked(unfinished_release))
+    assert jobs.get(finished.id) is finished
+
+    finished.updated -= 61
+    unfinished.updated -= 61
+    jobs.completed({'ok': True})    # any submission prunes
+    assert jobs.get(finished.id) is None
+    assert jobs.get(unfinished.id) is unfinished
+    unfinished_release.set()
+    wait_for(unfinished)
+
+
+def test_failures_and_missing_results_fail_the_job():
+    jobs = AnalysisJobs(workers=1)
+
+    def boom(job):
+        raise RuntimeError('decoder crashed')
+
+    failed = wait_for(jobs.submit(boom))
+    assert failed.status == 'failed' and failed.error['message'] == 'decoder crashed'
+    silent = wait_for(jobs.submit(lambda job: None))
+    assert silent.status == 'failed'
+
+
+def test_events_follow_the_job_until_it_finishes():
+    job = AnalysisJob()
+    job.update('analyzing')
+    job.publish({'severity': 'minor'})
+    job.update('done', result={'severity': 'minor'})
+    events = list(iter_job_events(job, heartbeat=0.01))
+    assert len(events) == 1 and events[0].startswith('event: done\n')
+
+    job = AnalysisJob()
+    threading.Timer(0.05, job.update, args=('done',), kwargs={'result': {}}).start()
+    events = list(iter_job_events(job, heartbeat=0.01))
+    assert events[0].startswith('event: queued\n')
+    assert ': keep-alive\n\n' in events
+    assert events[-1].startswith('event: done\n')
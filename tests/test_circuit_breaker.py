@@ -0,0 +1,147 @@
+"""CircuitBreaker state transitions and which errors count as failures"""
+
+import time
+
+import httpx
+import openai
+import pytest
+
+from circuit_breaker import CircuitBreaker, CircuitOpen, upstream_fault
+from upstream_limiter import DeadlineExceeded, UpstreamBusy
+
+REQUEST = httpx.Request('POST', 'https://api.openai.com/v1/chat/completions')
+
+
+def status_error(cls, status):
+    return cls('error', response=httpx.Response(status, request=REQUEST), body=None)
+
+
+def breaker(**kwargs):
+    settings = dict(window=60, min_calls=4, error_rate=0.5, slow_seconds=10, slow_rate=0.8, open_seconds=0.05)
+    settings.update(kwargs)
+    return CircuitBreaker(**settings)
+
+
+def fail(error):
+    def call():
+        raise error
+    return call
+
+
+def trip(b, error=None):
+    error = error or status_error(openai.InternalServerError, 500)
+    for _ in range(b.min_calls):
+        with pytest.raises(type(error)):
+            b.run(fail(error))
+
+
+@pytest.mark.parametrize('error', [
+    status_error(openai.InternalServerError, 500),
+    status_error(openai.InternalServerError, 503),
+    status_error(openai.RateLimitError, 429),
+    openai.APIConnectionError(request=REQUEST),
+    openai.APITimeoutError(request=REQUEST),
+    httpx.ReadTimeout('read timed out'),
+])
+def test_upstream_faults(error):
+    assert upstream_fault(error)
+
+
+@pytest.mark.parametrize('error', [
+    status_error(openai.BadRequestError, 400),
+    status_error(openai.AuthenticationError, 401),
+    status_error(openai.UnprocessableEntityError, 422),
+    DeadlineExceeded('client deadline'),
+    UpstreamBusy('queue full', retry_after=5),
+    ValueError('bad photo'),
+])
+def test_request_errors_are_not_faults(error):
+    assert not upstream_fault(error)
+
+
+def test_closed_open_half_open_closed():
+    b = breaker()
+    trip(b)
+    assert b.state == 'open'
+    assert b.stats()['opened'] == 1
+
+    with pytest.raises(CircuitOpen) as refused:
+        b.run(lambda: 'ok')
+    assert refused.value.retry_after >= 1
+    with pytest.raises(CircuitOpen):
+        b.check()
+
+    time.sleep(0.06)
+    b.check()
+    assert b.run(lambda: b.state) == 'half_open'
+    assert b.state == 'closed'
+    assert b.stats()['window_calls'] == 0
+
+
+def test_only_one_probe_at_a_time():
+    b = breaker()
+    trip(b)
+    time.sleep(0.06)
+
+    def probe():
+        with pytest.raises(CircuitOpen):
+            b.run(lambda: 'second')
+        return 'first'
+
+    assert b.run(probe) == 'first'
+    assert b.state == 'closed'
+
+
+def test_failed_probe_reopens():
+    b = breaker()
+    trip(b)
+    time.sleep(0.06)
+    with pytest.raises(openai.APIConnectionError):
+        b.run(fail(openai.APIConnectionError(request=REQUEST)))
+    assert b.state == 'open'
+    assert b.stats()['opened'] == 2
+
+
+def test_probe_with_request_error_stays_half_open():
+    b = breaker()
+    trip(b)
+    time.sleep(0.06)
+    with pytest.raises(DeadlineExceeded):
+        b.run(fail(DeadlineExceeded('client deadline')))
+    assert b.state == 'half_open'
+    b.run(lambda: 'ok')
+    assert b.state == 'closed'
+
+
+@pytest.mark.parametrize('error', [
+    status_error(openai.BadRequestError, 400),
+    DeadlineExceeded('client deadline'),
+    UpstreamBusy('queue full', retry_after=5),
+])
+def test_request_errors_never_open(error):
+    b = breaker()
+    for _ in range(b.min_calls * 3):
+        with pytest.raises(type(error)):
+            b.run(fail(error))
+    assert b.state == 'closed'
+    assert b.stats()['window_calls'] == 0
+
+
+def test_error_rate_below_threshold_stays_closed():
+    b = breaker(min_calls=4, error_rate=0.5)
+    error = status_error(openai.InternalServerError, 500)
+    for outcome in ['ok', 'ok', 'ok', 'fail', 'ok', 'ok']:
+        if outcome == 'ok':
+            b.run(lambda: None)
+        else:
+            with pytest.raises(openai.InternalServerError):
+                b.run(fail(error))
+    assert b.state == 'closed'
+
+
+def test_slow_calls_open():
+    b = breaker(min_calls=2, slow_seconds=0.01, slow_rate=1.0)
+    b.run(time.sleep, 0.02)
+    assert b.state == 'closed'
+    b.run(time.sleep, 0.02)
+    assert b.state == 'open'
@@ -0,0 +1,45 @@
+"""Hedger attempts and the errors it raises"""
+
+import time
+
+import pytest
+
+from hedging import AttemptLost, Hedger
+from upstream_limiter import DeadlineExceeded
+
+
+def hedger():
+    h = Hedger(enabled=True)
+    h.delay = lambda: 0.01
+    return h
+
+
+def test_first_failure_is_raised():
+    def attempt(race, n):
+        time.sleep(0.05 * (1 - n))
+        raise ValueError(f"attempt {n}")
+
+    with pytest.raises(ValueError, match='attempt 1'):
+        hedger().run(attempt)
+
+
+def test_all_attempts_lost_raises_deadline_exceeded():
+    def attempt(race, n):
+        time.sleep(0.03)
+        raise AttemptLost()
+
+    with pytest.raises(DeadlineExceeded):
+        hedger().run(attempt)
+
+
+def test_hedge_that_streams_first_wins():
+    def attempt(race, n):
+        time.sleep(0.2 if n == 0 else 0)
+        if not race.claim(n):
+            raise AttemptLost()
+        return n
+
+    h = hedger()
+    assert h.run(attempt) == 1
+    assert h.hedged == 1
+    assert h.hedge_wins == 1
@@ -0,0 +1,141 @@
+"""Local estimator against the js/mold-analysis.js formulas it ports"""
+
+import pytest
+
+from local_estimator import (
+    calculate_air_scrubbers, calculate_containment, calculate_negative_pressure, local_estimate, mold_level,
+    parse_estimate_params
+)
+
+
+def line_item(analysis, description):
+    return next(item for item in analysis['line_items'] if item['description'] == description)
+
+
+def equipment(analysis, name):
+    return next(item['quantity'] for item in analysis['equipment_needed'] if item['name'] == name)
+
+
+@pytest.mark.parametrize('area, level', [
+    (9.9, 'level1'), (10, 'level2'), (30, 'level2'), (30.5, 'level3'), (100, 'level3'), (101, 'level4')
+])
+def test_mold_level_boundaries(area, level):
+    assert mold_level(area) == level
+
+
+def test_hvac_is_level5_at_any_size():
+    assert mold_level(5, hvac=True) == 'level5'
+
+
+def test_equipment_formulas_match_js():
+    # Math.ceil(cubicFeet * ACH / 60 / 500); Math.ceil(cubicFeet * 0.1 / 60 / 500)
+    assert calculate_air_scrubbers(400, 'level3') == 1
+    assert calculate_air_scrubbers(8000, 'level4') == 3
+    assert calculate_negative_pressure(400) == 1
+    assert calculate_negative_pressure(600000) == 2
+
+
+def test_containment_formula_matches_js():
+    # plastic = perimeter * height * 1.2; doors = ceil(perimeter / 30); cost = plastic * 0.25 + doors * 45
+    assert calculate_containment(40, 8) == {'plastic_sqft': 384.0, 'zipper_doors': 2, 'cost': 186.0}
+
+
+def test_level3_mold_at_50_sqft():
+    analysis = local_estimate('mold', 50)
+
+    assert analysis['contamination_level'] == '3'
+    assert equipment(analysis, 'HEPA Air Scrubber') == 1
+    assert equipment(analysis, 'Negative Air Machine') == 1
+    assert analysis['containment'] == {'plastic_sqft': 271.5, 'zipper_doors': 1, 'cost': 112.88}
+    remediation = line_item(analysis, 'Mold remediation')
+    assert (remediation['unitPrice'], remediation['total']) == (25.0, 1250.0)
+    assert analysis['total_estimate'] >= 2500
+
+
+def test_condition3_minimum_applies_to_small_jobs():
+    analysis = local_estimate('mold', 5)
+
+    assert line_item(analysis, 'Minimum charge adjustment')
+    assert analysis['total_estimate'] == 2500
+
+
+def test_stachybotrys_raises_minimum_and_rate():
+    plain = local_estimate('mold', 20)
+    black = local_estimate('mold', 20, species=['Stachybotrys'])
+
+    assert plain['total_estimate'] < 5000
+    assert black['total_estimate'] == 5000
+    assert line_item(black, 'Minimum charge adjustment')
+    rate = line_item(plain, 'Mold remediation')['unitPrice']
+    assert line_item(black, 'Mold remediation')['unitPrice'] == rate * 1.5
+    assert black['health_warnings'] == ['Black mold detected - enhanced PPE required']
+    assert black['health_risk'] == 'high'
+
+
+def test_hvac_minimum():
+    analysis = local_estimate('mold', 20, hvac=True)
+
+    assert analysis['total_estimate'] == 5000
+    assert line_item(analysis, 'Mold remediation')['unitPrice'] == 40.0
+
+
+def test_condition1_needs_no_work():
+    analysis = local_estimate('mold', 50, condition='1')
+
+    assert analysis['line_items'] == []
+    assert analysis['total_estimate'] == 0
+
+
+@pytest.mark.parametrize('damage_type, params', [
+    ('water', {'category': '3', 'water_class': '3'}),
+    ('fire', {'soot_level': 'heavy', 'structural_sqft': 120}),
+    ('mold', {'condition': '2', 'species': ['chaetomium']}),
+])
+def test_total_is_sum_of_line_items(damage_type, params):
+    analysis = local_estimate(damage_type, 750, **params)
+
+    assert analysis['total_estimate'] == round(sum(item['total'] for item in analysis['line_items']), 2)
+    assert analysis['source'] == 'local_estimator'
+
+
+def test_water_equipment_sizing():
+    analysis = local_estimate('water', 500, category='2', water_class='2')
+
+    # 4000 cu ft at 2000 per dehumidifier; 500 sq ft at 50 per air mover
+    assert equipment(analysis, 'Dehumidifier') == 2
+    assert equipment(analysis, 'Air Mover') == 10
+    assert analysis['estimated_days'] == 3
+
+
+def test_fire_equipment_sizing():
+    analysis = local_estimate('fire', 1500, soot_level='heavy')
+
+    # 12000 cu ft at level4's 10 air changes; a hydroxyl generator per 1000 sq ft
+    assert equipment(analysis, 'Air Scrubber') == 4
+    assert equipment(analysis, 'Hydroxyl Generator') == 2
+    assert analysis['severity'] == 'severe'
+
+
+def test_integral_area_stays_integer():
+    assert local_estimate('water', 500.0)['affected_area_sqft'] == 500
+
+
+def test_parse_params_from_form_values():
+    params = parse_estimate_params('mold', {
+        'affected_area_sqft': '50', 'condition': '3', 'species': 'Stachybotrys, ', 'hvac': 'yes',
+        'soot_level': 'heavy'
+    })
+
+    assert params == {'area_sqft': 50.0, 'condition': '3', 'species': ['Stachybotrys'], 'hvac': True}
+
+
+@pytest.mark.parametrize('damage_type, values, message', [
+    ('smoke', {'affected_area_sqft': 50}, 'Damage type'),
+    ('water', {}, 'affected_area_sqft must be a number'),
+    ('water', {'affected_area_sqft': '0'}, 'affected_area_sqft must be positive'),
+    ('water', {'affected_area_sqft': 50, 'category': '4'}, 'category must be one of'),
+    ('fire', {'affected_area_sqft': 50, 'structural_sqft': '-1'}, 'structural_sqft must not be negative'),
+])
+def test_parse_params_rejects_bad_values(damage_type, values, message):
+    with pytest.raises(ValueError, match=message):
+        parse_estimate_params(damage_type, values)
@@ -0,0 +1,112 @@
+"""LRUCache, DiskCache and TieredCache eviction and expiry"""
+
+import os
+
+import pytest
+
+import lru_cache
+from lru_cache import DiskCache, LRUCache, TieredCache
+
+
+class FakeTime:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeTime()
+    monkeypatch.setattr(lru_cache, 'time', clock)
+    return clock
+
+
+def test_evicts_least_recently_used_by_count():
+    cache = LRUCache(max_entries=2)
+    cache.put('a', b'1')
+    cache.put('b', b'2')
+    assert cache.get('a') == b'1'
+    cache.put('c', b'3')
+    assert cache.get('b') is None
+    assert cache.get('a') == b'1' and cache.get('c') == b'3'
+    assert cache.stats()['evictions'] == 1
+
+
+def test_evicts_by_size():
+    cache = LRUCache(max_bytes=10)
+    cache.put('a', b'x' * 4)
+    cache.put('b', b'x' * 4)
+    cache.put('c', b'x' * 4)
+    assert len(cache) == 2 and cache.get('a') is None
+    assert cache.stats()['bytes'] == 8
+    # Replacing a value frees the old one's size
+    cache.put('b', b'x')
+    assert cache.stats()['bytes'] == 5
+
+
+def test_value_larger_than_the_cache_is_not_stored():
+    cache = LRUCache(max_bytes=10)
+    cache.put('a', b'x' * 4)
+    cache.put('big', b'x' * 11)
+    assert cache.get('big') is None
+    assert cache.get('a') == b'x' * 4
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = LRUCache(ttl=60)
+    cache.put('a', b'1')
+    clock.now += 59
+    assert cache.get('a') == b'1'
+    clock.now += 1
+    assert cache.get('a', 'gone') == 'gone'
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['expirations'], stats['entries'], stats['bytes']) == (1, 1, 1, 0, 0)
+
+
+def test_put_restarts_the_ttl(clock):
+    cache = LRUCache(ttl=60)
+    cache.put('a', b'1')
+    clock.now += 45
+    cache.put('a', b'2')
+    clock.now += 45
+    assert cache.get('a') == b'2'
+
+
+def test_pop_and_clear():
+    cache = LRUCache()
+    cache.put('a', b'123')
+    assert cache.pop('a') == b'123'
+    assert cache.pop('a', 'none') == 'none'
+    cache.put('b', b'1')
+    cache.clear()
+    assert len(cache) == 0 and cache.stats()['bytes'] == 0
+
+
+def test_disk_cache_evicts_oldest_files(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=100, suffix='.bin')
+    for index, key in enumerate(['a', 'b', 'c']):
+        cache.put(key, b'x' * 40)
+        os.utime(tmp_path / f"{key}.bin", (index, index))
+    cache.put('d', b'x' * 40)
+    assert cache.get('a') is None
+    assert cache.get('d') == b'x' * 40
+    assert sum(path.stat().st_size for path in tmp_path.iterdir()) <= 90
+    assert cache.stats()['evictions'] >= 1
+
+
+def test_disk_cache_skips_values_over_budget(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=10)
+    cache.put('big', b'x' * 11)
+    assert cache.get('big') is None
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_tiered_cache_fills_memory_from_disk(tmp_path):
+    disk = DiskCache(str(tmp_path), max_bytes=1000)
+    TieredCache(LRUCache(), disk).put('a', b'thumb')
+    tiered = TieredCache(LRUCache(), disk)
+    assert tiered.lookup('a') == (b'thumb', 'disk')
+    assert tiered.lookup('a') == (b'thumb', 'memory')
+    assert tiered.lookup('b') == (None, None)
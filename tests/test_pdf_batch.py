@@ -0,0 +1,78 @@
+"""Batch rendering to ZIP and NDJSON"""
+
+import base64
+import io
+import json
+import zipfile
+
+import pytest
+
+import pdf_batch
+from pdf_batch import batch_filename, iter_batch_ndjson, iter_batch_zip, load_estimates
+from synthetic_data import make_estimate
+
+BATCH = [
+    make_estimate(seed=1, index=0, line_items=3, equipment=1),
+    'not an estimate',
+    make_estimate(seed=1, index=2, line_items=3, equipment=1),
+]
+
+
+@pytest.fixture(scope='module', autouse=True)
+def small_pool():
+    workers = pdf_batch.BATCH_WORKERS
+    pdf_batch.BATCH_WORKERS = 2
+    yield
+    pool = pdf_batch._pool
+    pdf_batch._pool = None
+    pdf_batch.BATCH_WORKERS = workers
+    if pool is not None:
+        pool.shutdown()
+
+
+def test_batch_filename():
+    assert batch_filename(0, {'job_number': 'JOB/42', 'customer_name': 'Ann'}) == '0001_JOB_42.pdf'
+    assert batch_filename(9, {'customer_name': 'Ann Lee'}) == '0010_Ann_Lee.pdf'
+    assert batch_filename(1, {'job_number': '../..'}) == '0002_estimate.pdf'
+    assert batch_filename(2, 'not an estimate') == '0003_estimate.pdf'
+
+
+@pytest.mark.parametrize('text', [
+    '[{"a": 1}, {"a": 2}]',
+    '{"estimates": [{"a": 1}, {"a": 2}]}',
+    '{"a": 1}\n\n{"a": 2}\n',
+])
+def test_load_estimates(text):
+    assert load_estimates(io.StringIO(text)) == [{'a': 1}, {'a': 2}]
+
+
+def test_zip_has_every_pdf_and_a_manifest_in_input_order():
+    chunks = list(iter_batch_zip(BATCH))
+    assert len(chunks) == len(BATCH) + 1
+
+    with zipfile.ZipFile(io.BytesIO(b''.join(chunks))) as archive:
+        manifest = json.loads(archive.read('manifest.json'))
+        assert [result['index'] for result in manifest] == [0, 1, 2]
+        assert [result['success'] for result in manifest] == [True, False, True]
+        assert 'error' in manifest[1]
+        for result in (manifest[0], manifest[2]):
+            pdf_data = archive.read(result['filename'])
+            assert pdf_data.startswith(b'%PDF')
+            assert len(pdf_data) == result['size']
+        assert manifest[1]['filename'] not in archive.namelist()
+
+
+def test_ndjson_has_one_line_per_estimate():
+    lines = list(iter_batch_ndjson(BATCH, engine='canvas'))
+    results = sorted((json.loads(line) for line in lines), key=lambda result: result['index'])
+    assert all(line.endswith('\n') for line in lines)
+    assert [result['success'] for result in results] == [True, False, True]
+    prefix = 'data:application/pdf;base64,'
+    assert results[0]['pdf_data'].startswith(prefix)
+    assert base64.b64decode(results[0]['pdf_data'][len(prefix):]).startswith(b'%PDF')
+    assert 'pdf_data' not in results[1]
+
+
+def test_unknown_engine():
+    with pytest.raises(ValueError):
+        list(iter_batch_zip(BATCH[:1], engine='nope'))
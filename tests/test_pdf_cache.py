@@ -0,0 +1,92 @@
+"""Estimate ETags and the PDF endpoint's cache and 304 responses"""
+
+from datetime import datetime
+
+import pytest
+
+import app
+import pdf_generator
+from pdf_cache import canonical_estimate, estimate_etag, pdf_cache
+
+PAYLOAD = {
+    'customerInfo': {'name': 'Ann Lee', 'address': '1 Main St'},
+    'analysis': {'damage_type': 'water', 'severity': 'moderate', 'affected_area_sqft': 120},
+    'lineItems': [{'description': 'Extract water', 'quantity': 120, 'unitPrice': 1.25, 'total': 150}],
+    'markup': 10,
+}
+
+
+class Clock:
+    """Stands in for datetime in the modules that read the clock"""
+
+    def __init__(self, now_value):
+        self.now_value = now_value
+
+    def now(self):
+        return self.now_value
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock(datetime(2026, 3, 2, 12, 0, 59))
+    monkeypatch.setattr(app, 'datetime', clock)
+    monkeypatch.setattr(pdf_generator, 'datetime', clock)
+    return clock
+
+
+@pytest.fixture
+def client():
+    pdf_cache.clear()
+    return app.app.test_client()
+
+
+def test_etag_is_stable_across_a_minute_boundary(clock):
+    first = canonical_estimate(app.build_estimate_data(PAYLOAD))
+    clock.now_value = datetime(2026, 3, 2, 12, 1, 0)
+    second = canonical_estimate(app.build_estimate_data(PAYLOAD))
+
+    assert first == second
+    assert first['job_number'].startswith('EST-')
+    assert estimate_etag(first) == estimate_etag(second)
+
+
+def test_etag_changes_with_the_estimate():
+    canonical = canonical_estimate(app.build_estimate_data(PAYLOAD))
+    changed = canonical_estimate(app.build_estimate_data(dict(PAYLOAD, markup=15)))
+    assert estimate_etag(canonical) != estimate_etag(changed)
+    assert estimate_etag(canonical) != estimate_etag(canonical, engine='canvas')
+    assert estimate_etag(canonical) != estimate_etag(canonical, max_bytes=500_000)
+
+
+def test_given_job_number_is_kept():
+    canonical = canonical_estimate({'job_number': 'JOB-7', 'date': '03/02/2026'})
+    assert canonical['job_number'] == 'JOB-7'
+
+
+def test_ignored_keys_do_not_change_the_etag():
+    estimate = app.build_estimate_data(PAYLOAD)
+    assert (estimate_etag(canonical_estimate(estimate))
+            == estimate_etag(canonical_estimate(dict(estimate, engine='canvas', format='binary'))))
+
+
+def test_resend_a_minute_later_is_a_cache_hit_and_304(clock, client):
+    first = client.post('/api/generate-pdf', json=PAYLOAD)
+    assert first.status_code == 200
+    assert first.headers['X-PDF-Cache'] == 'miss'
+    assert first.data.startswith(b'%PDF')
+    etag = first.headers['ETag']
+
+    clock.now_value = datetime(2026, 3, 2, 12, 1, 0)
+    again = client.post('/api/generate-pdf', json=PAYLOAD)
+    assert again.headers['ETag'] == etag
+    assert again.headers['X-PDF-Cache'] == 'hit'
+    assert again.data == first.data
+
+    not_modified = client.post('/api/generate-pdf', json=PAYLOAD, headers={'If-None-Match': etag})
+    assert not_modified.status_code == 304
+    assert not_modified.headers['ETag'] == etag
+    assert not_modified.data == b''
+
+    changed = client.post('/api/generate-pdf', json=dict(PAYLOAD, markup=15), headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
@@ -0,0 +1,62 @@
+"""Canvas engine against the Platypus engine it mirrors"""
+
+import re
+import zlib
+from collections import Counter
+
+import pytest
+
+from pdf_generator import get_pdf_generator
+from synthetic_data import make_estimate
+
+ESTIMATES = [
+    make_estimate(seed=3, index=0, line_items=60, equipment=3, photos=2, photo_size=(320, 240)),
+    make_estimate(seed=3, index=1, line_items=4, equipment=0),
+    make_estimate(seed=3, index=2, damage_type='fire', line_items=8, equipment=2, photos=1, photo_size=(320, 240)),
+]
+
+
+def render(estimate, engine):
+    return get_pdf_generator().generate_estimate_pdf(estimate, engine=engine, deterministic=True)
+
+
+def page_count(pdf):
+    return len(re.findall(rb'/Type /Page[^s]', pdf))
+
+
+def words(pdf):
+    """Every word drawn with Tj, counted; the engines split lines into strings differently"""
+    shown = []
+    for stream in re.findall(rb'stream\r?\n(.*?)endstream', pdf, re.S):
+        try:
+            content = zlib.decompress(stream)
+        except zlib.error:
+            continue
+        shown.extend(re.findall(rb'\(((?:[^()\\]|\\.)*)\) Tj', content))
+    return Counter(word for string in shown for word in string.split())
+
+
+@pytest.mark.parametrize('estimate', ESTIMATES)
+def test_canvas_draws_same_text_and_pages_as_platypus(estimate):
+    canvas, platypus = render(estimate, 'canvas'), render(estimate, 'platypus')
+
+    assert canvas.startswith(b'%PDF-') and canvas.rstrip().endswith(b'%%EOF')
+    assert page_count(canvas) == page_count(platypus)
+    assert words(canvas) == words(platypus)
+
+
+def test_canvas_draws_estimate_fields():
+    estimate = ESTIMATES[0]
+    drawn = words(render(estimate, 'canvas'))
+
+    for value in (estimate['customer_name'], estimate['line_items'][0]['description'], 'TOTAL:', 'Page 2'):
+        assert all(drawn[word.encode()] for word in value.split())
+
+
+def test_canvas_deterministic_bytes():
+    assert render(ESTIMATES[0], 'canvas') == render(ESTIMATES[0], 'canvas')
+
+
+def test_unknown_engine():
+    with pytest.raises(ValueError, match='Unknown PDF engine'):
+        get_pdf_generator().generate_estimate_pdf(ESTIMATES[1], engine='svg')
@@ -0,0 +1,47 @@
+"""Malformed photo entries are skipped, never fatal"""
+
+import pytest
+
+from pdf_cache import canonical_estimate, estimate_etag
+from pdf_generator import get_pdf_generator
+from photo_processing import prepare_photos
+from synthetic_data import make_estimate, make_photo
+
+MALFORMED = ['not a photo', 42, None, {'data': 123}, {'caption': 'no data'}]
+
+
+def test_prepare_photos_reports_non_dict_entries():
+    photo = make_photo(320, 240, seed=1)
+    prepared = prepare_photos(['not a photo', photo, 42])
+
+    assert [p.index for p in prepared] == [0, 1, 2]
+    assert isinstance(prepared[0].error, TypeError)
+    assert prepared[1].error is None and prepared[1].buffer is not None
+    assert isinstance(prepared[2].error, TypeError)
+
+
+def test_prepare_photos_skips_non_string_data():
+    prepared = prepare_photos([{'data': 123}, {'data': ['x']}])
+
+    assert all(p.buffer is None and p.error is None for p in prepared)
+
+
+@pytest.mark.parametrize('engine', ['platypus', 'canvas'])
+def test_pdf_renders_with_malformed_photos(engine):
+    estimate = make_estimate(seed=3, photos=1, photo_size=(320, 240))
+    estimate['photos'] = MALFORMED + estimate['photos']
+
+    pdf = get_pdf_generator().generate_estimate_pdf(estimate, engine=engine, deterministic=True)
+
+    assert pdf.startswith(b'%PDF-')
+
+
+def test_etag_with_malformed_photos():
+    estimate = make_estimate(seed=3, photos=1, photo_size=(320, 240))
+    good = estimate_etag(canonical_estimate(estimate))
+    estimate['photos'] = MALFORMED + estimate['photos']
+
+    etag = estimate_etag(canonical_estimate(estimate))
+
+    assert etag != good
+    assert etag == estimate_etag(canonical_estimate(estimate))
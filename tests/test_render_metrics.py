@@ -0,0 +1,88 @@
+"""RenderTimings stages and shared use of tracemalloc"""
+
+import tracemalloc
+
+import pytest
+
+from pdf_generator import get_pdf_generator
+from render_metrics import RenderTimings, new_timings
+from synthetic_data import make_estimate
+
+
+def render_stage(timings, stage, size):
+    timings.switch(stage)
+    return bytearray(size)
+
+
+def test_timings_only():
+    timings = new_timings('timings')
+    render_stage(timings, 'header', 10)
+    stages = timings.stop()
+    assert list(stages) == ['header']
+    assert set(stages['header']) == {'ms'}
+    assert not tracemalloc.is_tracing()
+
+
+def test_solo_render_reports_memory_and_stops_the_tracer():
+    timings = RenderTimings(allocations=True)
+    kept = render_stage(timings, 'photos', 512 * 1024)
+    render_stage(timings, 'build', 0)
+    stages = timings.stop()
+    assert stages['photos']['alloc_kb'] >= 500
+    assert stages['photos']['peak_kb'] >= 500
+    assert not tracemalloc.is_tracing()
+    assert 'desc="peak' in timings.server_timing()
+    del kept
+
+
+def test_overlapping_renders_share_the_tracer_and_drop_memory():
+    first, second = RenderTimings(allocations=True), RenderTimings(allocations=True)
+    render_stage(first, 'header', 1024)
+    render_stage(second, 'header', 1024)
+    render_stage(first, 'build', 0)
+
+    first_stages = first.stop()
+    # The second render is still tracing
+    assert tracemalloc.is_tracing()
+    second_stages = second.stop()
+    assert not tracemalloc.is_tracing()
+
+    for stages in (first_stages, second_stages):
+        assert all(set(values) == {'ms'} for values in stages.values())
+
+
+def test_render_after_an_overlap_reports_memory_again():
+    first, second = RenderTimings(allocations=True), RenderTimings(allocations=True)
+    render_stage(first, 'header', 0)
+    render_stage(second, 'header', 0)
+    first.stop()
+    second.stop()
+
+    render_stage(first, 'header', 64 * 1024)
+    assert 'peak_kb' in first.stop()['header']
+    assert first.renders == 2
+
+
+def test_tracer_started_elsewhere_is_left_running():
+    tracemalloc.start()
+    try:
+        timings = RenderTimings(allocations=True)
+        render_stage(timings, 'header', 0)
+        assert 'peak_kb' in timings.stop()['header']
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
+
+
+@pytest.mark.parametrize('engine', ['platypus', 'canvas'])
+def test_failed_render_releases_the_tracer(engine):
+    timings = RenderTimings(allocations=True)
+    with pytest.raises(Exception):
+        get_pdf_generator().generate_estimate_pdf('not an estimate', engine=engine, timings=timings)
+    assert not tracemalloc.is_tracing()
+    assert timings.renders == 0
+
+    get_pdf_generator().generate_estimate_pdf(make_estimate(seed=2), engine=engine, timings=timings)
+    assert timings.renders == 1
+    assert 'peak_kb' in timings.stages['build']
+    assert not tracemalloc.is_tracing()
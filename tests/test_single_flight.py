@@ -0,0 +1,172 @@
+"""SingleFlight coalescing, shared errors, deadlines and events"""
+
+import threading
+import time
+
+import pytest
+
+from single_flight import SingleFlight
+from upstream_limiter import DeadlineExceeded
+
+
+def run_in_threads(count, target):
+    """Start count threads running target(i); return a list their outcomes fill in"""
+    outcomes = [None] * count
+
+    def run(i):
+        try:
+            outcomes[i] = ('ok', target(i))
+        except Exception as e:
+            outcomes[i] = ('error', e)
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads, outcomes
+
+
+def blocking_call(result=None, error=None):
+    """fn for SingleFlight.do that blocks until released; counts its runs"""
+    started, release = threading.Event(), threading.Event()
+    runs = []
+
+    def call(publish):
+        runs.append(1)
+        started.set()
+        release.wait(2)
+        if error is not None:
+            raise error
+        return result
+
+    return call, started, release, runs
+
+
+def test_concurrent_calls_share_one_result():
+    flights = SingleFlight()
+    call, started, release, runs = blocking_call(result={'severity': 'minor'})
+
+    leader, outcomes = run_in_threads(1, lambda i: flights.do('key', call))
+    started.wait(1)
+    followers, follower_outcomes = run_in_threads(3, lambda i: flights.do('key', call))
+    time.sleep(0.05)
+    assert flights.stats()['in_flight'] == 1
+    release.set()
+    for thread in leader + followers:
+        thread.join()
+
+    assert outcomes[0] == ('ok', ({'severity': 'minor'}, False))
+    assert follower_outcomes == [('ok', ({'severity': 'minor'}, True))] * 3
+    assert len(runs) == 1
+    assert flights.stats() == {'in_flight': 0, 'calls': 1, 'coalesced': 3, 'retried': 0}
+
+
+def test_results_are_copies():
+    flights = SingleFlight()
+    call, started, release, _ = blocking_call(result={'items': []})
+    leader, outcomes = run_in_threads(1, lambda i: flights.do('key', call))
+    started.wait(1)
+    followers, follower_outcomes = run_in_threads(1, lambda i: flights.do('key', call))
+    time.sleep(0.05)
+    release.set()
+    for thread in leader + followers:
+        thread.join()
+    outcomes[0][1][0]['items'].append('x')
+    assert follower_outcomes[0][1][0] == {'items': []}
+
+
+def test_errors_reach_every_caller():
+    flights = SingleFlight()
+    call, started, release, runs = blocking_call(error=ValueError('bad photos'))
+    leader, outcomes = run_in_threads(1, lambda i: flights.do('key', call))
+    started.wait(1)
+    followers, follower_outcomes = run_in_threads(2, lambda i: flights.do('key', call))
+    time.sleep(0.05)
+    release.set()
+    for thread in leader + followers:
+        thread.join()
+
+    for status, error in outcomes + follower_outcomes:
+        assert status == 'error' and isinstance(error, ValueError)
+    assert len(runs) == 1
+
+
+def test_different_keys_do_not_coalesce():
+    flights = SingleFlight()
+    assert flights.do('a', lambda publish: 1) == (1, False)
+    assert flights.do('b', lambda publish: 2) == (2, False)
+    assert flights.stats()['coalesced'] == 0
+
+
+def test_follower_waits_only_until_its_own_deadline():
+    flights = SingleFlight()
+    call, started, release, _ = blocking_call(result='late')
+    leader, outcomes = run_in_threads(1, lambda i: flights.do('key', call))
+    started.wait(1)
+
+    start = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        flights.do('key', call, deadline=time.monotonic() + 0.05)
+    assert time.monotonic() - start < 0.5
+
+    release.set()
+    leader[0].join()
+    assert outcomes[0] == ('ok', ('late', False))
+
+
+def test_leaders_deadline_is_not_shared():
+    flights = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    runs = []
+
+    def call(publish):
+        runs.append(1)
+        if len(runs) == 1:
+            started.set()
+            release.wait(2)
+            raise DeadlineExceeded('leader gave up')
+        return 'done'
+
+    leader, outcomes = run_in_threads(1, lambda i: flights.do('key', call))
+    started.wait(1)
+    followers, follower_outcomes = run_in_threads(
+        1, lambda i: flights.do('key', call, deadline=time.monotonic() + 5))
+    time.sleep(0.05)
+    release.set()
+    for thread in leader + followers:
+        thread.join()
+
+    assert outcomes[0][0] == 'error' and isinstance(outcomes[0][1], DeadlineExceeded)
+    assert follower_outcomes[0] == ('ok', ('done', False))
+    assert len(runs) == 2
+    assert flights.stats()['retried'] == 1
+
+
+def test_events_reach_every_caller():
+    flights = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+
+    def call(publish):
+        publish('progress', 'preparing')
+        publish('progress', 'analyzing')
+        started.set()
+        release.wait(2)
+        publish('partial', {'severity': 'minor'})
+        return 'done'
+
+    heard = [[], []]
+
+    def caller(i):
+        return flights.do('key', call, on_event=lambda kind, value: heard[i].append((kind, value)))
+
+    leader, _ = run_in_threads(1, caller)
+    started.wait(1)
+    follower = threading.Thread(target=caller, args=(1,))
+    follower.start()
+    time.sleep(0.05)
+    release.set()
+    follower.join()
+    leader[0].join()
+
+    assert heard[0] == [('progress', 'preparing'), ('progress', 'analyzing'), ('partial', {'severity': 'minor'})]
+    # A late joiner first hears the latest event of each kind
+    assert heard[1] == [('progress', 'analyzing'), ('partial', {'severity': 'minor'})]
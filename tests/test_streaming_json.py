@@ -0,0 +1,107 @@
+"""IncrementalJSONParser on partial and chunked input"""
+
+import json
+
+import pytest
+
+from streaming_json import IncrementalJSONParser
+
+ANALYSIS = {
+    'damage_type': 'water',
+    'severity': 'moderate',
+    'affected_area_sqft': 120.5,
+    'notes': 'Wall {stained}, "wet" to 2\' [high]\\n',
+    'standing_water': False,
+    'mold': None,
+    'line_items': [
+        {'description': 'Extract water', 'quantity': 120, 'tags': ['a', 'b']},
+        {'description': 'Dehumidifier', 'quantity': 2},
+    ],
+    'equipment_needed': [],
+    'estimated_days': 3,
+}
+TEXT = '```json\n' + json.dumps(ANALYSIS, indent=2) + '\n```'
+
+
+def expected_events():
+    events = []
+    for key, value in ANALYSIS.items():
+        if isinstance(value, list):
+            events.extend(('item', key, index, item) for index, item in enumerate(value))
+        events.append(('field', key, value))
+    return events
+
+
+def feed_all(parser, chunks):
+    events = []
+    for chunk in chunks:
+        events.extend(parser.feed(chunk))
+    return events
+
+
+def test_whole_text():
+    parser = IncrementalJSONParser()
+    assert parser.feed(TEXT) == expected_events()
+    assert parser.close() == ANALYSIS
+    assert parser.fields == ANALYSIS
+
+
+def test_one_character_at_a_time():
+    parser = IncrementalJSONParser()
+    assert feed_all(parser, TEXT) == expected_events()
+    assert parser.close() == ANALYSIS
+
+
+@pytest.mark.parametrize('size', [2, 3, 7, 16, 50])
+def test_fixed_size_chunks(size):
+    parser = IncrementalJSONParser()
+    chunks = [TEXT[start:start + size] for start in range(0, len(TEXT), size)]
+    assert feed_all(parser, chunks) == expected_events()
+    assert parser.close() == ANALYSIS
+
+
+def test_every_split_point():
+    for split in range(len(TEXT) + 1):
+        parser = IncrementalJSONParser()
+        assert feed_all(parser, [TEXT[:split], TEXT[split:]]) == expected_events(), split
+
+
+def test_fields_are_reported_once_complete():
+    parser = IncrementalJSONParser()
+    assert parser.feed('{"severity": "mod') == []
+    assert parser.feed('erate", "affected_area_sqft": 12') == [('field', 'severity', 'moderate')]
+    # A number is only complete once something follows it
+    assert parser.feed('0') == []
+    assert parser.feed(', "line_items": [{"quantity": 1}') == [('field', 'affected_area_sqft', 120)]
+    assert parser.feed(', {"quantity"') == [('item', 'line_items', 0, {'quantity': 1})]
+    assert parser.feed(': 2}]') == [('item', 'line_items', 1, {'quantity': 2})]
+    assert parser.feed('}') == [('field', 'line_items', [{'quantity': 1}, {'quantity': 2}])]
+    assert parser.close()['line_items'][1] == {'quantity': 2}
+
+
+def test_text_after_the_object_is_ignored():
+    parser = IncrementalJSONParser()
+    parser.feed('{"a": 1}')
+    assert parser.feed('\nThat is the estimate. {"b": 2}') == []
+    assert parser.close() == {'a': 1}
+
+
+def test_incomplete_object_fails_on_close():
+    parser = IncrementalJSONParser()
+    events = parser.feed('Here you go: {"severity": "severe", "line_items": [{"quantity": 1}, {"quan')
+    assert events == [('field', 'severity', 'severe'), ('item', 'line_items', 0, {'quantity': 1})]
+    with pytest.raises(ValueError):
+        parser.close()
+
+
+def test_no_object_fails_on_close():
+    parser = IncrementalJSONParser()
+    assert parser.feed("I can't analyse these photos.") == []
+    with pytest.raises(ValueError):
+        parser.close()
+
+
+def test_invalid_value_raises():
+    parser = IncrementalJSONParser()
+    with pytest.raises(ValueError):
+        parser.feed('{"severity": severe, "x": 1}')
@@ -0,0 +1,138 @@
+"""AdaptiveLimiter AIMD limit, cooldown, retries and queueing"""
+
+import threading
+import time
+
+import httpx
+import openai
+import pytest
+
+from upstream_limiter import AdaptiveLimiter, DeadlineExceeded, UpstreamBusy, retry_after_seconds
+
+REQUEST = httpx.Request('POST', 'https://api.openai.com/v1/chat/completions')
+
+
+def rate_limited(headers=None):
+    return openai.RateLimitError('slow down', response=httpx.Response(429, headers=headers, request=REQUEST), body=None)
+
+
+def limiter(**kwargs):
+    settings = dict(rpm=0, concurrency=8, max_concurrency=32, queue_timeout=1, retries=4)
+    settings.update(kwargs)
+    limiter = AdaptiveLimiter(**settings)
+    limiter._backoff = lambda attempt: 0.0
+    return limiter
+
+
+def failing(errors, result='ok'):
+    """fn raising each of errors in turn, then returning result"""
+    errors = list(errors)
+
+    def call():
+        if errors:
+            raise errors.pop(0)
+        return result
+    return call
+
+
+def test_success_increases_limit_additively():
+    l = limiter(concurrency=4)
+    for _ in range(4):
+        assert l.run(lambda: 'ok') == 'ok'
+    # Each success adds 1/limit: about one slot per limit's worth of successes
+    assert 4.9 < l.limit < 5.0
+    for _ in range(5):
+        l.run(lambda: 'ok')
+    assert 5.8 < l.limit < 6.0
+
+
+def test_limit_stops_at_max_concurrency():
+    l = limiter(concurrency=3, max_concurrency=4)
+    for _ in range(50):
+        l.run(lambda: None)
+    assert l.limit == 4
+
+
+def test_throttle_halves_limit_and_retries():
+    l = limiter(concurrency=16)
+    assert l.run(failing([rate_limited(), rate_limited()])) == 'ok'
+    assert l.limit == pytest.approx(4 + 1 / 4)
+    stats = l.stats()
+    assert stats['throttled'] == 2
+    assert stats['retried'] == 2
+    assert stats['calls'] == 3
+
+
+def test_limit_never_drops_below_one():
+    l = limiter(concurrency=2, retries=5)
+    with pytest.raises(openai.RateLimitError):
+        l.run(failing([rate_limited()] * 6))
+    assert l.limit == 1
+    assert l.stats()['throttled'] == 6
+
+
+def test_retry_after_pauses_every_caller():
+    l = limiter(queue_timeout=0.05)
+    with pytest.raises(openai.RateLimitError):
+        l.run(failing([rate_limited({'retry-after': '30'})]), deadline=time.monotonic() + 1)
+    assert not l.has_capacity()
+    assert l.stats()['cooldown_seconds'] > 29
+    with pytest.raises(UpstreamBusy) as busy:
+        l.run(lambda: 'ok')
+    assert busy.value.retry_after >= 29
+
+
+def test_retry_after_headers():
+    assert retry_after_seconds(rate_limited({'retry-after-ms': '1500'})) == 1.5
+    assert retry_after_seconds(rate_limited({'retry-after': '7'})) == 7
+    assert retry_after_seconds(rate_limited()) is None
+
+
+def test_transient_errors_retry_without_shrinking():
+    l = limiter(concurrency=4)
+    server_error = openai.InternalServerError('oops', response=httpx.Response(500, request=REQUEST), body=None)
+    assert l.run(failing([server_error, openai.APIConnectionError(request=REQUEST)])) == 'ok'
+    assert l.limit > 4
+    assert l.stats()['throttled'] == 0
+
+
+def test_other_errors_are_not_retried():
+    l = limiter()
+    bad_request = openai.BadRequestError('bad', response=httpx.Response(400, request=REQUEST), body=None)
+    with pytest.raises(openai.BadRequestError):
+        l.run(failing([bad_request]))
+    assert l.stats()['calls'] == 1
+    assert l.stats()['in_flight'] == 0
+
+
+def test_queue_waits_for_a_free_slot():
+    l = limiter(concurrency=1, max_concurrency=1, queue_timeout=0.05)
+    started, release = threading.Event(), threading.Event()
+
+    def hold():
+        started.set()
+        release.wait(1)
+
+    holder = threading.Thread(target=l.run, args=(hold,))
+    holder.start()
+    started.wait(1)
+    assert not l.has_capacity()
+    with pytest.raises(UpstreamBusy):
+        l.run(lambda: 'ok')
+    l.queue_timeout = 1
+    threading.Timer(0.05, release.set).start()
+    assert l.run(lambda: 'ok') == 'ok'
+    holder.join()
+    assert l.stats()['rejected'] == 1
+
+
+def test_deadline_while_queued():
+    l = limiter(concurrency=1, max_concurrency=1, queue_timeout=5)
+    release = threading.Event()
+    holder = threading.Thread(target=l.run, args=(lambda: release.wait(1),))
+    holder.start()
+    time.sleep(0.02)
+    with pytest.raises(DeadlineExceeded):
+        l.run(lambda: 'ok', deadline=time.monotonic() + 0.05)
+    release.set()
+    holder.join()
@@ -0,0 +1,18 @@
+"""VisionMetrics latency percentiles"""
+
+from vision_images import VisionMetrics
+
+
+def test_timeouts_count_toward_percentiles():
+    metrics = VisionMetrics()
+    for _ in range(90):
+        metrics.observe_call(1000, first_field_ms=200)
+    for _ in range(10):
+        metrics.observe_timeout(60000)
+
+    stats = metrics.stats()
+    assert stats['model_calls'] == 90
+    assert stats['model_timeouts'] == 10
+    assert stats['model_p50_ms'] == 1000
+    assert stats['model_p95_ms'] == 60000
+    assert stats['model_p99_ms'] == 60000
@@ -0,0 +1,238 @@
+"""
+Backpressure for upstream vision calls
+
+During storm events dozens of analyses hit the API at once, the API
+answers with a wall of 429s, and every retry makes it worse.
+AdaptiveLimiter sits in front of every vision call:
+
+- a token bucket caps the request rate (UPSTREAM_RPM, off by default);
+- an AIMD concurrency limit admits calls one slot at a time. Each success
+  grows the limit by 1/limit (about one slot per limit's worth of
+  successes), and each 429 halves it. This settles just under what the
+  API will take, rather than oscillating between flood and collapse;
+- a 429's Retry-After pauses every caller until it has passed, not only
+  the one that got it;
+- throttled and transient failures are retried with full-jitter
+  exponential backoff.
+
+Work beyond the limit waits in line for up to UPSTREAM_QUEUE_TIMEOUT
+seconds and then fails with UpstreamBusy. Limits are per process.
+
+Calls can carry a deadline (a time.monotonic() value): queueing, backoff
+and retries all stop at it, and DeadlineExceeded is raised if it passes
+before a slot comes free.
+"""
+
+import os
+import time
+import random
+import logging
+import threading
+from email.utils import parsedate_to_datetime
+
+logger = logging.getLogger(__name__)
+
+try:
+    import openai
+    THROTTLE_ERRORS = (openai.RateLimitError,)
+    TRANSIENT_ERRORS = (openai.APIConnectionError, openai.InternalServerError)
+except ImportError:
+    THROTTLE_ERRORS = ()
+    TRANSIENT_ERRORS = ()
+
+UPSTREAM_RPM = float(os.getenv('UPSTREAM_RPM', 0))
+UPSTREAM_CONCURRENCY = int(os.getenv('UPSTREAM_CONCURRENCY', 8))
+UPSTREAM_MAX_CONCURRENCY = int(os.getenv('UPSTREAM_MAX_CONCURRENCY', 32))
+UPSTREAM_QUEUE_TIMEOUT = float(os.getenv('UPSTREAM_QUEUE_TIMEOUT', 30))
+UPSTREAM_RETRIES = int(os.getenv('UPSTREAM_RETRIES', 4))
+# Longest an analysis may take end to end, in seconds; requests can ask for less
+ANALYSIS_DEADLINE = float(os.getenv('ANALYSIS_DEADLINE', 90))
+# Full-jitter backoff: a random wait up to base * 2**attempt, capped
+BACKOFF_BASE = 1.0
+BACKOFF_CAP = 30.0
+
+
+class UpstreamBusy(Exception):
+    """No upstream slot came free within the queue timeout"""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class DeadlineExceeded(Exception):
+    """The request's deadline passed before the upstream call finished"""
+
+
+def time_left(deadline):
+    """Seconds until deadline (a time.monotonic() value); None when there is no deadline"""
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def retry_after_seconds(error):
+    """Seconds a throttled response asked us to wait, or None"""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None)
+    if not headers:
+        return None
+    if headers.get('retry-after-ms'):
+        try:
+            return float(headers['retry-after-ms']) / 1000
+        except ValueError:
+            pass
+    value = headers.get('retry-after')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class AdaptiveLimiter:
+    """Token bucket plus AIMD concurrency limit, with shared cooldown and retries"""
+
+    def __init__(self, rpm=UPSTREAM_RPM, concurrency=UPSTREAM_CONCURRENCY, max_concurrency=UPSTREAM_MAX_CONCURRENCY,
+                 queue_timeout=UPSTREAM_QUEUE_TIMEOUT, retries=UPSTREAM_RETRIES):
+        self.rate = rpm / 60 if rpm else None
+        self.burst = max(1.0, self.rate or 0)
+        self.max_concurrency = max_concurrency
+        self.queue_timeout = queue_timeout
+        self.retries = retries
+        self.limit = float(min(concurrency, max_concurrency))
+        self._tokens = self.burst
+        self._refilled = time.monotonic()
+        self._cooldown_until = 0.0
+        self._in_flight = 0
+        self._waiting = 0
+        self._changed = threading.Condition()
+        self.calls = 0
+        self.throttled = 0
+        self.retried = 0
+        self.rejected = 0
+        self._wait_ms = 0.0
+        self._max_wait_ms = 0.0
+
+    def _refill(self, now):
+        if self.rate:
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled) * self.rate)
+            self._refilled = now
+
+    def _acquire(self, request_deadline=None):
+        """Wait for a slot (and a token); return the time waited in ms"""
+        start = time.monotonic()
+        deadline = start + self.queue_timeout
+        if request_deadline is not None:
+            deadline = min(deadline, request_deadline)
+        with self._changed:
+            self._waiting += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    ready_at = max(self._cooldown_until,
+                                   now if not self.rate or self._tokens >= 1 else now + (1 - self._tokens) / self.rate)
+                    if self._in_flight < int(self.limit) and ready_at <= now:
+                        break
+                    if now >= deadline:
+                        self.rejected += 1
+                        if request_deadline is not None and deadline == request_deadline:
+                            raise DeadlineExceeded("Deadline passed while waiting for an upstream slot")
+                        raise UpstreamBusy(
+                            f"No upstream slot within {self.queue_timeout:g}s "
+                            f"({self._in_flight} in flight, {self._waiting - 1} waiting)",
+                            retry_after=max(1, round(self._cooldown_until - now)) if self._cooldown_until > now else 5
+                        )
+                    self._changed.wait(min(deadline, ready_at if ready_at > now else deadline) - now)
+                if self.rate:
+                    self._tokens -= 1
+                self._in_flight += 1
+            finally:
+                self._waiting -= 1
+            waited = (time.monotonic() - start) * 1000
+            self._wait_ms += waited
+            self._max_wait_ms = max(self._max_wait_ms, waited)
+            self.calls += 1
+            return waited
+
+    def _release(self, throttled=False, retry_after=None):
+        with self._changed:
+            self._in_flight -= 1
+            if throttled:
+                self.throttled += 1
+                self.limit = max(1.0, self.limit / 2)
+                if retry_after:
+                    self._cooldown_until = max(self._cooldown_until, time.monotonic() + retry_after)
+            else:
+                self.limit = min(float(self.max_concurrency), self.limit + 1 / self.limit)
+            self._changed.notify_all()
+
+    def has_capacity(self):
+        """Whether a call could start now without queueing"""
+        with self._changed:
+            return (self._in_flight < int(self.limit) and not self._waiting
+                    and self._cooldown_until <= time.monotonic())
+
+    def run(self, fn, *args, deadline=None, **kwargs):
+        """Call fn within the limits, retrying throttled and transient failures
+
+        The last failure is raised once the retries run out, or as soon as
+        waiting to retry would pass deadline.
+        """
+        for attempt in range(self.retries + 1):
+            self._acquire(deadline)
+            try:
+                result = fn(*args, **kwargs)
+            except THROTTLE_ERRORS as e:
+                retry_after = retry_after_seconds(e)
+                self._release(throttled=True, retry_after=retry_after)
+                error = e
+                delay = max(retry_after or 0, self._backoff(attempt))
+                reason = f"throttled (limit now {self.limit:.1f})"
+            except TRANSIENT_ERRORS as e:
+                self._release()
+                error = e
+                delay = self._backoff(attempt)
+                reason = f"failed ({e})"
+            except BaseException:
+                self._release()
+                raise
+            else:
+                self._release()
+                return result
+
+            remaining = time_left(deadline)
+            if attempt == self.retries or (remaining is not None and delay >= remaining):
+                raise error
+            logger.warning(f"Upstream call {reason}, retrying in {delay:.1f}s")
+            with self._changed:
+                self.retried += 1
+            time.sleep(delay)
+
+    def _backoff(self, attempt):
+        return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+    def stats(self):
+        with self._changed:
+            cooldown = self._cooldown_until - time.monotonic()
+            return {
+                'limit': round(self.limit, 2),
+                'max_concurrency': self.max_concurrency,
+                'rpm': self.rate * 60 if self.rate else None,
+                'in_flight': self._in_flight,
+                'queue_depth': self._waiting,
+                'cooldown_seconds': round(cooldown, 1) if cooldown > 0 else 0,
+                'calls': self.calls,
+                'throttled': self.throttled,
+                'retried': self.retried,
+                'rejected': self.rejected,
+                'mean_wait_ms': round(self._wait_ms / self.calls, 3) if self.calls else 0.0,
+                'max_wait_ms': round(self._max_wait_ms, 3)
+            }
+
+
+vision_limiter = AdaptiveLimiter()
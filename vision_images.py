@@ -0,0 +1,189 @@
+"""
+Photo preprocessing for the vision model
+
+With detail "high" the model scales every image to fit 2048x2048 and then
+until its short side is 768 px before tiling it, so pixels beyond that are
+uploaded, base64-encoded and decoded for nothing. Each photo is turned
+upright from its EXIF orientation, shrunk to the resolution the model will
+actually look at and re-encoded as a JPEG, in parallel on the shared photo
+pool. Photos already small and upright go through untouched, labelled
+with their real format.
+"""
+
+import io
+import os
+import time
+import base64
+import logging
+import threading
+from collections import namedtuple
+
+from PIL import Image as PILImage, ImageOps
+
+from photo_processing import get_photo_pool, RESAMPLE, REDUCING_GAP
+from hedging import LatencyWindow
+
+logger = logging.getLogger(__name__)
+
+VISION_DETAIL = os.getenv('VISION_DETAIL', 'high')
+# The model's effective resolution at detail "high"
+VISION_MAX_SIDE = int(os.getenv('VISION_MAX_SIDE', 2048))
+VISION_SHORT_SIDE = int(os.getenv('VISION_SHORT_SIDE', 768))
+VISION_JPEG_QUALITY = int(os.getenv('VISION_JPEG_QUALITY', 85))
+
+# Formats the API accepts as they are
+PASSTHROUGH_FORMATS = {'JPEG': 'image/jpeg', 'PNG': 'image/png', 'WEBP': 'image/webp', 'GIF': 'image/gif'}
+EXIF_ORIENTATION = 0x0112
+
+# url is the data URL to send; sizes are (width, height) before and after
+VisionImage = namedtuple('VisionImage', ['url', 'original_bytes', 'bytes', 'original_size', 'size', 'timings'])
+
+
+def vision_size(width, height):
+    """The size the model scales (width, height) to, never larger than it is"""
+    scale = min(1.0, VISION_MAX_SIDE / max(width, height), VISION_SHORT_SIDE / min(width, height))
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def _data_url(data, mimetype):
+    return f"data:{mimetype};base64,{base64.b64encode(data).decode('ascii')}"
+
+
+def prepare_vision_image(data, mimetype='image/jpeg'):
+    """Upright, model-sized data URL for one photo's bytes
+
+    A photo Pillow can't read is sent as it came, so the model still gets
+    to try.
+    """
+    timings = {}
+    start = time.perf_counter()
+    try:
+        img = PILImage.open(io.BytesIO(data))
+        original_size = img.size
+        target = vision_size(*img.size)
+        rotated = img.getexif().get(EXIF_ORIENTATION, 1) != 1
+        if target == img.size and not rotated and img.format in PASSTHROUGH_FORMATS:
+            timings['total_ms'] = (time.perf_counter() - start) * 1000
+            return VisionImage(_data_url(data, PASSTHROUGH_FORMATS[img.format]), len(data), len(data),
+                               original_size, original_size, timings)
+
+        # The fit is symmetric, so the stored orientation's target is right
+        # for the draft even when the photo is turned afterwards
+        img.draft('RGB', target)
+        img.load()
+        mark = time.perf_counter()
+        timings['decode_ms'] = (mark - start) * 1000
+
+        img = ImageOps.exif_transpose(img)
+        img.thumbnail(vision_size(*img.size), RESAMPLE, reducing_gap=REDUCING_GAP)
+        if img.mode in ('RGBA', 'LA', 'P'):
+            img = img.convert('RGBA')
+            background = PILImage.new('RGB', img.size, (255, 255, 255))
+            background.paste(img, mask=img.getchannel('A'))
+            img = background
+        elif img.mode != 'RGB':
+            img = img.convert('RGB')
+        now = time.perf_counter()
+        timings['resize_ms'] = (now - mark) * 1000
+        mark = now
+
+        buffer = io.BytesIO()
+        img.save(buffer, format='JPEG', quality=VISION_JPEG_QUALITY)
+        encoded = buffer.getvalue()
+        now = time.perf_counter()
+        timings['encode_ms'] = (now - mark) * 1000
+        timings['total_ms'] = (now - start) * 1000
+        return VisionImage(_data_url(encoded, 'image/jpeg'), len(data), len(encoded),
+                           original_size, img.size, timings)
+    except Exception as e:
+        logger.warning(f"Sending photo to the vision model unprocessed: {e}")
+        timings['total_ms'] = (time.perf_counter() - start) * 1000
+        return VisionImage(_data_url(data, mimetype), len(data), len(data), None, None, timings)
+
+
+def prepare_vision_images(photos):
+    """VisionImages for (data, mimetype) pairs, prepared in parallel, in order"""
+    start = time.perf_counter()
+    if len(photos) > 1:
+        pool = get_photo_pool()
+        futures = [pool.submit(prepare_vision_image, data, mimetype) for data, mimetype in photos]
+        images = [future.result() for future in futures]
+    else:
+        images = [prepare_vision_image(data, mimetype) for data, mimetype in photos]
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    original = sum(image.original_bytes for image in images)
+    sent = sum(image.bytes for image in images)
+    if images:
+        logger.info(f"Prepared {len(images)} photos for the vision model in {elapsed_ms:.1f} ms: "
+                    f"{original / 1024:.0f} KB -> {sent / 1024:.0f} KB")
+    vision_metrics.observe_preparation(len(images), original, sent, elapsed_ms)
+    return images
+
+
+class VisionMetrics:
+    """Process-wide totals for vision preprocessing and the model calls it feeds"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._photos = 0
+        self._original_bytes = 0
+        self._sent_bytes = 0
+        self._preparations = 0
+        self._prepare_ms = 0.0
+        self._calls = 0
+        self._call_ms = 0.0
+        self._recent_calls = LatencyWindow()
+        self._timeouts = 0
+        self._first_fields = 0
+        self._first_field_ms = 0.0
+
+    def observe_preparation(self, photos, original_bytes, sent_bytes, elapsed_ms):
+        with self._lock:
+            self._photos += photos
+            self._original_bytes += original_bytes
+            self._sent_bytes += sent_bytes
+            self._preparations += 1
+            self._prepare_ms += elapsed_ms
+
+    def observe_call(self, elapsed_ms, first_field_ms=None):
+        """A model call that took elapsed_ms, its first field streamed after first_field_ms"""
+        with self._lock:
+            self._calls += 1
+            self._call_ms += elapsed_ms
+            self._recent_calls.observe(elapsed_ms)
+            if first_field_ms is not None:
+                self._first_fields += 1
+                self._first_field_ms += first_field_ms
+
+    def observe_timeout(self, elapsed_ms):
+        """A model call cut off by a timeout or its request's deadline after elapsed_ms
+
+        It goes into the latency percentiles at the time it was given up on,
+        so a slow API shows in model_p99_ms instead of dropping out of it.
+        """
+        with self._lock:
+            self._timeouts += 1
+            self._recent_calls.observe(elapsed_ms)
+
+    def stats(self):
+        percentiles = {f'model_p{q}_ms': round(self._recent_calls.percentile(q) or 0.0, 3) for q in (50, 95, 99)}
+        with self._lock:
+            return {
+                'photos': self._photos,
+                'original_bytes': self._original_bytes,
+                'sent_bytes': self._sent_bytes,
+                'bytes_saved': self._original_bytes - self._sent_bytes,
+                'saved_percent': round((1 - self._sent_bytes / self._original_bytes) * 100, 1)
+                                 if self._original_bytes else 0.0,
+                'mean_prepare_ms': round(self._prepare_ms / self._preparations, 3) if self._preparations else 0.0,
+                'model_calls': self._calls,
+                'mean_model_ms': round(self._call_ms / self._calls, 3) if self._calls else 0.0,
+                **percentiles,
+                'model_timeouts': self._timeouts,
+                'mean_first_field_ms': round(self._first_field_ms / self._first_fields, 3)
+                                       if self._first_fields else 0.0
+            }
+
+
+vision_metrics = VisionMetrics()